@@ -0,0 +1,249 @@
+"""
+Array-native counterparts of the classes in the "model" module.  The
+equations are exactly those of the scalar classes; only the transcendental
+functions (pow, exp, tan, sqrt) are swapped for their NumPy equivalents so
+that every attribute may hold an array.  Arithmetic-only methods are
+inherited unchanged from the scalar classes.  All the inputs broadcast
+against one another, so a whole landscape of cells may be evaluated in a
+single pass:
+
+  fuel = ArrayRothermelFuel(sigma, loading)
+  fuel.setDensity(bulkDensity)
+  fuel.setFuelMoisture(moisture, extinction)
+  fire = ArrayRothermelModel(fuel)
+  fire.setWind(midflameWind)
+  fire.setSlope(slope)
+  ros  = fire.evaluate()
+
+The arithmetic follows the dtype of the inputs, so that single precision
+(float32) inputs are evaluated, and produce results, in single precision
+throughout;  castFloats converts values already computed.  See the
+"precision" module for the accuracy of single precision.
+
+The units used in this module are English, not metric.
+
+References:
+Rothermel, R. C. A mathematical model for predicting fire spread in
+  wildland fuels.  General Technical Report INT-115, USDA Forest Service.
+  1972. 40 p.
+"""
+
+import copy
+import numpy as np
+import model
+import albini
+
+def ArrayRothermelExponentA(self) :
+  """
+  Calculates the exponent "A" by Rothermel's equation 39 for an array
+  of sigmas.
+  Requires:
+    self.sigma
+  Produces:
+    self.exponentA
+  """
+  self.exponentA = 1./(4.77 * np.power(self.sigma, 0.1) - 7.27)
+
+def ArrayAlbiniExponentA(self) :
+  """
+  Calculates the exponent "A" by Albini's method for an array of sigmas.
+  Requires:
+    self.sigma
+  Produces:
+    self.exponentA
+  """
+  self.exponentA = 133. * np.power(self.sigma, -0.7913)
+
+def castFloats(instance, dtype) :
+  """
+  Returns a shallow copy of instance (e.g., a fuel or fire model) whose
+  floating point NumPy attributes are converted to dtype.  Other
+  attributes are shared with instance.
+  """
+  result = copy.copy(instance)
+  for (name, value) in vars(instance).items() :
+    if isinstance(value, (np.ndarray, np.generic)) and \
+       np.issubdtype(value.dtype, np.floating) :
+      setattr(result, name, value.astype(dtype))
+  return result
+
+
+class ArrayFuel (model.Fuel) :
+  """
+  A "Fuel" whose attributes may be NumPy arrays.  As with the scalar
+  class, this is in effect an abstract class; use ArrayRothermelFuel or
+  ArrayAlbiniFuel.
+  """
+
+  def __init__(self,
+               sigma=None,
+               loading=None) :
+    """
+    Initializes a new "ArrayFuel" object.  Identical to Fuel.__init__,
+    except that the sigma argument may be an array.
+    """
+    model.Fuel.__init__(self, None, loading)
+    if sigma is not None :
+      self.setSigma(sigma)
+
+  def setSigma(self, sigma) :
+    """
+    Sets the surface-area to volume ratio of the fuel and calculates
+    the optimal packing ratio, maximum potential reaction velocity,
+    exponent "A" and heating efficiency.  See Rothermel's eqns 14, 36,
+    37 and 39.
+    """
+    self.sigma = sigma
+    self.optimalPacking = 3.348 * np.power(sigma, -0.8189)
+
+    sigma15 = np.power(sigma, 1.5)
+    self.maxPotentialVelocity = sigma15/(495 + 0.0594*sigma15)
+
+    self.calcExponentA()
+    self.heatingEfficiency = np.exp(-138/sigma)
+
+
+class ArrayRothermelFuel (ArrayFuel) :
+  """
+  Array-valued fuel using Rothermel's net loading and exponent "A".
+  """
+  calcNetFuelLoading = model.RothermelNetFuelLoading
+  calcExponentA      = ArrayRothermelExponentA
+
+
+class ArrayAlbiniFuel (ArrayFuel) :
+  """
+  Array-valued fuel using Albini's net loading and exponent "A".
+  """
+  calcNetFuelLoading = albini.AlbiniNetFuelLoading
+  calcExponentA      = ArrayAlbiniExponentA
+
+
+class ArrayRothermelModel (model.RothermelModel) :
+  """
+  Evaluates the Rothermel fire spread model over arrays.  The attributes
+  are the same as those of model.RothermelModel, but each may be an
+  array.  The fuel must be an ArrayFuel (or any fuel whose attributes are
+  arrays).
+  """
+
+  def calcMineralDamping(self) :
+    """
+    Calculates the mineral damping coefficient according to Rothermel,
+    eqn. 30.
+    Requires:
+      self.fuel.effMineralContent
+    Produces:
+      self.dampMineral
+    """
+    # unlike np.power, the power operator returns a Python float for a
+    # Python float, which does not promote single precision arrays
+    self.dampMineral = (self.fuel.effMineralContent ** -0.19) * 0.174
+
+  def calcPotReactionVelocity(self) :
+    """
+    Calculates the potential reaction velocity as given by Rothermel, eqn
+    38.
+    Requires:
+      self.fuel.exponentA
+      self.fuel.maxPotentialVelocity
+      self.fuel.packingRatio
+      self.fuel.optimalPacking
+    Produces:
+      self.potReactionVelocity
+    """
+    ratio = self.fuel.packingRatio / self.fuel.optimalPacking
+    self.potReactionVelocity = self.fuel.maxPotentialVelocity * \
+      np.power(ratio, self.fuel.exponentA) * \
+      np.exp(self.fuel.exponentA * (1-ratio))
+
+  def calcPropFluxRatio(self)  :
+    """
+    Calculates the propagating flux ratio (Rothermel eqn 42)
+    Requires:
+      self.fuel.sigma
+      self.fuel.packingRatio
+    Produces:
+      self.propFluxRatio attribute
+    """
+    exponential = (0.792+0.681*np.sqrt(self.fuel.sigma)) * \
+      (self.fuel.packingRatio + 0.1)
+    self.propFluxRatio = np.exp(exponential) / (192 + 0.259*self.fuel.sigma)
+
+  def calcWindCoefficients(self) :
+    """
+    Calculates the fuel dependent coefficients of the wind multiplier via
+    Rothermel's eqns (48-50).
+    Requires:
+      self.fuel.sigma
+    Produces:
+      self.windC
+      self.windB
+      self.windE
+    """
+    self.windC = 7.47 * np.exp(-0.133 * np.power(self.fuel.sigma, 0.55))
+    self.windB = 0.02526 * np.power(self.fuel.sigma, 0.54)
+    self.windE = 0.715 * np.exp(-3.59e-4 * self.fuel.sigma)
+
+  def calcWindMultiplier(self, midflameWind) :
+    """
+    Sets the "midflameWind" attribute of this model in ft/min and
+    calculates the windMultiplier via Rothermel's eqn 47.
+    Requires:
+      self.windC
+      self.windB
+      self.windE
+      self.fuel.packingRatio
+      self.fuel.optimalPacking
+    Produces:
+      self.midflameWind
+      self.windMultiplier
+    """
+    self.midflameWind = midflameWind
+    self.windMultiplier = self.windC * np.power(midflameWind,self.windB) *\
+      np.power((self.fuel.packingRatio / self.fuel.optimalPacking),-self.windE)
+
+  def calcSlopeFactor(self) :
+    """
+    Calculates the fuel dependent part of Rothermel's eqn 51.
+    Requires:
+      self.fuel.packingRatio
+    Produces:
+      self.slopeFactor
+    """
+    self.slopeFactor = 5.275 * np.power(self.fuel.packingRatio, -0.3)
+
+  def calcSlopeMultiplier(self, slope) :
+    """
+    Records the slope (in radians) in the "slopeRad" attribute and
+    calculates the "slopeMultiplier" attribute via Rothermel's eqn 51.
+    Requires:
+      self.slopeFactor
+    Produces:
+      self.slopeRad
+      self.slopeMultiplier
+    """
+    self.slopeRad = slope
+    tanSlope2 = np.tan(slope)
+    tanSlope2 = tanSlope2*tanSlope2
+    self.slopeMultiplier = self.slopeFactor * tanSlope2
+
+
+def evaluate(sigma, loading, bulkDensity, fuelMoisture, extMoisture,
+             midflameWind, slope, particleDensity=32.,
+             fuelClass=ArrayRothermelFuel, modelClass=ArrayRothermelModel) :
+  """
+  Evaluates the homogeneous-fuel Rothermel model over arrays of inputs in
+  one pass.  The arguments broadcast against one another.  midflameWind
+  is in ft/min and slope is in radians, as for RothermelModel.  Returns a
+  tuple of arrays:  (reactionIntensity, noWindRos, ros).
+  """
+  fuel = fuelClass(sigma, loading)
+  fuel.setDensity(bulkDensity, particleDensity)
+  fuel.setFuelMoisture(fuelMoisture, extMoisture)
+
+  fire = modelClass(fuel)
+  fire.setWind(midflameWind)
+  fire.setSlope(slope)
+  fire.evaluate()
+  return fire.reactionIntensity, fire.noWindRos, fire.ros
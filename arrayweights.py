@@ -0,0 +1,507 @@
+"""
+Batched counterpart of the "rothweights" and "albini" modules.  A fuel
+complex is represented compactly as a fixed (category x size class) matrix
+of per-class parameters, so that N complexes are held as arrays of shape
+(N, categories, size classes) and Rothermel's eqns 53-75 are evaluated for
+all of them at once, without building per-complex dictionaries.
+
+Size classes which are not present in a complex carry zero loading (and
+therefore zero weight).  Categories which are not present carry zero
+weight and contribute nothing to the reaction intensity.  With these
+conventions the results are identical to those of the dictionary based
+classes.
+
+Author: Bryce Nordgren / USDA Forest Service
+References :
+Rothermel, R. C. A mathematical model for predicting fire spread in
+  wildland fuels.  General Technical Report INT-115, USDA Forest Service.
+  1972. 40 p.
+Albini, F. A. Estimating Wildfire Behavior and Effects.  General Technical
+  Report INT-30, USDA Forest Service. 1976. 92 p.
+"""
+
+import numpy as np
+from arraymodel import ArrayRothermelFuel, ArrayRothermelModel, \
+                       ArrayAlbiniExponentA
+from rothweights import DEAD, LIVE, ONEHR, TENHR, HUNDREDHR
+
+# Layout of the category and size class axes
+CATEGORIES   = (DEAD, LIVE)
+SIZE_CLASSES = (ONEHR, TENHR, HUNDREDHR)
+
+def safeDivide(num, den) :
+  """
+  Divides num by den, returning zero wherever den is zero.  Used where
+  the dictionary based classes would simply have no entry to divide.
+  """
+  zero = (den == 0)
+  return np.where(zero, 0., num / np.where(zero, 1., den))
+
+
+class ArrayFuelComplex (ArrayRothermelFuel) :
+  """
+  An array of fuel complexes weighted by the method of Rothermel.  The
+  per-class inputs (Rothermel's list #1 in RothermelFuelComplex) are held
+  in arrays whose last two axes are (category, size class):
+    + classLoading            (ovendryLoading)
+    + classSigma              (sigma)
+    + classTotMineralContent  (totMineralContent)
+    + classEffMineralContent  (effMineralContent)
+    + classHeatContent        (heatContent)
+    + classMoisture           (fuelMoisture)
+    + classParticleDensity    (particleDensity)
+    + present                 (True where the size class is in the complex)
+  The per-category input extMoisture has category as its last axis, and
+  depth has no layout axes at all.
+
+  The aggregates produced by compute() have the same names as those of
+  RothermelFuelComplex.  Per-category values have category as their last
+  axis; per-complex values have no layout axes.
+  """
+  categories  = CATEGORIES
+  sizeClasses = SIZE_CLASSES
+
+  # the per-complex inputs, as opposed to computed values
+  _inputNames = ('present', 'classLoading', 'classSigma',
+                 'classParticleDensity', 'classTotMineralContent',
+                 'classEffMineralContent', 'classHeatContent',
+                 'classMoisture', 'extMoisture', 'depth')
+
+  def __init__(self, shape=()) :
+    """
+    Creates "shape" empty fuel complexes.  Use setFuelParams, setExtMoisture
+    and setDepth to fill them in.
+    """
+    ArrayRothermelFuel.__init__(self)
+    shape = tuple(shape)
+    layout = shape + (len(self.categories), len(self.sizeClasses))
+
+    self.present                = np.zeros(layout, dtype=bool)
+    self.classLoading           = np.zeros(layout)
+    self.classSigma             = np.ones(layout)
+    self.classParticleDensity   = np.full(layout, 32.)
+    self.classTotMineralContent = np.full(layout, 0.0555)
+    self.classEffMineralContent = np.full(layout, 0.01)
+    self.classHeatContent       = np.full(layout, 8000.)
+    self.classMoisture          = np.zeros(layout)
+
+    self.extMoisture = np.zeros(shape + (len(self.categories),))
+    self.depth       = np.zeros(shape)
+
+  def categoryIndex(self, category) :
+    """
+    Returns the position of category on the category axis.
+    """
+    return self.categories.index(category)
+
+  def classIndex(self, category, sizeClass) :
+    """
+    Returns the (category, size class) position of a size class within
+    the layout.
+    """
+    return (self.categoryIndex(category), self.sizeClasses.index(sizeClass))
+
+  def _setSlot(self, name, index, value) :
+    """
+    Stores value at the given layout index of the named attribute.  The
+    attribute is replaced by a new array (broadcast against value if
+    necessary) rather than modified in place, so arrays shared with other
+    complexes are never disturbed.
+    """
+    current = getattr(self, name)
+    nLayout = len(index)
+    selected = np.zeros(current.shape[-nLayout:], dtype=bool)
+    selected[index] = True
+    value = np.expand_dims(value, tuple(range(-nLayout, 0)))
+    setattr(self, name, np.where(selected, value, current))
+
+  def setFuelParams(self, category, fuelClass, fuel) :
+    """
+    Copies the parameters of a "fuel" instance into the given category
+    and size class of every complex.
+    """
+    index = self.classIndex(category, fuelClass)
+    self._setSlot('present', index, True)
+    self._setSlot('classLoading', index, fuel.ovendryLoading)
+    self._setSlot('classSigma', index, fuel.sigma)
+    self._setSlot('classParticleDensity', index, fuel.particleDensity)
+    self._setSlot('classTotMineralContent', index, fuel.totMineralContent)
+    self._setSlot('classEffMineralContent', index, fuel.effMineralContent)
+    self._setSlot('classHeatContent', index, fuel.heatContent)
+    if fuel.fuelMoisture is not None :
+      self._setSlot('classMoisture', index, fuel.fuelMoisture)
+
+  def setExtMoisture(self, category, moisture) :
+    """
+    Set the extinction moisture averaged over all the classes in a given
+    category.
+    """
+    self._setSlot('extMoisture', (self.categoryIndex(category),), moisture)
+
+  def setDepth(self, depth) :
+    """
+    Set the depth of the fuel bed.  (ft)
+    """
+    self.depth = np.asarray(depth, dtype=float)
+
+  def setFuelMoisture(self, category, sizeClass, moisture) :
+    """
+    Sets the fuel moisture of the particular size class/category
+    combination.  moisture may be an array, in which case the complexes
+    are broadcast against it.
+    """
+    self._setSlot('classMoisture', self.classIndex(category, sizeClass),
+                  moisture)
+
+  def setClassMoistures(self, moistures) :
+    """
+    Replaces the whole classMoisture array.  moistures must have
+    (category, size class) as its last two axes.
+    """
+    self.classMoisture = np.asarray(moistures, dtype=float)
+
+  @classmethod
+  def fromFuelComplex(cls, fuelComplex) :
+    """
+    Converts a single dictionary based fuel complex (e.g., one produced by
+    the factories in the "nffl" module) into an array complex with no
+    leading axes.
+    """
+    result = cls()
+    for cat, classes in fuelComplex.fuelParameters.items() :
+      for sizeClass, fuel in classes.items() :
+        result.setFuelParams(cat, sizeClass, fuel)
+    for cat, moisture in fuelComplex.extMoisture.items() :
+      result.setExtMoisture(cat, moisture)
+    result.setDepth(fuelComplex.depth)
+    return result
+
+  @classmethod
+  def stack(cls, complexes) :
+    """
+    Stacks a sequence of array complexes which have not yet been computed
+    into a single array complex with a new leading axis.
+    """
+    result = cls()
+    for name in cls._inputNames :
+      setattr(result, name,
+              np.stack([getattr(c, name) for c in complexes]))
+    return result
+
+  def calcClassNetFuelLoading(self) :
+    """
+    Calculates the net fuel loading of every size class (Rothermel eqn 24).
+    Requires:
+      self.classLoading
+      self.classTotMineralContent
+    Produces:
+      self.classNetFuelLoading
+    """
+    self.classNetFuelLoading = self.classLoading / \
+                               (1+self.classTotMineralContent)
+
+  def calcMeanSurfaceArea(self) :
+    """
+    Calculates the mean total surface area of each size class, each
+    category and the whole complex, per Rothermel eqns 53, 54 and 55.
+    """
+    self.classAreas = np.where(self.present,
+                               (self.classSigma * self.classLoading) / \
+                               self.classParticleDensity, 0.)
+    self.categoryAreas = self.classAreas.sum(axis=-1)
+    self.totalArea = self.categoryAreas.sum(axis=-1)
+
+  def calcWeightingParameters(self) :
+    """
+    Calculates the weighting parameters by Rothermel equations 56 and 57
+    after bringing the surface areas up to date.
+    """
+    self.calcMeanSurfaceArea()
+
+    # eqn 57 ; total category weight
+    self.categoryWeighting = self.categoryAreas / self.totalArea[..., None]
+
+    # eqn 56 ; weighting for an individual fuel size class
+    self.classWeighting = safeDivide(self.classAreas,
+                                     self.categoryAreas[..., None])
+
+  def calcNetFuelLoading(self) :
+    "To prevent parent's method from screwing up the aggregate value"
+    pass
+
+  def categoryPresent(self) :
+    """
+    Returns a boolean array, with category as its last axis, which is True
+    where the category has at least one size class.
+    """
+    return self.present.any(axis=-1)
+
+  def aggregateIntoCategories(self) :
+    """
+    Aggregates fuel complex parameters by category, producing arrays with
+    category as their last axis.
+    """
+    self.calcClassNetFuelLoading()
+    wgt = self.classWeighting
+
+    #eqn 59
+    self.netFuelLoading = (wgt * self.classNetFuelLoading).sum(axis=-1)
+
+    #eqn 61
+    self.heatContent = (wgt * self.classHeatContent).sum(axis=-1)
+
+    #eqn 63
+    self.effMineralContent = (wgt * self.classEffMineralContent).sum(axis=-1)
+
+  def aggregateMoisture(self) :
+    """
+    Aggregates the size class moistures by category (Rothermel eqn 66) and
+    calculates the heat of ignition of every size class (Rothermel eqn 12).
+    This is the only part of the aggregation which depends on the fuel
+    moistures.
+    """
+    self.fuelMoisture = (self.classWeighting * self.classMoisture).sum(axis=-1)
+    self.classHeatOfIgnition = 250. + 1116 * self.classMoisture
+
+  def aggregateIntoComplex(self) :
+    """
+    Aggregates the parameters into the once-per-complex descriptors.
+    """
+    wgt = self.classWeighting
+
+    # eqn 72
+    catSigma = (wgt * self.classSigma).sum(axis=-1)
+    sigma = (self.categoryWeighting * catSigma).sum(axis=-1)
+
+    # eqn 73
+    packingRatio = (wgt * self.classLoading / \
+                    self.classParticleDensity).sum(axis=(-2, -1))
+
+    # eqn 74
+    bulkDensity = (wgt * self.classLoading).sum(axis=(-2, -1))
+
+    self.bulkDensity = bulkDensity / self.depth
+    self.packingRatio = packingRatio / self.depth
+
+    self.setSigma(sigma)
+
+    # heating efficiency of the individual size classes (eqn 14)
+    self.classHeatingEfficiency = np.exp(-138/self.classSigma)
+
+  def computeStatic(self) :
+    """
+    Calculates all the per-category and per-complex values which do not
+    depend on the fuel moistures.
+    """
+    self.calcWeightingParameters()
+    self.aggregateIntoCategories()
+    self.aggregateIntoComplex()
+
+  def compute(self) :
+    """
+    Call this method once all the fuel components have been set.  This
+    method calculates all the per-category and per-complex values from
+    the components.
+    """
+    self.computeStatic()
+    self.aggregateMoisture()
+
+  def calcLivingExtMoisture(self) :
+    """
+    Calculates the moisture of extinction for living fuel (Rothermel eqn
+    88) for every complex having live one hour fuel.  Other complexes are
+    left untouched.
+    Requires:
+      + dead and live one hour fuel loadings
+      + fine dead fuel moisture
+    Produces:
+      + live fine fuel moisture of extinction
+    """
+    dead = self.classIndex(DEAD, ONEHR)
+    live = self.classIndex(LIVE, ONEHR)
+    liveLoading = self.classLoading[(Ellipsis,) + live]
+    totalMass = self.classLoading[(Ellipsis,) + dead] + liveLoading
+    massRatio = safeDivide(liveLoading, totalMass)
+    ext = 2.9 * safeDivide(1-massRatio, massRatio)
+    ext = ext * (1. - (10./3.) * self.classMoisture[(Ellipsis,) + dead])
+    ext = ext - 0.226
+
+    current = self.extMoisture[..., self.categoryIndex(LIVE)]
+    self.setExtMoisture(LIVE, np.where(liveLoading > 0, ext, current))
+
+
+class ArrayAlbiniFuelComplex (ArrayFuelComplex) :
+  """
+  An array of fuel complexes weighted by the method of Albini.
+  """
+  calcExponentA = ArrayAlbiniExponentA
+
+  def calcClassNetFuelLoading(self) :
+    """
+    Calculates the net fuel loading of every size class (Albini's
+    Appendix III, item 1).
+    Requires:
+      self.classLoading
+      self.classTotMineralContent
+    Produces:
+      self.classNetFuelLoading
+    """
+    self.classNetFuelLoading = self.classLoading * \
+                               (1-self.classTotMineralContent)
+
+  def calcWPrime(self) :
+    """
+    Calculates the weighting parameter for the live moisture computation.
+    Requires:
+      + classLoading, classSigma
+    Produces:
+      + wPrime                (one value per complex)
+    """
+    dead = self.categoryIndex(DEAD)
+    live = self.categoryIndex(LIVE)
+    num = np.where(self.present[..., dead, :],
+                   self.classLoading[..., dead, :] *
+                   np.exp(-138./self.classSigma[..., dead, :]), 0.)
+    den = np.where(self.present[..., live, :],
+                   self.classLoading[..., live, :] *
+                   np.exp(-500./self.classSigma[..., live, :]), 0.)
+    self.wPrime = safeDivide(num.sum(axis=-1), den.sum(axis=-1))
+
+  def calcMPrime(self) :
+    """
+    Calculates the weighted dead fuel moisture.
+    Requires:
+      + classLoading, classSigma, classMoisture
+    Produces:
+      + mPrime                (one value per complex)
+    """
+    dead = self.categoryIndex(DEAD)
+    term = np.where(self.present[..., dead, :],
+                    self.classLoading[..., dead, :] *
+                    np.exp(-138./self.classSigma[..., dead, :]), 0.)
+    num = (term * self.classMoisture[..., dead, :]).sum(axis=-1)
+    self.mPrime = safeDivide(num, term.sum(axis=-1))
+
+  def calcLivingExtMoisture(self) :
+    """
+    Calculates the moisture of extinction for living fuel by the method
+    in Albini appendix III for every complex having live one hour fuel.
+    Other complexes are left untouched.
+    """
+    live = self.classIndex(LIVE, ONEHR)
+    liveLoading = self.classLoading[(Ellipsis,) + live]
+
+    self.calcWPrime()
+    self.calcMPrime()
+    deadExt = self.extMoisture[..., self.categoryIndex(DEAD)]
+    ext = 2.9 * self.wPrime
+    ext = ext * (1. - safeDivide(self.mPrime, deadExt))
+    ext = ext - 0.226
+
+    current = self.extMoisture[..., self.categoryIndex(LIVE)]
+    self.setExtMoisture(LIVE, np.where(liveLoading > 0, ext, current))
+
+
+class ArrayWeightedRothermelModel (ArrayRothermelModel) :
+  """
+  Batched form of rothweights.WeightedRothermelModel.  The fuel must be an
+  ArrayFuelComplex on which compute() has been called.
+  """
+
+  def calcMineralDamping(self) :
+    """
+    Calculates the mineral damping coefficients by category.  eqn. 62.
+    Requires:
+      self.fuel.effMineralContent (by category)
+    Produces:
+      self.dampMineral (by category)
+    """
+    present = self.fuel.categoryPresent()
+    eff = np.where(present, self.fuel.effMineralContent, 1.)
+    self.dampMineral = np.where(present, np.power(eff, -0.19) * 0.174, 0.)
+
+  def calcMoistureDamping(self) :
+    """
+    Calculates the moisture damping coefficient according to Rothermel,
+    eqn. 64.
+    Requires:
+      self.fuel.fuelMoisture (by category)
+      self.fuel.extMoisture  (by category)
+    Produces:
+      self.dampMoisture      (by category)
+    """
+    present = self.fuel.categoryPresent()
+    ratio = safeDivide(self.fuel.fuelMoisture, self.fuel.extMoisture)
+    damp = 1 - 2.59 * ratio
+
+    ratio2 = ratio * ratio
+    damp = damp + 5.11 * ratio2
+
+    ratio3 = ratio2 * ratio
+    damp = damp - 3.52 * ratio3
+    self.dampMoisture = np.where(present, damp, 0.)
+
+  def calcReactionIntensity(self) :
+    """
+    Calculates the reaction intensity according to Rothermel, eqn. 58.
+    Requires:
+      self.dampMoisture        (by category)
+      self.dampMineral         (by category)
+      self.potReactionVelocity
+      self.fuel.categoryWeighting (by category)
+      self.fuel.netFuelLoading (by category)
+      self.fuel.heatContent    (by category)
+    Produces:
+      self.reactionIntensity
+    """
+    sum = (self.fuel.categoryWeighting * self.fuel.netFuelLoading * \
+           self.fuel.heatContent * self.dampMoisture * \
+           self.dampMineral).sum(axis=-1)
+    self.reactionIntensity = sum * self.potReactionVelocity
+
+  def calcNoWindRos(self) :
+    """
+    Calculates the no-wind rate of spread via Rothermel's eqn 75.
+    Requires:
+      self.fuel.classHeatOfIgnition     (by category and size class)
+      self.fuel.classHeatingEfficiency  (by category and size class)
+      self.fuel.classWeighting          (by category and size class)
+      self.fuel.categoryWeighting       (by category)
+      self.fuel.bulkDensity
+      self.propFluxRatio
+      self.reactionIntensity
+    Produces:
+      self.noWindRos
+    """
+    sources = self.propFluxRatio * self.reactionIntensity
+    innerSum = (self.fuel.classWeighting * self.fuel.classHeatOfIgnition * \
+                self.fuel.classHeatingEfficiency).sum(axis=-1)
+    sinks = (self.fuel.categoryWeighting * innerSum).sum(axis=-1)
+    self.noWindRos = sources / sinks
+
+
+class ArrayWeightedAlbiniModel (ArrayWeightedRothermelModel) :
+  """
+  Batched form of albini.WeightedAlbiniModel.
+  """
+
+  def calcReactionIntensity(self) :
+    """
+    Calculates the reaction intensity according to Albini, Appendix III.
+    Requires:
+      self.dampMoisture        (by category)
+      self.dampMineral         (by category)
+      self.potReactionVelocity
+      self.fuel.netFuelLoading (by category)
+      self.fuel.heatContent    (by category)
+    Produces:
+      self.reactionIntensity
+    """
+    sum = (self.fuel.netFuelLoading * self.fuel.heatContent * \
+           self.dampMoisture * self.dampMineral).sum(axis=-1)
+    self.reactionIntensity = sum * self.potReactionVelocity
+
+
+# the (complex, fire model) classes of each weighting scheme
+SCHEMES = { 'rothermel' : (ArrayFuelComplex, ArrayWeightedRothermelModel),
+            'albini'    : (ArrayAlbiniFuelComplex, ArrayWeightedAlbiniModel) }
@@ -0,0 +1,227 @@
+"""
+Fire arrival times over a raster landscape by minimum travel time.  Fire
+spreads from cell center to cell center along a fixed set of neighbor
+directions; the time to cross each half of an edge is its length divided
+by the rate of spread of that cell in the direction of the edge, taken
+from the cell's spread ellipse (see the "spread" module).  Arrival times
+are then the shortest path times from the ignitions, found by Dijkstra's
+algorithm with an indexed binary heap, which holds at most one entry per
+cell so that memory does not grow with the number of relaxed edges.
+
+The rasters are row 0 north, column 0 west, as in the "growth" module.
+Times are in minutes and distances in feet.  Unburned cells have an arrival
+time of NaN.
+"""
+
+import math
+import numpy as np
+
+# neighbor offsets (rows, columns), row 0 north
+NEIGHBORS_8 = ((-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1),
+               (-1, -1))
+NEIGHBORS_16 = NEIGHBORS_8 + ((-2, 1), (-1, 2), (1, 2), (2, 1), (2, -1),
+                              (1, -2), (-1, -2), (-2, -1))
+
+class IndexedHeap :
+  """
+  A binary min heap of integer items (0 <= item < size) with priorities,
+  which supports lowering the priority of an item already in the heap.
+
+  Attributes:
+  position                        array of the index of each item in the
+                                  heap; -1 if not in the heap
+  """
+
+  def __init__(self, size) :
+    self.position = np.full(size, -1, dtype=np.int64)
+    self._items = []
+    self._keys = []
+
+  def __len__(self) :
+    return len(self._items)
+
+  def __contains__(self, item) :
+    return self.position[item] >= 0
+
+  def push(self, item, key) :
+    """
+    Adds item with priority key, or lowers its priority to key if it is
+    already in the heap with a higher one.
+    """
+    index = self.position[item]
+    if index < 0 :
+      index = len(self._items)
+      self._items.append(item)
+      self._keys.append(key)
+    elif key < self._keys[index] :
+      self._keys[index] = key
+    else :
+      return
+    self._siftUp(index)
+
+  def pop(self) :
+    """
+    Removes and returns the (item, key) of lowest priority.
+    """
+    items = self._items
+    keys = self._keys
+    item = items[0]
+    key = keys[0]
+    self.position[item] = -1
+    lastItem = items.pop()
+    lastKey = keys.pop()
+    if items :
+      items[0] = lastItem
+      keys[0] = lastKey
+      self._siftDown(0)
+    return item, key
+
+  def _siftUp(self, index) :
+    items = self._items
+    keys = self._keys
+    item = items[index]
+    key = keys[index]
+    while index > 0 :
+      parent = (index - 1) >> 1
+      if keys[parent] <= key :
+        break
+      items[index] = items[parent]
+      keys[index] = keys[parent]
+      self.position[items[index]] = index
+      index = parent
+    items[index] = item
+    keys[index] = key
+    self.position[item] = index
+
+  def _siftDown(self, index) :
+    items = self._items
+    keys = self._keys
+    size = len(items)
+    item = items[index]
+    key = keys[index]
+    while True :
+      child = 2 * index + 1
+      if child >= size :
+        break
+      if child + 1 < size and keys[child + 1] < keys[child] :
+        child += 1
+      if keys[child] >= key :
+        break
+      items[index] = items[child]
+      keys[index] = keys[child]
+      self.position[items[index]] = index
+      index = child
+    items[index] = item
+    keys[index] = key
+    self.position[item] = index
+
+
+class ArrivalTimeSolver :
+  """
+  Computes fire arrival times from ignition cells.
+
+  Attributes:
+  headRos          ft/min         raster of head fire rate of spread
+  direction        degrees        raster of the azimuth of maximum spread
+  lengthToBreadth                 raster of ellipse length to breadth ratios
+  cellSize         ft             width of a (square) cell
+  shape                           (rows, columns) of the rasters
+  neighbors                       the (row, column) offsets along which fire
+                                  spreads
+  visited                         after solve, the number of cells whose
+                                  arrival time was settled
+  """
+
+  def __init__(self, headRos, direction, lengthToBreadth, cellSize,
+               neighbors=NEIGHBORS_8) :
+    self.headRos = headRos
+    self.direction = direction
+    self.lengthToBreadth = lengthToBreadth
+    self.cellSize = float(cellSize)
+    self.shape = np.shape(headRos)
+    self.neighbors = neighbors
+    self.visited = 0
+
+  @classmethod
+  def fromSpreadLandscape(cls, outputs, cellSize, neighbors=NEIGHBORS_8) :
+    """
+    Makes an ArrivalTimeSolver from the outputs of SpreadLandscape.run.
+    """
+    return cls(outputs['headRos'], outputs['spreadDirection'],
+               outputs['lengthToBreadth'], cellSize, neighbors)
+
+  def _edges(self) :
+    """
+    Returns, for each neighbor, (row offset, column offset, half of its
+    length, sine and cosine of its azimuth).
+    """
+    edges = []
+    for (dRow, dCol) in self.neighbors :
+      azimuth = math.atan2(dCol, -dRow)
+      edges.append((dRow, dCol, 0.5 * self.cellSize * math.hypot(dRow, dCol),
+                    math.sin(azimuth), math.cos(azimuth)))
+    return edges
+
+  def solve(self, ignitions, horizon=None) :
+    """
+    Returns the raster of arrival times (float32, NaN if unburned) from the
+    ignitions, a list of (row, column) or (row, column, time) cells.  Cells
+    which would burn after horizon minutes are left unburned.
+    """
+    (rows, cols) = self.shape
+    size = rows * cols
+
+    # the rate of spread of a cell in the direction of azimuth theta is
+    # scale / (1 - eccentricity * cos(theta - direction))
+    ratio = np.maximum(np.ravel(np.asarray(self.lengthToBreadth,
+                                           dtype=float)), 1.)
+    eccentricity = np.sqrt(1. - 1. / (ratio * ratio))
+    headRos = np.maximum(np.ravel(np.asarray(self.headRos, dtype=float)), 0.)
+    scale = headRos * (1. - eccentricity)
+    theta = np.radians(np.ravel(np.asarray(self.direction, dtype=float)))
+    eSin = eccentricity * np.sin(theta)
+    eCos = eccentricity * np.cos(theta)
+    del ratio, eccentricity, headRos, theta
+
+    arrival = np.full(size, np.inf)
+    done = np.zeros(size, dtype=bool)
+    heap = IndexedHeap(size)
+    for ignition in ignitions :
+      start = ignition[2] if len(ignition) > 2 else 0.
+      cell = ignition[0] * cols + ignition[1]
+      if start < arrival[cell] :
+        arrival[cell] = start
+        heap.push(cell, start)
+
+    edges = self._edges()
+    if horizon is None :
+      horizon = np.inf
+    visited = 0
+    while len(heap) :
+      (cell, time) = heap.pop()
+      if time > horizon :
+        break
+      done[cell] = True
+      visited += 1
+      if scale[cell] <= 0. :
+        continue
+      (row, col) = divmod(cell, cols)
+      for (dRow, dCol, half, sin, cos) in edges :
+        r = row + dRow
+        c = col + dCol
+        if r < 0 or r >= rows or c < 0 or c >= cols :
+          continue
+        neighbor = r * cols + c
+        if done[neighbor] or scale[neighbor] <= 0. :
+          continue
+        # the time to cross the half edge in each cell is half / ros(azimuth)
+        t = time + half * (1. - eSin[cell] * sin - eCos[cell] * cos) / \
+            scale[cell] + half * (1. - eSin[neighbor] * sin -
+                                  eCos[neighbor] * cos) / scale[neighbor]
+        if t < arrival[neighbor] :
+          arrival[neighbor] = t
+          heap.push(neighbor, t)
+
+    self.visited = visited
+    arrival[~done] = np.nan
+    return arrival.reshape(self.shape).astype(np.float32)
@@ -0,0 +1,304 @@
+"""
+Vectorized counterparts of the fire behavior prediction elements in the
+"fbp" module, for the named NFFL fuel models.  The moisture, wind and slope
+independent values of each named model are computed once per process, and
+each call to evaluate() runs only the scenario dependent part of the
+calculation, over arrays of scenarios.  Results are the same as those of
+RothermelFBP and AlbiniFBP.
+
+The scenarios may be evaluated in single precision (dtype=np.float32),
+which halves the memory their arrays take, though large batches run only
+about 1.2 times faster.  The static values are then still computed in
+double precision, once, and stored in single precision;  the scenario
+dependent part runs in single precision.  See the "precision" module for
+the resulting accuracy.
+
+References:
+Anderson, H. E. Heat transfer and fire spread.  Research Paper INT-69,
+  USDA Forest Service. 1969. 20 p.
+"""
+
+import copy
+import threading
+import numpy as np
+import nffl
+import behavior
+import sensitivity
+from rothweights import LIVE, DEAD, ONEHR, TENHR, HUNDREDHR
+from arraymodel import castFloats
+from arrayweights import ArrayFuelComplex, ArrayAlbiniFuelComplex, \
+                         ArrayWeightedRothermelModel, ArrayWeightedAlbiniModel
+
+#
+# Static array fuel complexes and fire models, computed at most once per
+# process for each combination of model name, batch FBP class and dtype.
+#
+_staticModels = {}
+_staticModelsLock = threading.Lock()
+
+# the names under which moistureInputs looks up the moisture of each
+# (category, size class)
+MOISTURE_NAMES = ((DEAD, ONEHR, 'oneHour'), (DEAD, TENHR, 'tenHour'),
+                  (DEAD, HUNDREDHR, 'hundredHour'), (LIVE, ONEHR, 'live'))
+
+class BatchRothermelFBP :
+  """
+  Evaluates a named NFFL fuel model over arrays of scenarios using the
+  Rothermel weighting scheme.
+
+  Attributes (after evaluate):
+  rateOfSpread       ft/min       rate of spread, negative values clamped to 0
+  reactionIntensity  BTU/ft^2/min reaction intensity, as reported by
+                                  RothermelFBP.getHeatPerArea
+  residenceTime      min          flame residence time, 384 / sigma
+  heatPerUnitArea    BTU/ft^2     reactionIntensity * residenceTime
+  fuelComplex                     the ArrayFuelComplex of the last evaluation
+  fireModel                       the array fire model of the last evaluation
+  dtype                           the floating point type of the evaluation
+  """
+  fuelModelMethods = { '1' : nffl.nffl1,   '2' : nffl.nffl2,
+                       '3' : nffl.nffl3,   '4' : nffl.nffl4,
+                       '5' : nffl.nffl5,   '6' : nffl.nffl6,
+                       '7' : nffl.nffl7,   '8' : nffl.nffl8,
+                       '9' : nffl.nffl9,   '10' : nffl.nffl10,
+                       '11' : nffl.nffl11, '12' : nffl.nffl12,
+                       '13' : nffl.nffl13 }
+  fuelModelNames = fuelModelMethods.keys()
+
+  # Produce Rothermel-weighted fuel classes
+  _fbpFireModelClass = ArrayWeightedRothermelModel
+  _fbpFuelModelClass = ArrayFuelComplex
+
+  fuelModelName     = None
+  fuelComplex       = None
+  fireModel         = None
+  rateOfSpread      = None
+  reactionIntensity = None
+  residenceTime     = None
+  heatPerUnitArea   = None
+
+  def __init__(self, modelName=None, dtype=np.float64) :
+    self.dtype = np.dtype(dtype)
+    if modelName is not None :
+      self.setNamedFuelModel(modelName)
+
+  def _staticModel(self, modelName) :
+    """
+    Returns the (fuel complex, fire model) pair holding the static values
+    of the named model, computing it if this is the first request.
+    """
+    key = (modelName, self.__class__, self.dtype)
+    static = _staticModels.get(key)
+    if static is None :
+      fuel = nffl.arrayFuelComplex(modelName, self._fbpFuelModelClass)
+      fuel.computeStatic()
+      fire = self._fbpFireModelClass(fuel)
+      fire.evaluateStatic()
+      if self.dtype != np.float64 :
+        fuel = castFloats(fuel, self.dtype)
+        fire = castFloats(fire, self.dtype)
+        fire.fuel = fuel
+      static = (fuel, fire)
+      with _staticModelsLock :
+        static = _staticModels.setdefault(key, static)
+    return static
+
+  def setNamedFuelModel(self, modelName) :
+    """
+    Selects one of the named NFFL fuel models.
+    """
+    if not (modelName in self.fuelModelMethods) :
+      raise ValueError("Unknown fuel model: " + str(modelName))
+    self.fuelModelName = modelName
+    self._static = self._staticModel(modelName)
+
+  def hasLiveFuel(self) :
+    """
+    Returns True if the selected fuel model has live fuels.
+    """
+    fuel = self._static[0]
+    return bool(fuel.categoryPresent()[fuel.categoryIndex(LIVE)])
+
+  def sizeClasses(self, category) :
+    """
+    Returns the size classes of the given category (DEAD or LIVE) which
+    the selected fuel model has.
+    """
+    fuel = self._static[0]
+    return tuple([sizeClass for sizeClass in fuel.sizeClasses
+                  if fuel.present[fuel.classIndex(category, sizeClass)]])
+
+  def moistureInputs(self, inputs) :
+    """
+    Returns the (deadMoistures, liveMoistures) arguments of evaluate for
+    the size classes the selected fuel model has.  inputs is a dictionary
+    of the names in MOISTURE_NAMES to moistures, or a function of those
+    names;  only the moistures the model needs are looked up.
+    """
+    moistures = { DEAD : {}, LIVE : {} }
+    for (category, sizeClass, name) in MOISTURE_NAMES :
+      if sizeClass in self.sizeClasses(category) :
+        if callable(inputs) :
+          moistures[category][sizeClass] = inputs(name)
+        else :
+          moistures[category][sizeClass] = inputs[name]
+    return moistures[DEAD], moistures[LIVE]
+
+  def _setMoistures(self, fuel, category, moistures) :
+    for sizeClass, moisture in moistures.items() :
+      if not fuel.present[fuel.classIndex(category, sizeClass)] :
+        raise ValueError("Size class: " + sizeClass + " not in fuel model.")
+      fuel.setFuelMoisture(category, sizeClass,
+                           np.asarray(moisture, dtype=self.dtype))
+
+  def evaluate(self, deadMoistures, liveMoistures, midflameWindSpeed,
+               slope) :
+    """
+    Evaluates the selected fuel model.  deadMoistures and liveMoistures
+    are dictionaries of size class to (arrays of) moisture fractions,
+    midflameWindSpeed is in mi/h and slope is in degrees, as for
+    RothermelFBP.  All arrays broadcast against one another, and are
+    converted to dtype.  Returns the tuple (rateOfSpread,
+    reactionIntensity).
+    """
+    if self.fuelModelName is None :
+      raise AttributeError("Set the fuel model before evaluating!")
+
+    # shallow copies share the static arrays, which are never modified in
+    # place.
+    (staticFuel, staticFire) = self._static
+    fuel = copy.copy(staticFuel)
+    fire = copy.copy(staticFire)
+    fire.fuel = fuel
+
+    self._setMoistures(fuel, DEAD, deadMoistures)
+    if liveMoistures :
+      if not self.hasLiveFuel() :
+        raise ValueError("This fuel model does not have live fuels!!")
+      self._setMoistures(fuel, LIVE, liveMoistures)
+
+    fuel.aggregateMoisture()
+    if self.hasLiveFuel() :
+      fuel.calcLivingExtMoisture()
+
+    slope = np.asarray(slope, dtype=self.dtype)
+    midflameWindSpeed = np.asarray(midflameWindSpeed, dtype=self.dtype)
+    fire.calcSlopeMultiplier(np.radians(slope))
+    fire.calcWindMultiplier(midflameWindSpeed * (5280. / 60.))
+    fire.evaluateScenario()
+
+    self.fuelComplex = fuel
+    self.fireModel = fire
+    self.rateOfSpread = np.maximum(fire.ros, 0.)
+    self.reactionIntensity = np.maximum(fire.reactionIntensity, 0.)
+    self.residenceTime = behavior.residenceTime(fuel.sigma)
+    self.heatPerUnitArea = self.reactionIntensity * self.residenceTime
+    return self.rateOfSpread, self.reactionIntensity
+
+  def evaluateBehavior(self, deadMoistures, liveMoistures, midflameWindSpeed,
+                       slope, canopyBaseHeight=None, canopyBulkDensity=None,
+                       foliarMoisture=1.0, twentyFootWindSpeed=None,
+                       crownLiveMoisture=None, crownDeadMoistures=None) :
+    """
+    Evaluates the selected fuel model as evaluate does, and derives the
+    fire behavior outputs of the "behavior" module from the same batch:
+    fireline intensity, flame length, heat per unit area, crown fire
+    initiation, crown fire rate of spread and fire type.  The canopy base
+    height (ft), canopy bulk density (lb/ft^3), foliar moisture (fraction)
+    and 20 ft wind speed (mi/h) broadcast against the other inputs;
+    without a canopy base height every fire is a surface fire.  Unlike
+    evaluate, moistures of size classes which the selected model does not
+    have are ignored by the surface fire, so the same dictionaries may
+    describe both fires.
+
+    The crown fire rate of spread is Rothermel's (1991), from NFFL model
+    10 with the dead moistures crownDeadMoistures (by default,
+    deadMoistures;  all three size classes must be given), 0.4 times the
+    20 ft wind speed (by default, the midflame wind speed) and no slope.
+    Its live moisture is crownLiveMoisture, which defaults to the live 1 hr
+    moisture of liveMoistures.  Returns a dictionary of
+    behavior.OUTPUT_NAMES to arrays.
+    """
+    surfaceDead = dict([(sizeClass, moisture)
+                        for (sizeClass, moisture) in deadMoistures.items()
+                        if sizeClass in self.sizeClasses(DEAD)])
+    surfaceLive = {}
+    if liveMoistures :
+      surfaceLive = dict([(sizeClass, moisture)
+                          for (sizeClass, moisture) in liveMoistures.items()
+                          if sizeClass in self.sizeClasses(LIVE)])
+    self.evaluate(surfaceDead, surfaceLive, midflameWindSpeed, slope)
+    crown = None
+    if canopyBaseHeight is not None :
+      if crownDeadMoistures is None :
+        crownDeadMoistures = deadMoistures
+      for sizeClass in (ONEHR, TENHR, HUNDREDHR) :
+        if not (sizeClass in crownDeadMoistures) :
+          raise ValueError("Crown fire needs the " + sizeClass +
+                           " moisture.")
+      if crownLiveMoisture is None :
+        if not (liveMoistures and ONEHR in liveMoistures) :
+          raise ValueError("Crown fire needs a live moisture.")
+        crownLiveMoisture = liveMoistures[ONEHR]
+      crownWind = midflameWindSpeed
+      if twentyFootWindSpeed is not None :
+        crownWind = np.multiply(twentyFootWindSpeed, 0.4)
+      model10 = self.__class__('10', self.dtype)
+      model10.evaluate(crownDeadMoistures, { ONEHR : crownLiveMoisture },
+                       crownWind, 0.)
+      crown = behavior.crownRos(model10.rateOfSpread)
+    return behavior.outputs(self.rateOfSpread, self.reactionIntensity,
+                            self.fuelComplex.sigma, canopyBaseHeight,
+                            canopyBulkDensity, foliarMoisture, crown)
+
+  def sensitivities(self, deadMoistures, liveMoistures, midflameWindSpeed,
+                    slope) :
+    """
+    Evaluates the selected fuel model as evaluate does, and also returns
+    the exact partial derivatives of rateOfSpread and reactionIntensity
+    with respect to the class moistures, loadings and sigmas, the midflame
+    wind speed (per mi/h) and the slope (per degree).  Returns a dictionary
+    of output name to a dictionary of input name to array; see
+    sensitivity.evaluateComplex.  Derivatives are zero where an output is
+    clamped to zero.
+    """
+    if self.fuelModelName is None :
+      raise AttributeError("Set the fuel model before evaluating!")
+
+    fuel = copy.copy(self._static[0])
+    self._setMoistures(fuel, DEAD, deadMoistures)
+    if liveMoistures :
+      if not self.hasLiveFuel() :
+        raise ValueError("This fuel model does not have live fuels!!")
+      self._setMoistures(fuel, LIVE, liveMoistures)
+
+    (fire, derivatives) = sensitivity.evaluateComplex(fuel,
+      np.multiply(midflameWindSpeed, 5280. / 60.), np.radians(slope),
+      self._fbpFireModelClass)
+
+    result = {}
+    for (output, name) in (('ros', 'rateOfSpread'),
+                           ('reactionIntensity', 'reactionIntensity')) :
+      clamped = getattr(fire, output) < 0.
+      result[name] = {}
+      for (input, derivative) in derivatives[output].items() :
+        if input == 'midflameWind' :
+          derivative = derivative * (5280. / 60.)
+        elif input == 'slope' :
+          derivative = derivative * (np.pi / 180.)
+        if derivative.ndim > clamped.ndim :
+          mask = clamped[..., np.newaxis, np.newaxis]
+        else :
+          mask = clamped
+        result[name][input] = np.where(mask, 0., derivative)
+    return result
+
+
+class BatchAlbiniFBP (BatchRothermelFBP) :
+  """
+  Evaluates a named NFFL fuel model over arrays of scenarios using the
+  Albini weighting scheme.
+  """
+  # Produce Albini-weighted fuel classes
+  _fbpFireModelClass = ArrayWeightedAlbiniModel
+  _fbpFuelModelClass = ArrayAlbiniFuelComplex
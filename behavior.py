@@ -0,0 +1,167 @@
+"""
+Fire behavior derived from the outputs of the surface fire spread model:
+heat per unit area, fireline intensity and flame length, crown fire
+initiation (Van Wagner) and crown fire rate of spread (Rothermel 1991).
+The functions accept scalars or NumPy arrays, and outputs() derives all of
+them for whole arrays of cells in one pass;  see also
+BatchRothermelFBP.evaluateBehavior.
+
+Units are those of the rest of the package:  ft, ft/min, BTU/ft^2,
+BTU/ft/s, lb/ft^3 and moisture fractions.  Van Wagner's equations are in
+SI units, and are converted.  Floating point arrays keep their precision,
+so single precision surface outputs give single precision behavior.
+
+References:
+Anderson, H. E. Heat transfer and fire spread.  Research Paper INT-69,
+  USDA Forest Service. 1969. 20 p.
+Byram, G. M. Combustion of forest fuels.  In: Davis, K. P., ed. Forest
+  fire: control and use.  New York: McGraw-Hill. 1959. p. 61-89.
+Van Wagner, C. E. Conditions for the start and spread of crown fire.
+  Canadian Journal of Forest Research 7: 23-34. 1977.
+Rothermel, R. C. Predicting behavior and size of crown fires in the
+  northern Rocky Mountains.  Research Paper INT-438, USDA Forest Service.
+  1991. 46 p.
+"""
+
+import numpy as np
+
+# fire types
+SURFACE = 0
+PASSIVE = 1
+ACTIVE  = 2
+
+# unit conversions
+KW_PER_M_PER_BTU_PER_FT_S = 3.4613
+M_PER_FT                  = 0.3048
+KG_M3_PER_LB_FT3          = 16.0185
+
+# the names of the arrays produced by outputs()
+OUTPUT_NAMES = ('residenceTime', 'heatPerUnitArea', 'firelineIntensity',
+                'flameLength', 'criticalIntensity', 'crownInitiation',
+                'crownRateOfSpread', 'criticalCrownRos', 'fireType',
+                'spreadRate')
+
+def residenceTime(sigma) :
+  """
+  Anderson's flame residence time (min) from the characteristic surface
+  area to volume ratio (1/ft) of the fuel bed.
+  """
+  return 384. / np.asarray(sigma)
+
+def heatPerUnitArea(reactionIntensity, sigma) :
+  """
+  The heat per unit area (BTU/ft^2):  the reaction intensity
+  (BTU/ft^2/min) times the flame residence time.
+  """
+  return np.multiply(reactionIntensity, residenceTime(sigma))
+
+def firelineIntensity(rateOfSpread, heatPerUnitArea) :
+  """
+  Byram's fireline intensity (BTU/ft/s) from the rate of spread (ft/min)
+  and the heat per unit area (BTU/ft^2).
+  """
+  return np.multiply(heatPerUnitArea, rateOfSpread) / 60.
+
+def flameLength(intensity) :
+  """
+  Byram's flame length (ft) from the fireline intensity (BTU/ft/s).
+  """
+  return 0.45 * np.power(np.maximum(intensity, 0.), 0.46)
+
+def criticalIntensity(canopyBaseHeight, foliarMoisture) :
+  """
+  Van Wagner's critical surface fireline intensity (BTU/ft/s) for crown
+  fire initiation (eqn 4), from the canopy base height (ft) and the
+  foliar moisture content (fraction).
+  """
+  height = np.multiply(canopyBaseHeight, M_PER_FT)
+  heatOfIgnition = 460. + 25.9 * np.multiply(foliarMoisture, 100.)
+  return np.power(0.010 * height * heatOfIgnition, 1.5) / \
+         KW_PER_M_PER_BTU_PER_FT_S
+
+def criticalCrownRos(canopyBulkDensity) :
+  """
+  Van Wagner's critical rate of spread (ft/min) for active crown fire
+  (eqn 9), 3 kg/m^2/min divided by the canopy bulk density (lb/ft^3).
+  Infinite where there is no canopy.
+  """
+  density = np.multiply(canopyBulkDensity, KG_M3_PER_LB_FT3)
+  with np.errstate(divide='ignore') :
+    return 3.0 / density / M_PER_FT
+
+def crownRos(fuelModel10Ros) :
+  """
+  Rothermel's (1991) crown fire rate of spread (ft/min) from the rate of
+  spread of NFFL fuel model 10 (ft/min), evaluated with the crown fire's
+  moistures and 0.4 times the 20 ft wind speed.
+  """
+  return 3.34 * np.asarray(fuelModel10Ros)
+
+def crownInitiation(intensity, critical) :
+  """
+  True where a burning surface fire's fireline intensity (BTU/ft/s)
+  reaches the critical intensity for crown fire initiation.
+  """
+  return np.greater(intensity, 0.) & np.greater_equal(intensity, critical)
+
+def fireType(intensity, critical, crownRateOfSpread, criticalRos) :
+  """
+  Classifies fires as SURFACE (the surface intensity does not reach the
+  critical intensity), PASSIVE (crowning, but slower than the critical
+  rate of spread for active crown fire) or ACTIVE.
+  """
+  initiation = crownInitiation(intensity, critical)
+  return np.where(initiation,
+                  np.where(np.greater_equal(crownRateOfSpread, criticalRos),
+                           ACTIVE, PASSIVE),
+                  SURFACE)
+
+def outputs(rateOfSpread, reactionIntensity, sigma, canopyBaseHeight=None,
+            canopyBulkDensity=None, foliarMoisture=1.0,
+            crownRateOfSpread=None) :
+  """
+  Derives the fire behavior of arrays of cells from the rate of spread
+  (ft/min), the reaction intensity (BTU/ft^2/min) and the characteristic
+  sigma (1/ft) of the surface fuel.  The canopy base height (ft), canopy
+  bulk density (lb/ft^3), foliar moisture (fraction) and crown fire rate
+  of spread (ft/min, see crownRos) describe the canopy;  without a canopy
+  base height every fire is a surface fire.  All arrays broadcast against
+  one another.
+
+  Returns a dictionary of OUTPUT_NAMES to arrays:  spreadRate is the
+  crown rate of spread for active crown fires and the surface rate of
+  spread otherwise.
+  """
+  result = {}
+  result['residenceTime'] = residenceTime(sigma)
+  result['heatPerUnitArea'] = np.multiply(reactionIntensity,
+                                          result['residenceTime'])
+  result['firelineIntensity'] = firelineIntensity(rateOfSpread,
+                                                  result['heatPerUnitArea'])
+  result['flameLength'] = flameLength(result['firelineIntensity'])
+
+  if canopyBaseHeight is None :
+    shape = np.shape(result['firelineIntensity'])
+    dtype = np.result_type(result['firelineIntensity'])
+    result['criticalIntensity'] = np.full(shape, np.inf, dtype)
+    result['crownRateOfSpread'] = np.zeros(shape, dtype)
+    result['criticalCrownRos'] = np.full(shape, np.inf, dtype)
+  else :
+    result['criticalIntensity'] = criticalIntensity(canopyBaseHeight,
+                                                    foliarMoisture)
+    if crownRateOfSpread is None :
+      crownRateOfSpread = 0.
+    result['crownRateOfSpread'] = np.asarray(crownRateOfSpread)
+    if canopyBulkDensity is None :
+      canopyBulkDensity = 0.
+    result['criticalCrownRos'] = criticalCrownRos(canopyBulkDensity)
+
+  result['crownInitiation'] = crownInitiation(result['firelineIntensity'],
+                                              result['criticalIntensity'])
+  result['fireType'] = fireType(result['firelineIntensity'],
+                                result['criticalIntensity'],
+                                result['crownRateOfSpread'],
+                                result['criticalCrownRos'])
+  result['spreadRate'] = np.where(result['fireType'] == ACTIVE,
+                                  result['crownRateOfSpread'], rateOfSpread)
+  return result
@@ -0,0 +1,397 @@
+"""
+A reproducible benchmark of every evaluation path and weighting scheme,
+over all 13 NFFL fuel models.
+
+Each case is timed at each scale:
+  scalar    the scalar classes, one scenario at a time (SCALAR_SCENARIOS
+            scenarios per run)
+  1e3, 1e6  the array classes, over that many scenarios at once
+The scenarios cycle through the NFFL models, and their moistures, wind
+and slope are drawn from a fixed seed, so every run times the same work.
+The cases are:
+  RothermelModel.evaluate       the homogeneous model, with the dead 1 hr
+                                class of each NFFL model (arraymodel)
+  RothermelFuelComplex.compute  the fuel complex aggregates (arrayweights)
+  WeightedRothermelModel        compute, then the Rothermel weighted model
+  WeightedAlbiniModel           compute, then the Albini weighted model
+  RothermelFBP, AlbiniFBP       end to end, as a client would use them
+                                (scalar only)
+  BatchRothermelFBP,            end to end with the batch FBP classes
+  BatchAlbiniFBP                (batchfbp, array scales only)
+The scalar FBP cases need the external "common.fbp" module and are
+skipped without it;  cases are also skipped at the scales they lack.
+
+Each result holds the evaluations per second of the fastest of several
+runs, and the peak memory (bytes) allocated during one further run, as
+traced by tracemalloc.  Results may be saved as a baseline and later runs
+compared with it, flagging the cases which have slowed down by more than
+a tolerance:
+  python benchmark.py --save baseline.json
+  python benchmark.py --compare baseline.json [--tolerance 0.15]
+The comparison exits with status 1 if any case has slowed down.
+"""
+
+import sys
+import json
+import time
+import platform
+import argparse
+import tracemalloc
+import numpy as np
+import nffl
+import model
+import arraymodel
+import arrayweights
+import landscape
+from rothweights import DEAD, LIVE, ONEHR, TENHR, HUNDREDHR
+from arrayweights import ArrayFuelComplex
+from stateless import SCHEMES
+try :
+  import fbp
+except ImportError :
+  fbp = None
+
+SCALES = { 'scalar' : None, '1e3' : 1000, '1e6' : 1000000 }
+SCALAR_SCENARIOS = 13 * 40
+CASES = ('RothermelModel.evaluate', 'RothermelFuelComplex.compute',
+         'WeightedRothermelModel', 'WeightedAlbiniModel',
+         'RothermelFBP', 'AlbiniFBP', 'BatchRothermelFBP', 'BatchAlbiniFBP')
+
+# the size classes and their moisture inputs
+_DEAD_CLASSES = ((ONEHR, 'oneHour'), (TENHR, 'tenHour'),
+                 (HUNDREDHR, 'hundredHour'))
+
+def scenarios(count, seed=0) :
+  """
+  Returns count scenarios as a dictionary of arrays:  model (the row of
+  the fuel model in the nffl catalog), oneHour, tenHour, hundredHour and
+  live moistures (fractions), wind (mi/h) and slope (degrees).
+  """
+  generator = np.random.default_rng(seed)
+  return { 'model' : np.arange(count) % len(nffl.MODEL_NAMES),
+           'oneHour' : generator.uniform(0.02, 0.12, count),
+           'tenHour' : generator.uniform(0.03, 0.14, count),
+           'hundredHour' : generator.uniform(0.04, 0.16, count),
+           'live' : generator.uniform(0.6, 2.5, count),
+           'wind' : generator.uniform(0., 15., count),
+           'slope' : generator.uniform(0., 40., count) }
+
+def _homogeneous(inputs) :
+  """
+  Returns the (sigma, loading, bulk density, extinction moisture) arrays
+  of the dead 1 hr class of each scenario's fuel model.
+  """
+  i = inputs['model']
+  sigma = nffl.SIGMA[i, 0, 0]
+  loading = nffl.LOADING[i, 0, 0]
+  return sigma, loading, loading / nffl.DEPTH[i], nffl.EXT_MOISTURE[i, 0]
+
+#
+# Each setup function prepares a case and returns (run, evaluations),
+# where run() performs the timed work.
+#
+
+def _setupModel(inputs, scalar) :
+  (sigma, loading, bulk, ext) = _homogeneous(inputs)
+  wind = inputs['wind'] * (5280. / 60.)
+  slope = np.radians(inputs['slope'])
+  moisture = inputs['oneHour']
+  if not scalar :
+    def run() :
+      arraymodel.evaluate(sigma, loading, bulk, moisture, ext, wind, slope)
+    return run, moisture.size
+
+  rows = list(zip(*[values.tolist() for values in
+                    (sigma, loading, bulk, moisture, ext, wind, slope)]))
+  def run() :
+    for (s, l, b, m, e, w, a) in rows :
+      fuel = model.RothermelFuel(s, l)
+      fuel.setDensity(b)
+      fuel.setFuelMoisture(m, e)
+      fire = model.RothermelModel(fuel)
+      fire.setWind(w)
+      fire.setSlope(a)
+      fire.evaluate()
+  return run, len(rows)
+
+def _scalarComplexes(inputs, scheme) :
+  """
+  Returns a scalar fuel complex for each scenario, with its moistures set.
+  """
+  (componentClass, complexClass, fireModelClass) = SCHEMES[scheme]
+  complexes = []
+  for j in range(inputs['model'].size) :
+    fuel = nffl.fuelComplex(nffl.MODEL_NAMES[inputs['model'][j]],
+                            componentClass, complexClass)
+    for (sizeClass, name) in _DEAD_CLASSES :
+      if sizeClass in fuel.fuelParameters[DEAD] :
+        fuel.setFuelMoisture(DEAD, sizeClass, float(inputs[name][j]))
+    if LIVE in fuel.fuelParameters :
+      fuel.setFuelMoisture(LIVE, ONEHR, float(inputs['live'][j]))
+    complexes.append(fuel)
+  return complexes
+
+def _arrayComplex(inputs, complexClass) :
+  """
+  Returns an array fuel complex of all the scenarios, with moistures set.
+  """
+  fuel = nffl.arrayFuelComplex(np.array(nffl.MODEL_NAMES)[inputs['model']],
+                               complexClass)
+  for (sizeClass, name) in _DEAD_CLASSES :
+    fuel.setFuelMoisture(DEAD, sizeClass, inputs[name])
+  fuel.setFuelMoisture(LIVE, ONEHR, inputs['live'])
+  return fuel
+
+def _setupCompute(inputs, scalar) :
+  if not scalar :
+    fuel = _arrayComplex(inputs, ArrayFuelComplex)
+    return fuel.compute, inputs['model'].size
+
+  complexes = _scalarComplexes(inputs, 'rothermel')
+  def run() :
+    for fuel in complexes :
+      fuel.compute()
+  return run, len(complexes)
+
+def _setupWeighted(inputs, scalar, scheme) :
+  wind = inputs['wind'] * (5280. / 60.)
+  slope = np.radians(inputs['slope'])
+  if not scalar :
+    (complexClass, modelClass) = arrayweights.SCHEMES[scheme]
+    fuel = _arrayComplex(inputs, complexClass)
+    def run() :
+      fuel.compute()
+      fuel.calcLivingExtMoisture()
+      fire = modelClass(fuel)
+      fire.setWind(wind)
+      fire.setSlope(slope)
+      fire.evaluate()
+    return run, inputs['model'].size
+
+  modelClass = SCHEMES[scheme][2]
+  complexes = _scalarComplexes(inputs, scheme)
+  rows = list(zip(complexes, wind.tolist(), slope.tolist()))
+  def run() :
+    for (fuel, w, a) in rows :
+      fuel.compute()
+      if LIVE in fuel.fuelParameters :
+        fuel.calcLivingExtMoisture()
+      fire = modelClass(fuel)
+      fire.setWind(w)
+      fire.setSlope(a)
+      fire.evaluate()
+  return run, len(rows)
+
+def _setupBatchFBP(inputs, scalar, scheme) :
+  if scalar :
+    return None, 'no scalar form'
+  groups = []
+  for (i, name) in enumerate(nffl.MODEL_NAMES) :
+    cells = inputs['model'] == i
+    evaluator = landscape.SCHEMES[scheme](name)
+    (dead, live) = evaluator.moistureInputs(
+      lambda field : inputs[field][cells])
+    groups.append((evaluator, dead, live, inputs['wind'][cells],
+                   inputs['slope'][cells]))
+  def run() :
+    for (evaluator, dead, live, wind, slope) in groups :
+      evaluator.evaluate(dead, live, wind, slope)
+  return run, inputs['model'].size
+
+def _setupFBP(inputs, scalar, scheme) :
+  names = nffl.MODEL_NAMES
+  if not scalar :
+    return None, 'no array form;  see the Batch cases'
+  if fbp is None :
+    return None, 'common.fbp is not available'
+  fbpClass = { 'rothermel' : fbp.RothermelFBP,
+               'albini' : fbp.AlbiniFBP }[scheme]
+  evaluators = [fbpClass() for name in names]
+  for (evaluator, name) in zip(evaluators, names) :
+    evaluator.setNamedFuelModel(name)
+  rows = []
+  for j in range(inputs['model'].size) :
+    evaluator = evaluators[inputs['model'][j]]
+    dead = dict([(sizeClass, float(inputs[field][j]))
+                 for (sizeClass, field) in _DEAD_CLASSES
+                 if sizeClass in evaluator.fuelComplex.fuelParameters[DEAD]])
+    live = {}
+    if LIVE in evaluator.fuelComplex.fuelParameters :
+      live[ONEHR] = float(inputs['live'][j])
+    rows.append((evaluator, dead, live, float(inputs['wind'][j]),
+                 float(inputs['slope'][j])))
+  def run() :
+    for (evaluator, dead, live, wind, slope) in rows :
+      evaluator.setDeadFuelMoistures(dead)
+      if live :
+        evaluator.setLiveFuelMoistures(live)
+      evaluator.setMidflameWindSpeed(wind)
+      evaluator.setSlope(slope)
+      evaluator.getRateOfSpread()
+  return run, len(rows)
+
+_SETUP = { 'RothermelModel.evaluate' : _setupModel,
+           'RothermelFuelComplex.compute' : _setupCompute,
+           'WeightedRothermelModel' :
+             lambda inputs, scalar : _setupWeighted(inputs, scalar, 'rothermel'),
+           'WeightedAlbiniModel' :
+             lambda inputs, scalar : _setupWeighted(inputs, scalar, 'albini'),
+           'RothermelFBP' :
+             lambda inputs, scalar : _setupFBP(inputs, scalar, 'rothermel'),
+           'AlbiniFBP' :
+             lambda inputs, scalar : _setupFBP(inputs, scalar, 'albini'),
+           'BatchRothermelFBP' :
+             lambda inputs, scalar : _setupBatchFBP(inputs, scalar,
+                                                    'rothermel'),
+           'BatchAlbiniFBP' :
+             lambda inputs, scalar : _setupBatchFBP(inputs, scalar,
+                                                    'albini') }
+
+def measure(case, scale, repeat=3, seed=0) :
+  """
+  Times one case at one scale.  Returns a dictionary of evaluations,
+  seconds (of the fastest run), evaluationsPerSecond and peakBytes, or
+  one with only 'skipped' if the case cannot be run here.
+  """
+  count = SCALES[scale] or SCALAR_SCENARIOS
+  (run, evaluations) = _SETUP[case](scenarios(count, seed),
+                                    SCALES[scale] is None)
+  if run is None :
+    # the setup gives the reason in place of the number of evaluations
+    return { 'skipped' : evaluations }
+
+  run()       # warm up the static caches
+  best = None
+  for i in range(repeat) :
+    began = time.perf_counter()
+    run()
+    elapsed = time.perf_counter() - began
+    if best is None or elapsed < best :
+      best = elapsed
+
+  tracemalloc.start()
+  try :
+    tracemalloc.reset_peak()
+    run()
+    peak = tracemalloc.get_traced_memory()[1]
+  finally :
+    tracemalloc.stop()
+  return { 'evaluations' : evaluations,
+           'seconds' : best,
+           'evaluationsPerSecond' : evaluations / best,
+           'peakBytes' : peak }
+
+def runBenchmarks(cases=CASES, scales=tuple(SCALES), repeat=3, seed=0,
+                  report=None) :
+  """
+  Measures every case at every scale.  Returns a dictionary holding the
+  environment ('environment') and a dictionary of 'case@scale' to the
+  result of measure ('results').  report, if given, is called with the
+  key and result of each measurement as it completes.
+  """
+  results = {}
+  for case in cases :
+    for scale in scales :
+      key = case + '@' + scale
+      results[key] = measure(case, scale, repeat, seed)
+      if report is not None :
+        report(key, results[key])
+  environment = { 'python' : platform.python_version(),
+                  'numpy' : np.__version__,
+                  'machine' : platform.machine(),
+                  'platform' : platform.platform(),
+                  'time' : time.strftime('%Y-%m-%dT%H:%M:%S'),
+                  'repeat' : repeat, 'seed' : seed }
+  return { 'environment' : environment, 'results' : results }
+
+def compare(current, baseline, tolerance=0.15) :
+  """
+  Compares the results of two runs.  Returns a list of (key, baseline
+  evaluations per second, current evaluations per second, ratio, status)
+  with status 'slower' where the current rate has fallen by more than
+  tolerance (a fraction), 'faster' where it has risen by more, and 'same',
+  'new', 'missing' or 'skipped' otherwise.
+  """
+  rows = []
+  old = baseline['results']
+  new = current['results']
+  for key in sorted(set(old) | set(new)) :
+    before = old.get(key, {}).get('evaluationsPerSecond')
+    after = new.get(key, {}).get('evaluationsPerSecond')
+    if not (key in old) :
+      status = 'new'
+    elif not (key in new) :
+      status = 'missing'
+    elif before is None or after is None :
+      status = 'skipped'
+    elif after < before * (1. - tolerance) :
+      status = 'slower'
+    elif after > before * (1. + tolerance) :
+      status = 'faster'
+    else :
+      status = 'same'
+    ratio = None
+    if before and after :
+      ratio = after / before
+    rows.append((key, before, after, ratio, status))
+  return rows
+
+def _number(value, format) :
+  if value is None :
+    return '-'
+  return format % value
+
+def _report(key, result) :
+  if 'skipped' in result :
+    print('%-40s skipped (%s)' % (key, result['skipped']))
+  else :
+    print('%-40s %14s evals/s %12s bytes peak' %
+          (key, _number(result['evaluationsPerSecond'], '%.0f'),
+           _number(result['peakBytes'], '%d')))
+  sys.stdout.flush()
+
+def main(argv=None) :
+  parser = argparse.ArgumentParser(
+    description='Benchmark the fire behavior evaluation paths.')
+  parser.add_argument('--cases', default=','.join(CASES),
+                      help='comma separated cases to run')
+  parser.add_argument('--scales', default=','.join(SCALES),
+                      help='comma separated scales to run')
+  parser.add_argument('--repeat', type=int, default=3)
+  parser.add_argument('--seed', type=int, default=0)
+  parser.add_argument('--save', help='write the results to this file')
+  parser.add_argument('--compare', help='compare with this baseline file')
+  parser.add_argument('--tolerance', type=float, default=0.15,
+                      help='fractional slowdown flagged by --compare')
+  args = parser.parse_args(argv)
+
+  cases = args.cases.split(',')
+  scales = args.scales.split(',')
+  for case in cases :
+    if not (case in CASES) :
+      parser.error('unknown case: ' + case)
+  for scale in scales :
+    if not (scale in SCALES) :
+      parser.error('unknown scale: ' + scale)
+
+  current = runBenchmarks(cases, scales, args.repeat, args.seed, _report)
+  if args.save :
+    with open(args.save, 'w') as stream :
+      json.dump(current, stream, indent=1, sort_keys=True)
+
+  status = 0
+  if args.compare :
+    with open(args.compare) as stream :
+      baseline = json.load(stream)
+    print('')
+    for (key, before, after, ratio, verdict) in compare(current, baseline,
+                                                         args.tolerance) :
+      print('%-40s %14s %14s %7s  %s' %
+            (key, _number(before, '%.0f'), _number(after, '%.0f'),
+             _number(ratio, '%.2f'), verdict))
+      if verdict == 'slower' :
+        status = 1
+  return status
+
+if __name__ == '__main__' :
+  sys.exit(main())
@@ -0,0 +1,281 @@
+"""
+Compact representations of fuels, fire models and fuel complexes, for
+keeping one per landscape cell in memory.
+
+  + CompactRothermelFuel, CompactAlbiniFuel and CompactRothermelModel are
+    the classes of the "model" and "albini" modules with __slots__ instead
+    of an instance dictionary.  They share the original methods, so the
+    API and the results of evaluate() are the same.
+  + RecordRothermelFuel and RecordAlbiniFuel are thin views onto one
+    element of a structured array of FUEL_DTYPE, so a whole landscape of
+    fuels is a single array, and any element may still be used with the
+    scalar API (setSigma, setDensity, setFuelMoisture, ...) and a fire
+    model.
+  + COMPLEX_DTYPE holds the inputs of a weighted fuel complex (those of
+    arrayweights.ArrayFuelComplex) as one record per cell;  see
+    complexRecords and arrayComplex.
+
+The per-instance footprints (bytes) of these representations and of the
+dictionary based classes are reported by footprint().  The records have
+fixed sizes:  128 bytes for FUEL_DTYPE (16 float64 fields) and 366 bytes
+for COMPLEX_DTYPE.  The other sizes depend on the Python version and
+build.  On 64-bit CPython the slots based classes take about half the
+bytes of their dictionary based counterparts, and a computed
+rothweights.RothermelFuelComplex takes several kilobytes.
+The floats referred to by a dictionary or slots based fuel add up to 24
+bytes each (16 attributes), which the records store inline.  Record views
+are meant to be created as needed rather than kept.
+"""
+
+import sys
+import numpy as np
+import model
+import albini
+from arrayweights import ArrayFuelComplex, CATEGORIES, SIZE_CLASSES
+
+# the attributes of a Fuel and of a RothermelModel
+FUEL_ATTRIBUTES = ('sigma', 'ovendryLoading', 'bulkDensity',
+                   'particleDensity', 'packingRatio', 'optimalPacking',
+                   'maxPotentialVelocity', 'exponentA', 'heatingEfficiency',
+                   'extMoisture', 'fuelMoisture', 'totMineralContent',
+                   'effMineralContent', 'netFuelLoading', 'heatContent',
+                   'heatOfIgnition')
+MODEL_ATTRIBUTES = ('fuel', 'windSpeed', 'dampMoisture', 'dampMineral',
+                    'potReactionVelocity', 'reactionIntensity',
+                    'propFluxRatio', 'noWindRos', 'midflameWind',
+                    'windMultiplier', 'windC', 'windB', 'windE', 'slopeRad',
+                    'slopeFactor', 'slopeMultiplier', 'ros')
+
+# one fuel per record; unset values are NaN
+FUEL_DTYPE = np.dtype([(name, np.float64) for name in FUEL_ATTRIBUTES])
+
+# the inputs of one weighted fuel complex per record
+_LAYOUT = (len(CATEGORIES), len(SIZE_CLASSES))
+COMPLEX_DTYPE = np.dtype([('present', np.bool_, _LAYOUT)] +
+                         [(name, np.float64, _LAYOUT) for name in
+                          ArrayFuelComplex._inputNames[1:-2]] +
+                         [('extMoisture', np.float64, (len(CATEGORIES),)),
+                          ('depth', np.float64)])
+
+def _borrowMethods(target, source) :
+  """
+  Copies the methods defined by the class source onto the class target,
+  so that target behaves like source without inheriting its instance
+  dictionary.  Methods which target defines itself are kept.
+  """
+  for (name, value) in vars(source).items() :
+    if name in vars(target) :
+      continue
+    if callable(value) and (name == '__init__' or not name.startswith('__')) :
+      setattr(target, name, value)
+
+
+class CompactFuel :
+  """
+  model.Fuel without an instance dictionary.  As with Fuel, use
+  CompactRothermelFuel or CompactAlbiniFuel.
+  """
+  __slots__ = FUEL_ATTRIBUTES
+  calcNetFuelLoading = None
+  calcExponentA      = None
+
+_borrowMethods(CompactFuel, model.Fuel)
+
+
+class CompactRothermelFuel (CompactFuel) :
+  """
+  model.RothermelFuel without an instance dictionary.
+  """
+  __slots__ = ()
+  calcNetFuelLoading = model.RothermelNetFuelLoading
+  calcExponentA      = model.RothermelExponentA
+
+
+class CompactAlbiniFuel (CompactFuel) :
+  """
+  albini.AlbiniFuel without an instance dictionary.
+  """
+  __slots__ = ()
+  calcNetFuelLoading = albini.AlbiniNetFuelLoading
+  calcExponentA      = albini.AlbiniExponentA
+
+
+class CompactRothermelModel :
+  """
+  model.RothermelModel without an instance dictionary.  Any fuel (compact
+  or not) may be used with it.
+  """
+  __slots__ = MODEL_ATTRIBUTES
+
+_borrowMethods(CompactRothermelModel, model.RothermelModel)
+
+
+def fuelRecords(shape) :
+  """
+  Returns a new structured array of fuels of FUEL_DTYPE, all unset (NaN).
+  """
+  records = np.empty(shape, dtype=FUEL_DTYPE)
+  for name in FUEL_ATTRIBUTES :
+    records[name] = np.nan
+  return records
+
+def _field(name) :
+  """
+  Returns a property reading and writing the named field of the record;
+  NaN stands for None.
+  """
+  def get(self) :
+    value = self._record[name]
+    if value != value :
+      return None
+    return float(value)
+  def set(self, value) :
+    if value is None :
+      value = np.nan
+    self._record[name] = value
+  return property(get, set)
+
+
+class RecordFuel :
+  """
+  A view onto one fuel of a structured array of FUEL_DTYPE, with the
+  attributes and methods of model.Fuel.  The view itself holds only a
+  reference to the record.  As with Fuel, use RecordRothermelFuel or
+  RecordAlbiniFuel.
+  """
+  __slots__ = ('_record',)
+  calcNetFuelLoading = None
+  calcExponentA      = None
+
+  def __init__(self, records, index, sigma=None, loading=None) :
+    """
+    Initializes the fuel at the given index of records, as Fuel.__init__
+    does (setting the default mineral and heat contents).
+    """
+    self._record = records[index]
+    model.Fuel.__init__(self, sigma, loading)
+
+  @classmethod
+  def view(cls, records, index) :
+    """
+    Returns a view onto the fuel at the given index of records, without
+    initializing it.
+    """
+    result = cls.__new__(cls)
+    result._record = records[index]
+    return result
+
+_borrowMethods(RecordFuel, model.Fuel)
+for _name in FUEL_ATTRIBUTES :
+  setattr(RecordFuel, _name, _field(_name))
+del _name
+
+
+class RecordRothermelFuel (RecordFuel) :
+  """
+  A record-backed model.RothermelFuel.
+  """
+  __slots__ = ()
+  calcNetFuelLoading = model.RothermelNetFuelLoading
+  calcExponentA      = model.RothermelExponentA
+
+
+class RecordAlbiniFuel (RecordFuel) :
+  """
+  A record-backed albini.AlbiniFuel.
+  """
+  __slots__ = ()
+  calcNetFuelLoading = albini.AlbiniNetFuelLoading
+  calcExponentA      = albini.AlbiniExponentA
+
+
+def complexRecords(fuelComplex) :
+  """
+  Returns the inputs of an ArrayFuelComplex as a structured array of
+  COMPLEX_DTYPE, with the complex's leading axes as its shape.
+  """
+  shape = np.shape(fuelComplex.depth)
+  for name in ArrayFuelComplex._inputNames :
+    value = getattr(fuelComplex, name)
+    layout = value.shape[len(value.shape) - len(COMPLEX_DTYPE[name].shape):]
+    shape = np.broadcast_shapes(shape, value.shape[:value.ndim - len(layout)])
+  records = np.empty(shape, dtype=COMPLEX_DTYPE)
+  for name in ArrayFuelComplex._inputNames :
+    records[name] = getattr(fuelComplex, name)
+  return records
+
+def arrayComplex(records, complexClass=ArrayFuelComplex) :
+  """
+  Returns an array fuel complex whose inputs are views of the fields of a
+  structured array of COMPLEX_DTYPE (no copying).  The complex has not
+  been computed.
+  """
+  result = complexClass()
+  for name in complexClass._inputNames :
+    setattr(result, name, records[name])
+  return result
+
+
+def deepSize(obj, seen=None) :
+  """
+  Returns the number of bytes occupied by obj and everything it refers to
+  through dictionaries, lists, tuples and instance attributes, counting
+  shared objects once.
+  """
+  if seen is None :
+    seen = set()
+  if id(obj) in seen :
+    return 0
+  seen.add(id(obj))
+  size = sys.getsizeof(obj)
+  if isinstance(obj, dict) :
+    for (key, value) in obj.items() :
+      size += deepSize(key, seen) + deepSize(value, seen)
+  elif isinstance(obj, (list, tuple, set)) :
+    for value in obj :
+      size += deepSize(value, seen)
+  elif hasattr(obj, '__dict__') :
+    size += deepSize(vars(obj), seen)
+  return size
+
+def footprint() :
+  """
+  Measures the per-instance memory footprint (bytes) of each
+  representation, as described in the module docstring.  Objects are
+  measured without the floats they refer to, except for the fuel
+  complexes, which are measured in full with deepSize.
+  """
+  import nffl
+  from rothweights import RothermelFuelComplex
+
+  def shallow(obj) :
+    size = sys.getsizeof(obj)
+    if hasattr(obj, '__dict__') :
+      size += sys.getsizeof(vars(obj))
+    return size
+
+  plain = model.RothermelFuel(2000., 0.1)
+  plain.setDensity(0.5)
+  plain.setFuelMoisture(0.06, 0.25)
+  plain.calcNetFuelLoading()
+  fire = model.RothermelModel(plain)
+  fire.setWind(100.)
+  fire.setSlope(0.1)
+  fire.evaluate()
+
+  compact = CompactRothermelFuel(2000., 0.1)
+  compactFire = CompactRothermelModel(compact)
+
+  complexes = [nffl.fuelComplex(name, model.RothermelFuel,
+                                RothermelFuelComplex) for name in ('1', '10')]
+  for fuelComplex in complexes :
+    fuelComplex.computeStatic()
+
+  return { 'model.RothermelFuel' : shallow(plain),
+           'CompactRothermelFuel' : shallow(compact),
+           'FUEL_DTYPE record' : FUEL_DTYPE.itemsize,
+           'model.RothermelModel' : shallow(fire),
+           'CompactRothermelModel' : shallow(compactFire),
+           'RothermelFuelComplex (NFFL 1)' : deepSize(complexes[0]),
+           'RothermelFuelComplex (NFFL 10)' : deepSize(complexes[1]),
+           'COMPLEX_DTYPE record' : COMPLEX_DTYPE.itemsize }
@@ -0,0 +1,290 @@
+"""
+Forward-mode automatic differentiation for the array engine (the
+"arraymodel" and "arrayweights" modules).  A Dual holds a value and the
+derivatives of that value with respect to a fixed list of inputs (its
+tangents).  Duals implement the NumPy ufunc and array function protocols,
+so the unmodified array equations propagate the derivatives alongside the
+values, in the same pass.
+
+The tangent array has one more axis than the value:  tangent[k] is the
+derivative with respect to input k.  The remaining axes broadcast against
+the value's, so inputs which do not vary over a batch cost no memory for
+it.  Constants (plain numbers and arrays) have no tangent at all.
+
+Where a function is not differentiable (e.g., x ** 0.5 at 0), inputs with
+a zero tangent contribute nothing; the others give an infinite or NaN
+derivative.
+"""
+
+import numpy as np
+
+def _valueOf(x) :
+  if isinstance(x, Dual) :
+    return x.value
+  return x
+
+def _tangentOf(x, ndim) :
+  """
+  Returns the tangent of x padded to ndim value axes, or None if x is a
+  constant.
+  """
+  if not isinstance(x, Dual) :
+    return None
+  return x._padded(ndim)
+
+def _scale(factor, tangent) :
+  """
+  Returns factor * tangent, with zero wherever the tangent is zero (even if
+  factor is infinite or NaN there).
+  """
+  if tangent is None :
+    return None
+  with np.errstate(invalid='ignore') :
+    return np.where(tangent != 0., factor * tangent, 0.)
+
+def _add(a, b) :
+  if a is None :
+    return b
+  if b is None :
+    return a
+  return a + b
+
+def _negate(a) :
+  if a is None :
+    return None
+  return -a
+
+def _axes(axis, ndim) :
+  """
+  Converts a reduction axis (None, an int or a tuple) into a tuple of
+  negative axes of an array with ndim axes.
+  """
+  if axis is None :
+    return tuple(range(-ndim, 0))
+  if not isinstance(axis, tuple) :
+    axis = (axis,)
+  return tuple([a - ndim if a >= 0 else a for a in axis])
+
+
+class Dual :
+  """
+  A value together with its derivatives with respect to n inputs.
+
+  Attributes:
+  value                           the value (ndarray)
+  tangent                         (n, ...) array of derivatives, broadcasting
+                                  against value
+  """
+
+  def __init__(self, value, tangent) :
+    self.value = np.asarray(value, dtype=float)
+    tangent = np.asarray(tangent, dtype=float)
+    missing = self.value.ndim - (tangent.ndim - 1)
+    if missing > 0 :
+      tangent = tangent.reshape(tangent.shape[:1] + (1,) * missing +
+                                tangent.shape[1:])
+    self.tangent = tangent
+
+  @classmethod
+  def seed(cls, value, offset, n, axes=0) :
+    """
+    Makes an input of n:  the derivative of each element of the last
+    "axes" axes of value with respect to itself is 1, and these elements
+    are inputs offset, offset + 1, ... (in C order).
+    """
+    value = np.asarray(value, dtype=float)
+    layout = value.shape[value.ndim - axes:]
+    count = int(np.prod(layout, dtype=int))
+    tangent = np.zeros((n,) + (1,) * (value.ndim - axes) + layout)
+    eye = np.eye(count).reshape((count,) + (1,) * (value.ndim - axes) +
+                                layout)
+    tangent[offset:offset + count] = eye
+    return cls(value, tangent)
+
+  def _padded(self, ndim) :
+    extra = ndim - self.value.ndim
+    if extra <= 0 :
+      return self.tangent
+    return self.tangent.reshape(self.tangent.shape[:1] + (1,) * extra +
+                                self.tangent.shape[1:])
+
+  def derivative(self, index) :
+    """
+    Returns the derivative with respect to input index, shaped as value.
+    """
+    return np.broadcast_to(self.tangent[index], self.value.shape)
+
+  # array-like properties
+  shape = property(lambda self : self.value.shape)
+  ndim = property(lambda self : self.value.ndim)
+  size = property(lambda self : self.value.size)
+  dtype = property(lambda self : self.value.dtype)
+
+  def __len__(self) :
+    return len(self.value)
+
+  def __repr__(self) :
+    return 'Dual(' + repr(self.value) + ', ' + repr(self.tangent) + ')'
+
+  def __getitem__(self, key) :
+    if not isinstance(key, tuple) :
+      key = (key,)
+    tangent = np.broadcast_to(self.tangent,
+                              self.tangent.shape[:1] + self.value.shape)
+    return Dual(self.value[key], tangent[(slice(None),) + key])
+
+  def sum(self, axis=None) :
+    axes = _axes(axis, self.value.ndim)
+    tangent = np.broadcast_to(self.tangent,
+                              self.tangent.shape[:1] + self.value.shape)
+    return Dual(self.value.sum(axis=axes), tangent.sum(axis=axes))
+
+  # arithmetic is carried out by the ufuncs
+  __add__ = lambda self, other : np.add(self, other)
+  __radd__ = lambda self, other : np.add(other, self)
+  __sub__ = lambda self, other : np.subtract(self, other)
+  __rsub__ = lambda self, other : np.subtract(other, self)
+  __mul__ = lambda self, other : np.multiply(self, other)
+  __rmul__ = lambda self, other : np.multiply(other, self)
+  __truediv__ = lambda self, other : np.true_divide(self, other)
+  __rtruediv__ = lambda self, other : np.true_divide(other, self)
+  __pow__ = lambda self, other : np.power(self, other)
+  __rpow__ = lambda self, other : np.power(other, self)
+  __neg__ = lambda self : np.negative(self)
+  __pos__ = lambda self : self
+  __lt__ = lambda self, other : np.less(self, other)
+  __le__ = lambda self, other : np.less_equal(self, other)
+  __gt__ = lambda self, other : np.greater(self, other)
+  __ge__ = lambda self, other : np.greater_equal(self, other)
+  __eq__ = lambda self, other : np.equal(self, other)
+  __ne__ = lambda self, other : np.not_equal(self, other)
+  __hash__ = None
+
+  def __array_ufunc__(self, ufunc, method, *inputs, **kwargs) :
+    if method != '__call__' or kwargs.get('out') is not None :
+      return NotImplemented
+    if not (ufunc in _UFUNCS) :
+      return NotImplemented
+    rule = _UFUNCS[ufunc]
+    values = [_valueOf(x) for x in inputs]
+    result = ufunc(*values)
+    if ufunc in _COMPARISONS :
+      return result
+    ndim = np.ndim(result)
+    tangents = [_tangentOf(x, ndim) for x in inputs]
+    return Dual(result, rule(result, values, tangents))
+
+  def __array_function__(self, func, types, args, kwargs) :
+    rule = _FUNCTIONS.get(func)
+    if rule is None :
+      return NotImplemented
+    return rule(*args, **kwargs)
+
+
+def _zeroIfNone(tangent, n, ndim) :
+  if tangent is None :
+    return np.zeros((n,) + (1,) * ndim)
+  return tangent
+
+def _count(tangents) :
+  for t in tangents :
+    if t is not None :
+      return t.shape[0]
+
+def _power(result, values, tangents) :
+  (a, b) = values
+  (ta, tb) = tangents
+  (da, db) = (None, None)
+  with np.errstate(divide='ignore', invalid='ignore') :
+    if ta is not None :
+      da = _scale(b * np.power(a, np.subtract(b, 1.)), ta)
+    if tb is not None :
+      db = _scale(np.where(result != 0., result * np.log(np.where(
+        result != 0., a, 1.)), 0.), tb)
+  return _add(da, db)
+
+def _divide(result, values, tangents) :
+  (a, b) = values
+  (ta, tb) = tangents
+  da = None
+  if ta is not None :
+    da = ta / b
+  db = None
+  if tb is not None :
+    db = -tb * (result / b)
+  return _add(da, db)
+
+def _select(result, values, tangents, first) :
+  (ta, tb) = tangents
+  n = _count(tangents)
+  ndim = np.ndim(result)
+  return np.where(first, _zeroIfNone(ta, n, ndim), _zeroIfNone(tb, n, ndim))
+
+# derivative rules:  (result, values, tangents) -> tangent of the result
+_UFUNCS = {
+  np.add : lambda r, v, t : _add(t[0], t[1]),
+  np.subtract : lambda r, v, t : _add(t[0], _negate(t[1])),
+  np.negative : lambda r, v, t : _negate(t[0]),
+  np.positive : lambda r, v, t : t[0],
+  np.multiply : lambda r, v, t : _add(None if t[0] is None else t[0] * v[1],
+                                      None if t[1] is None else t[1] * v[0]),
+  np.true_divide : _divide,
+  np.power : _power,
+  np.exp : lambda r, v, t : t[0] * r,
+  np.log : lambda r, v, t : t[0] / v[0],
+  np.sqrt : lambda r, v, t : _scale(0.5 / r, t[0]),
+  np.tan : lambda r, v, t : t[0] * (1. + r * r),
+  np.sin : lambda r, v, t : t[0] * np.cos(v[0]),
+  np.cos : lambda r, v, t : -t[0] * np.sin(v[0]),
+  np.arctan2 : lambda r, v, t : _add(
+    None if t[0] is None else t[0] * (v[1] / (v[0] * v[0] + v[1] * v[1])),
+    None if t[1] is None else t[1] * (-v[0] / (v[0] * v[0] + v[1] * v[1]))),
+  np.radians : lambda r, v, t : t[0] * (np.pi / 180.),
+  np.deg2rad : lambda r, v, t : t[0] * (np.pi / 180.),
+  np.degrees : lambda r, v, t : t[0] * (180. / np.pi),
+  np.rad2deg : lambda r, v, t : t[0] * (180. / np.pi),
+  np.absolute : lambda r, v, t : t[0] * np.sign(v[0]),
+  np.maximum : lambda r, v, t : _select(r, v, t, v[0] >= v[1]),
+  np.minimum : lambda r, v, t : _select(r, v, t, v[0] <= v[1]),
+}
+_COMPARISONS = (np.less, np.less_equal, np.greater, np.greater_equal,
+                np.equal, np.not_equal)
+for ufunc in _COMPARISONS :
+  _UFUNCS[ufunc] = None
+del ufunc
+
+def _where(condition, x, y) :
+  condition = _valueOf(condition)
+  value = np.where(condition, _valueOf(x), _valueOf(y))
+  ndim = value.ndim
+  tangents = [_tangentOf(x, ndim), _tangentOf(y, ndim)]
+  n = _count(tangents)
+  return Dual(value, np.where(condition, _zeroIfNone(tangents[0], n, ndim),
+                              _zeroIfNone(tangents[1], n, ndim)))
+
+def _stack(arrays, axis=0) :
+  values = [_valueOf(a) for a in arrays]
+  value = np.stack(values, axis=axis)
+  n = _count([a.tangent for a in arrays if isinstance(a, Dual)])
+  tangents = [np.broadcast_to(_zeroIfNone(_tangentOf(a, np.ndim(v)), n,
+                                          np.ndim(v)), (n,) + np.shape(v))
+              for (a, v) in zip(arrays, values)]
+  axis = axis + 1 if axis >= 0 else axis
+  return Dual(value, np.stack(tangents, axis=axis))
+
+def _expandDims(a, axis) :
+  value = np.expand_dims(a.value, axis)
+  tangent = np.broadcast_to(a.tangent, a.tangent.shape[:1] + a.value.shape)
+  return Dual(value, np.expand_dims(tangent, _axes(axis, value.ndim)))
+
+def _sum(a, axis=None) :
+  return a.sum(axis)
+
+_FUNCTIONS = {
+  np.where : _where,
+  np.stack : _stack,
+  np.expand_dims : _expandDims,
+  np.sum : _sum,
+  np.shape : lambda a : a.shape,
+  np.ndim : lambda a : a.ndim,
+}
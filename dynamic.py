@@ -0,0 +1,337 @@
+"""
+The 40 fuel models of Scott and Burgan (2005), including the dynamic
+models whose live herbaceous load is transferred to a dead herbaceous
+class as the herbs cure, in the array layout of the "arrayweights"
+module.
+
+The layout adds a herbaceous size class, HERB, to those of the NFFL
+models:  the size classes are (1 hr, 10 hr, 100 hr, herb).  The dead herb
+class holds the cured part of the herbaceous load, and the live herb class
+the rest;  the live woody load occupies the live 1 hr class, as the live
+fuel of the NFFL models does.  The catalog is held as read-only arrays
+indexed by model (in the order of MODEL_NAMES), category and size class,
+as in the "nffl" module:
+  SIGMA          1/ft      surface area to volume ratio (1 where absent)
+  LOADING        lb/ft^2   ovendry loading, all herbaceous load live
+  PRESENT                  True where the size class is in the model
+  HEAT_CONTENT   BTU/lb    heat content
+  EXT_MOISTURE   fraction  dead moisture of extinction (live is 0 here)
+  DEPTH          ft        fuel bed depth
+  DYNAMIC                  True for the dynamic models
+  MODEL_CODES              the standard numeric codes (101 - 204)
+
+Curing is a per-cell array, so a raster may vary in curing (or in live
+herbaceous moisture) without any new fuel objects:  arrayFuelComplex()
+builds one array complex for all the cells, and setCuring() moves load
+between the herb classes in place of the old arrays.  The dead herb class
+takes the dead 1 hr moisture.
+
+The live moisture of extinction is that of Albini (1976), which accounts
+for every fine class (Rothermel's eqn 88 knows only the 1 hr classes), and
+is not allowed below the dead moisture of extinction, as in Scott and
+Burgan and BehavePlus.
+
+References:
+Scott, J. H. and Burgan, R. E. Standard fire behavior fuel models: a
+  comprehensive set for use with Rothermel's surface fire spread model.
+  General Technical Report RMRS-GTR-153, USDA Forest Service. 2005. 72 p.
+Albini, F. A. Estimating Wildfire Behavior and Effects.  General Technical
+  Report INT-30, USDA Forest Service. 1976. 92 p.
+"""
+
+import numpy as np
+import behavior
+from rothweights import DEAD, LIVE, ONEHR, TENHR, HUNDREDHR
+from arrayweights import ArrayFuelComplex, ArrayAlbiniFuelComplex, \
+                         ArrayWeightedRothermelModel, \
+                         ArrayWeightedAlbiniModel, CATEGORIES, safeDivide
+
+# the herbaceous size class, and the layout of the dynamic models
+HERB = 'herb'
+SIZE_CLASSES = (ONEHR, TENHR, HUNDREDHR, HERB)
+
+# tons/acre to lb/ft^2
+LB_FT2_PER_TON_ACRE = 2000. / 43560.
+
+# the sigma of the 10 hr and 100 hr classes of every model
+_TENHR_SIGMA = 109.
+_HUNDREDHR_SIGMA = 30.
+
+#
+# The catalog (Scott and Burgan, table 7):  name, code, dynamic, loadings
+# (tons/acre) of the 1, 10 and 100 hr, live herb and live woody classes,
+# sigmas (1/ft) of the 1 hr, live herb and live woody classes, depth (ft),
+# dead moisture of extinction (percent) and heat content (BTU/lb).
+#
+_CATALOG = (
+  ('GR1', 101, True,  (0.10, 0.00, 0.00, 0.30, 0.00), (2200, 2000, 9999), 0.4, 15, 8000),
+  ('GR2', 102, True,  (0.10, 0.00, 0.00, 1.00, 0.00), (2000, 1800, 9999), 1.0, 15, 8000),
+  ('GR3', 103, True,  (0.10, 0.40, 0.00, 1.50, 0.00), (1500, 1300, 9999), 2.0, 30, 8000),
+  ('GR4', 104, True,  (0.25, 0.00, 0.00, 1.90, 0.00), (2000, 1800, 9999), 2.0, 15, 8000),
+  ('GR5', 105, True,  (0.40, 0.00, 0.00, 2.50, 0.00), (1800, 1600, 9999), 1.5, 40, 8000),
+  ('GR6', 106, True,  (0.10, 0.00, 0.00, 3.40, 0.00), (2200, 2000, 9999), 1.5, 40, 9000),
+  ('GR7', 107, True,  (1.00, 0.00, 0.00, 5.40, 0.00), (2000, 1800, 9999), 3.0, 15, 8000),
+  ('GR8', 108, True,  (0.50, 1.00, 0.00, 7.30, 0.00), (1500, 1300, 9999), 4.0, 30, 8000),
+  ('GR9', 109, True,  (1.00, 1.00, 0.00, 9.00, 0.00), (1800, 1600, 9999), 5.0, 40, 8000),
+  ('GS1', 121, True,  (0.20, 0.00, 0.00, 0.50, 0.65), (2000, 1800, 1800), 0.9, 15, 8000),
+  ('GS2', 122, True,  (0.50, 0.50, 0.00, 0.60, 1.00), (2000, 1800, 1800), 1.5, 15, 8000),
+  ('GS3', 123, True,  (0.30, 0.25, 0.00, 1.45, 1.25), (1800, 1600, 1600), 1.8, 40, 8000),
+  ('GS4', 124, True,  (1.90, 0.30, 0.10, 3.40, 7.10), (1800, 1600, 1600), 2.1, 40, 8000),
+  ('SH1', 141, True,  (0.25, 0.25, 0.00, 0.15, 1.30), (2000, 1800, 1600), 1.0, 15, 8000),
+  ('SH2', 142, False, (1.35, 2.40, 0.75, 0.00, 3.85), (2000, 9999, 1600), 1.0, 15, 8000),
+  ('SH3', 143, False, (0.45, 3.00, 0.00, 0.00, 6.20), (1600, 9999, 1400), 2.4, 40, 8000),
+  ('SH4', 144, False, (0.85, 1.15, 0.20, 0.00, 2.55), (2000, 1800, 1600), 3.0, 30, 8000),
+  ('SH5', 145, False, (3.60, 2.10, 0.00, 0.00, 2.90), (750,  9999, 1600), 6.0, 15, 8000),
+  ('SH6', 146, False, (2.90, 1.45, 0.00, 0.00, 1.40), (750,  9999, 1600), 2.0, 30, 8000),
+  ('SH7', 147, False, (3.50, 5.30, 2.20, 0.00, 3.40), (750,  9999, 1600), 6.0, 15, 8000),
+  ('SH8', 148, False, (2.05, 3.40, 0.85, 0.00, 4.35), (750,  9999, 1600), 3.0, 40, 8000),
+  ('SH9', 149, True,  (4.50, 2.45, 0.00, 1.55, 7.00), (750,  1800, 1500), 4.4, 40, 8000),
+  ('TU1', 161, True,  (0.20, 0.90, 1.50, 0.20, 0.90), (2000, 1800, 1600), 0.6, 20, 8000),
+  ('TU2', 162, False, (0.95, 1.80, 1.25, 0.00, 0.20), (2000, 9999, 1600), 1.0, 30, 8000),
+  ('TU3', 163, True,  (1.10, 0.15, 0.25, 0.65, 1.10), (1800, 1600, 1400), 1.3, 30, 8000),
+  ('TU4', 164, False, (4.50, 0.00, 0.00, 0.00, 2.00), (2300, 9999, 2000), 0.5, 12, 8000),
+  ('TU5', 165, False, (4.00, 4.00, 3.00, 0.00, 3.00), (1500, 9999, 750),  1.0, 25, 8000),
+  ('TL1', 181, False, (1.00, 2.20, 3.60, 0.00, 0.00), (2000, 9999, 9999), 0.2, 30, 8000),
+  ('TL2', 182, False, (1.40, 2.30, 2.20, 0.00, 0.00), (2000, 9999, 9999), 0.2, 25, 8000),
+  ('TL3', 183, False, (0.50, 2.20, 2.80, 0.00, 0.00), (2000, 9999, 9999), 0.3, 20, 8000),
+  ('TL4', 184, False, (0.50, 1.50, 4.20, 0.00, 0.00), (2000, 9999, 9999), 0.4, 25, 8000),
+  ('TL5', 185, False, (1.15, 2.50, 4.40, 0.00, 0.00), (2000, 9999, 9999), 0.6, 25, 8000),
+  ('TL6', 186, False, (2.40, 1.20, 1.20, 0.00, 0.00), (2000, 9999, 9999), 0.3, 25, 8000),
+  ('TL7', 187, False, (0.30, 1.40, 8.10, 0.00, 0.00), (2000, 9999, 9999), 0.4, 25, 8000),
+  ('TL8', 188, False, (5.80, 1.40, 1.10, 0.00, 0.00), (1800, 9999, 9999), 0.3, 35, 8000),
+  ('TL9', 189, False, (6.65, 3.30, 4.15, 0.00, 0.00), (1800, 9999, 9999), 0.6, 35, 8000),
+  ('SB1', 201, False, (1.50, 3.00, 11.00, 0.00, 0.00), (2000, 9999, 9999), 1.0, 25, 8000),
+  ('SB2', 202, False, (4.50, 4.25, 4.00, 0.00, 0.00), (2000, 9999, 9999), 1.0, 25, 8000),
+  ('SB3', 203, False, (5.50, 2.75, 3.00, 0.00, 0.00), (2000, 9999, 9999), 1.2, 25, 8000),
+  ('SB4', 204, False, (5.25, 3.50, 5.25, 0.00, 0.00), (2000, 9999, 9999), 2.7, 25, 8000),
+  )
+
+def _buildTable() :
+  """
+  Returns the catalog as the tuple (names, codes, dynamic, sigma, loading,
+  present, heat content, extMoisture, depth) of read-only arrays.
+  """
+  names = tuple([entry[0] for entry in _CATALOG])
+  layout = (len(names), len(CATEGORIES), len(SIZE_CLASSES))
+  codes = np.zeros(len(names), dtype=int)
+  dynamic = np.zeros(len(names), dtype=bool)
+  sigma = np.ones(layout)
+  loading = np.zeros(layout)
+  heatContent = np.full(layout, 8000.)
+  extMoisture = np.zeros(layout[:2])
+  depth = np.zeros(layout[:1])
+  dead = CATEGORIES.index(DEAD)
+  live = CATEGORIES.index(LIVE)
+  for (i, entry) in enumerate(_CATALOG) :
+    (name, code, isDynamic, loads, sigmas, modelDepth, deadExtinction,
+     heat) = entry
+    codes[i] = code
+    dynamic[i] = isDynamic
+    slots = (((dead, SIZE_CLASSES.index(ONEHR)), loads[0], sigmas[0]),
+             ((dead, SIZE_CLASSES.index(TENHR)), loads[1], _TENHR_SIGMA),
+             ((dead, SIZE_CLASSES.index(HUNDREDHR)), loads[2],
+              _HUNDREDHR_SIGMA),
+             ((live, SIZE_CLASSES.index(HERB)), loads[3], sigmas[1]),
+             ((live, SIZE_CLASSES.index(ONEHR)), loads[4], sigmas[2]))
+    for (index, load, classSigma) in slots :
+      if load > 0. :
+        loading[(i,) + index] = load * LB_FT2_PER_TON_ACRE
+        sigma[(i,) + index] = classSigma
+    # cured herbs keep the sigma of the live herbs
+    if isDynamic and loads[3] > 0. :
+      sigma[i, dead, SIZE_CLASSES.index(HERB)] = sigmas[1]
+    heatContent[i] = heat
+    extMoisture[i, dead] = deadExtinction / 100.
+    depth[i] = modelDepth
+  present = loading > 0.
+  # the dead herb class of a dynamic model may receive load
+  present[:, dead, SIZE_CLASSES.index(HERB)] = dynamic & \
+    present[:, live, SIZE_CLASSES.index(HERB)]
+  for array in (codes, dynamic, sigma, loading, present, heatContent,
+                extMoisture, depth) :
+    array.setflags(write=False)
+  return (names, codes, dynamic, sigma, loading, present, heatContent,
+          extMoisture, depth)
+
+(MODEL_NAMES, MODEL_CODES, DYNAMIC, SIGMA, LOADING, PRESENT, HEAT_CONTENT,
+ EXT_MOISTURE, DEPTH) = _buildTable()
+
+def modelIndex(models) :
+  """
+  Returns the rows in the catalog of a model, or of an array of models,
+  given by name (e.g., 'GR2') or by code (e.g., 102).
+  """
+  lookup = dict([(name, i) for (i, name) in enumerate(MODEL_NAMES)] +
+                [(int(code), i) for (i, code) in enumerate(MODEL_CODES)] +
+                [(str(code), i) for (i, code) in enumerate(MODEL_CODES)])
+  def row(model) :
+    if isinstance(model, np.integer) :
+      model = int(model)
+    if not (model in lookup) :
+      raise ValueError("Unknown fuel model: " + str(model))
+    return lookup[model]
+  models = np.asarray(models)
+  if models.ndim == 0 :
+    return row(models.item())
+  return np.vectorize(row, otypes=[int])(models)
+
+def curedFraction(liveHerbMoisture) :
+  """
+  The fraction of the herbaceous load which is cured (Scott and Burgan):
+  all of it at a live herbaceous moisture of 30% or less, none at 120% or
+  more, and linearly in between.
+  """
+  return np.clip((1.20 - np.asarray(liveHerbMoisture, dtype=float)) / 0.90,
+                 0., 1.)
+
+
+class ArrayDynamicFuelComplex (ArrayFuelComplex) :
+  """
+  An array of Scott and Burgan fuel complexes weighted by the method of
+  Rothermel, with the size classes SIZE_CLASSES.
+
+  Attributes (in addition to those of ArrayFuelComplex):
+  herbLoading      lb/ft^2        the total herbaceous loading
+  dynamic                         True where the model is dynamic
+  curing           fraction       the cured fraction of the herbaceous load
+  """
+  sizeClasses = SIZE_CLASSES
+
+  _inputNames = ArrayFuelComplex._inputNames + ('herbLoading', 'dynamic',
+                                                'curing')
+
+  calcWPrime = ArrayAlbiniFuelComplex.calcWPrime
+  calcMPrime = ArrayAlbiniFuelComplex.calcMPrime
+
+  def __init__(self, shape=()) :
+    ArrayFuelComplex.__init__(self, shape)
+    self.herbLoading = np.zeros(tuple(shape))
+    self.dynamic = np.zeros(tuple(shape), dtype=bool)
+    self.curing = np.zeros(tuple(shape))
+
+  def setCuring(self, curing) :
+    """
+    Divides the herbaceous load of the dynamic models between the dead
+    herb class (the fraction curing, an array or a value) and the live herb
+    class.  The loadings of the other models are left alone.  The complex
+    must be computed afterward.
+    """
+    cured = np.where(self.dynamic, curing, 0.)
+    self.curing = np.asarray(cured, dtype=float)
+    deadHerb = self.classIndex(DEAD, HERB)
+    liveHerb = self.classIndex(LIVE, HERB)
+    self._setSlot('classLoading', deadHerb, cured * self.herbLoading)
+    self._setSlot('classLoading', liveHerb,
+                  (1. - cured) * self.herbLoading)
+    self._setSlot('present', deadHerb,
+                  self.dynamic & (cured * self.herbLoading > 0.))
+    self._setSlot('present', liveHerb, (1. - cured) * self.herbLoading > 0.)
+
+  def setLiveHerbMoisture(self, moisture) :
+    """
+    Sets the live herbaceous moisture, and the curing which follows from
+    it (see curedFraction).
+    """
+    self.setCuring(curedFraction(moisture))
+    self.setFuelMoisture(LIVE, HERB, moisture)
+
+  def aggregateMoisture(self) :
+    """
+    Gives the dead herb class the dead 1 hr moisture, then aggregates the
+    moistures as ArrayFuelComplex does.
+    """
+    self._setSlot('classMoisture', self.classIndex(DEAD, HERB),
+                  self.classMoisture[(Ellipsis,) +
+                                     self.classIndex(DEAD, ONEHR)])
+    ArrayFuelComplex.aggregateMoisture(self)
+
+  def calcLivingExtMoisture(self) :
+    """
+    Calculates the moisture of extinction for living fuel by the method
+    in Albini appendix III, over all the fine classes, for every complex
+    having live fuel, and not less than the dead moisture of extinction.
+    Other complexes are left untouched.
+    """
+    live = self.categoryIndex(LIVE)
+    liveLoading = np.where(self.present[..., live, :],
+                           self.classLoading[..., live, :], 0.).sum(axis=-1)
+
+    self.calcWPrime()
+    self.calcMPrime()
+    deadExt = self.extMoisture[..., self.categoryIndex(DEAD)]
+    ext = 2.9 * self.wPrime
+    ext = ext * (1. - safeDivide(self.mPrime, deadExt))
+    ext = np.maximum(ext - 0.226, deadExt)
+
+    current = self.extMoisture[..., live]
+    self.setExtMoisture(LIVE, np.where(liveLoading > 0, ext, current))
+
+
+class ArrayDynamicAlbiniFuelComplex (ArrayDynamicFuelComplex,
+                                     ArrayAlbiniFuelComplex) :
+  """
+  An array of Scott and Burgan fuel complexes weighted by the method of
+  Albini.
+  """
+  pass
+
+
+# the (complex, fire model) classes of each weighting scheme
+SCHEMES = { 'rothermel' : (ArrayDynamicFuelComplex,
+                           ArrayWeightedRothermelModel),
+            'albini'    : (ArrayDynamicAlbiniFuelComplex,
+                           ArrayWeightedAlbiniModel) }
+
+def arrayFuelComplex(models, complexClass=ArrayDynamicFuelComplex) :
+  """
+  Produces and returns a new array complex of complexClass representing
+  one Scott and Burgan model (with no leading axes) or an array of them
+  (with the array's shape as leading axes), all herbaceous load live.
+  Models are given by name or code.  The complex has not been computed.
+  """
+  index = modelIndex(models)
+  result = complexClass(np.shape(index))
+  result.present = PRESENT[index].copy()
+  result.classLoading = LOADING[index].copy()
+  result.classSigma = SIGMA[index].copy()
+  result.classHeatContent = HEAT_CONTENT[index].copy()
+  result.extMoisture = EXT_MOISTURE[index].copy()
+  result.depth = DEPTH[index].copy()
+  result.herbLoading = LOADING[index][..., CATEGORIES.index(LIVE),
+                                      SIZE_CLASSES.index(HERB)].copy()
+  result.dynamic = DYNAMIC[index].copy()
+  return result
+
+def evaluate(models, oneHour, tenHour, hundredHour, liveHerb, liveWoody,
+             wind, slope, scheme='rothermel') :
+  """
+  Evaluates Scott and Burgan models (names or codes) for arrays of cells,
+  each of which may have a different model and curing.  Moistures are
+  fractions (the curing follows from liveHerb), wind is the midflame wind
+  speed (mi/h) and slope is in degrees;  all broadcast against models.
+  Returns the tuple (rateOfSpread, reactionIntensity, heatPerUnitArea,
+  fuelComplex, fireModel);  rateOfSpread and reactionIntensity are clamped
+  to zero as in the batch FBP classes.
+  """
+  if not (scheme in SCHEMES) :
+    raise ValueError("Unknown scheme: " + str(scheme))
+  (complexClass, modelClass) = SCHEMES[scheme]
+  fuel = arrayFuelComplex(models, complexClass)
+  fuel.setLiveHerbMoisture(liveHerb)
+  fuel.setFuelMoisture(DEAD, ONEHR, oneHour)
+  fuel.setFuelMoisture(DEAD, TENHR, tenHour)
+  fuel.setFuelMoisture(DEAD, HUNDREDHR, hundredHour)
+  fuel.setFuelMoisture(LIVE, ONEHR, liveWoody)
+  fuel.compute()
+  fuel.calcLivingExtMoisture()
+
+  fire = modelClass(fuel)
+  fire.evaluateStatic()
+  fire.calcWindMultiplier(np.multiply(wind, 5280. / 60.))
+  fire.calcSlopeMultiplier(np.radians(slope))
+  fire.evaluateScenario()
+
+  rateOfSpread = np.maximum(fire.ros, 0.)
+  reactionIntensity = np.maximum(fire.reactionIntensity, 0.)
+  heatPerUnitArea = behavior.heatPerUnitArea(reactionIntensity, fuel.sigma)
+  return rateOfSpread, reactionIntensity, heatPerUnitArea, fuel, fire
@@ -0,0 +1,380 @@
+"""
+Monte Carlo burn probability.  Each replicate samples a weather scenario
+and an ignition cell, evaluates the spread ellipse of every cell of the
+landscape under that weather (see the "spread" module) and finds the cells
+burned within a fixed duration by minimum travel time (see the "arrival"
+module).  For the burned cells, the flame length and fireline intensity of
+the head fire are added to per-cell histograms, giving conditional flame
+length and intensity distributions alongside the burn probability.
+
+Replicates are reproducible: replicate i always draws from the random
+generator seeded by SeedSequence(seed, spawn_key=(i,)), whichever process
+runs it.  Results are kept in BurnAccumulators, which may be merged, saved
+and loaded, so an ensemble may be split over processes or machines, or
+checkpointed and resumed.
+"""
+
+import os
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from spread import SpreadLandscape
+from arrival import ArrivalTimeSolver, NEIGHBORS_8
+from behavior import firelineIntensity, flameLength
+from parallel import describeRaster, attachRaster
+
+# the weather variables of a scenario:  dead and live fuel moistures
+# (fractions), midflame wind speed (mi/h) and the direction from which the
+# wind blows (degrees)
+WEATHER_NAMES = ('oneHour', 'tenHour', 'hundredHour', 'live', 'wind',
+                 'windDirection')
+
+# default histogram bin edges; the last bin is open ended
+FLAME_LENGTH_BINS = (0., 2., 4., 6., 8., 12., 20.)
+INTENSITY_BINS = (0., 100., 500., 1000., 2000., 4000., 10000.)
+
+class DistributionWeather :
+  """
+  Samples weather from independent distributions.  Each variable of
+  WEATHER_NAMES is given as a number (constant), a tuple ('uniform', low,
+  high), a tuple ('normal', mean, standardDeviation, low, high) which is
+  clipped to [low, high], or a function of (generator, n) returning n
+  values.
+  """
+
+  def __init__(self, **variables) :
+    for name in WEATHER_NAMES :
+      if not (name in variables) :
+        raise ValueError("Missing weather variable: " + name)
+    self.variables = variables
+
+  def _draw(self, spec, generator, n) :
+    if callable(spec) :
+      return np.asarray(spec(generator, n), dtype=float)
+    if not isinstance(spec, tuple) :
+      return np.full(n, float(spec))
+    if spec[0] == 'uniform' :
+      return generator.uniform(spec[1], spec[2], n)
+    if spec[0] == 'normal' :
+      return np.clip(generator.normal(spec[1], spec[2], n), spec[3], spec[4])
+    raise ValueError("Unknown distribution: " + str(spec[0]))
+
+  def sample(self, generator, n=1) :
+    """
+    Returns a dictionary of WEATHER_NAMES to arrays of n sampled values.
+    """
+    return dict([(name, self._draw(self.variables[name], generator, n))
+                 for name in WEATHER_NAMES])
+
+
+class HistoricalWeather :
+  """
+  Samples whole rows, with replacement, from a table of observed weather:
+  a dictionary of WEATHER_NAMES to equal length sequences, or a list of
+  dictionaries.  Rows may be given sampling weights.
+  """
+
+  def __init__(self, table, weights=None) :
+    if isinstance(table, dict) :
+      self.table = dict([(name, np.asarray(table[name], dtype=float))
+                         for name in WEATHER_NAMES])
+    else :
+      self.table = dict([(name, np.array([float(row[name]) for row in table]))
+                         for name in WEATHER_NAMES])
+    self.rows = len(self.table[WEATHER_NAMES[0]])
+    if weights is not None :
+      weights = np.asarray(weights, dtype=float)
+      weights = weights / weights.sum()
+    self.weights = weights
+
+  def sample(self, generator, n=1) :
+    """
+    Returns a dictionary of WEATHER_NAMES to arrays of n sampled values.
+    """
+    rows = generator.choice(self.rows, n, p=self.weights)
+    return dict([(name, self.table[name][rows]) for name in WEATHER_NAMES])
+
+
+class BurnAccumulator :
+  """
+  Per-cell counts of an ensemble of fires.
+
+  Attributes:
+  shape                           (rows, columns) of the landscape
+  flameLengthBins  ft             histogram bin edges of flame length
+  intensityBins    BTU/ft/s       histogram bin edges of fireline intensity
+  replicates                      sorted array of the replicate indices
+                                  accumulated
+  burnCount                       raster of the number of replicates in
+                                  which each cell burned
+  flameLengthCounts               (rows, columns, bins) counts of the flame
+                                  length of burned cells
+  intensityCounts                 (rows, columns, bins) counts of the
+                                  fireline intensity of burned cells
+  """
+
+  def __init__(self, shape, flameLengthBins=FLAME_LENGTH_BINS,
+               intensityBins=INTENSITY_BINS) :
+    self.shape = tuple(shape)
+    self.flameLengthBins = np.asarray(flameLengthBins, dtype=float)
+    self.intensityBins = np.asarray(intensityBins, dtype=float)
+    self.replicates = np.zeros(0, dtype=np.int64)
+    self.burnCount = np.zeros(self.shape, dtype=np.int32)
+    self.flameLengthCounts = np.zeros(self.shape +
+                                      (len(self.flameLengthBins),),
+                                      dtype=np.int32)
+    self.intensityCounts = np.zeros(self.shape + (len(self.intensityBins),),
+                                    dtype=np.int32)
+
+  def add(self, index, burned, flameLength, intensity) :
+    """
+    Accumulates replicate index, given the boolean raster of burned cells
+    and the flame length and fireline intensity rasters.
+    """
+    self.replicates = np.union1d(self.replicates, [index])
+    self.burnCount += burned
+    (rows, cols) = np.nonzero(burned)
+    for (counts, bins, values) in \
+        ((self.flameLengthCounts, self.flameLengthBins, flameLength),
+         (self.intensityCounts, self.intensityBins, intensity)) :
+      which = np.clip(np.searchsorted(bins, values[rows, cols],
+                                      side='right') - 1, 0, len(bins) - 1)
+      np.add.at(counts, (rows, cols, which), 1)
+
+  def merge(self, other) :
+    """
+    Adds the counts of another accumulator, which must have accumulated
+    different replicates, with the same bins.
+    """
+    if other.shape != self.shape or \
+       not np.array_equal(other.flameLengthBins, self.flameLengthBins) or \
+       not np.array_equal(other.intensityBins, self.intensityBins) :
+      raise ValueError("Accumulators have different shapes or bins.")
+    if len(np.intersect1d(self.replicates, other.replicates)) :
+      raise ValueError("Accumulators share replicates.")
+    self.replicates = np.union1d(self.replicates, other.replicates)
+    self.burnCount += other.burnCount
+    self.flameLengthCounts += other.flameLengthCounts
+    self.intensityCounts += other.intensityCounts
+    return self
+
+  def burnProbability(self) :
+    """
+    Returns the raster of the fraction of replicates in which each cell
+    burned.
+    """
+    return self.burnCount / float(max(len(self.replicates), 1))
+
+  def conditionalFlameLength(self) :
+    """
+    Returns the (rows, columns, bins) probabilities of each flame length
+    bin given that the cell burned; zero for cells which never burned.
+    """
+    return self.flameLengthCounts / \
+           np.maximum(self.burnCount, 1)[..., np.newaxis].astype(float)
+
+  def conditionalIntensity(self) :
+    """
+    Returns the (rows, columns, bins) probabilities of each fireline
+    intensity bin given that the cell burned.
+    """
+    return self.intensityCounts / \
+           np.maximum(self.burnCount, 1)[..., np.newaxis].astype(float)
+
+  def save(self, path) :
+    """
+    Saves the accumulator to a .npz file, replacing it atomically.
+    """
+    temporary = path + '.tmp.npz'
+    np.savez(temporary, replicates=self.replicates, burnCount=self.burnCount,
+             flameLengthBins=self.flameLengthBins,
+             intensityBins=self.intensityBins,
+             flameLengthCounts=self.flameLengthCounts,
+             intensityCounts=self.intensityCounts)
+    os.replace(temporary, path)
+
+  @classmethod
+  def load(cls, path) :
+    """
+    Loads an accumulator saved by save.
+    """
+    with np.load(path) as data :
+      result = cls(data['burnCount'].shape, data['flameLengthBins'],
+                   data['intensityBins'])
+      result.replicates = data['replicates']
+      result.burnCount = data['burnCount']
+      result.flameLengthCounts = data['flameLengthCounts']
+      result.intensityCounts = data['intensityCounts']
+    return result
+
+
+class BurnProbabilityEnsemble :
+  """
+  Runs fire spread replicates over a landscape under sampled weather.
+
+  Attributes:
+  fuelModels                      raster of NFFL fuel model codes
+  slope            degrees        raster (or uniform value) of slope
+  aspect           degrees        raster (or uniform value) of aspect
+  weather                         a DistributionWeather, HistoricalWeather
+                                  or any object with the same sample method
+  cellSize         ft             width of a (square) cell
+  duration         min            time each fire is allowed to spread
+  scheme                          'rothermel' or 'albini'
+  seed                            the ensemble's random seed
+  ignitionWeights                 optional raster of relative ignition
+                                  probability; by default every burnable
+                                  cell is equally likely
+  """
+
+  def __init__(self, fuelModels, slope, aspect, weather, cellSize, duration,
+               scheme='rothermel', seed=0, ignitionWeights=None,
+               flameLengthBins=FLAME_LENGTH_BINS,
+               intensityBins=INTENSITY_BINS, neighbors=NEIGHBORS_8) :
+    self.fuelModels = fuelModels
+    self.slope = slope
+    self.aspect = aspect
+    self.weather = weather
+    self.cellSize = cellSize
+    self.duration = duration
+    self.scheme = scheme
+    self.seed = seed
+    self.ignitionWeights = ignitionWeights
+    self.flameLengthBins = flameLengthBins
+    self.intensityBins = intensityBins
+    self.neighbors = neighbors
+    self._landscape = None
+
+  def generator(self, index) :
+    """
+    Returns the random generator of replicate index.
+    """
+    return np.random.default_rng(np.random.SeedSequence(self.seed,
+                                                        spawn_key=(index,)))
+
+  def newAccumulator(self) :
+    return BurnAccumulator(np.shape(self.fuelModels), self.flameLengthBins,
+                           self.intensityBins)
+
+  def replicate(self, index) :
+    """
+    Runs replicate index.  Returns (weather, ignition, burned, flame
+    length, fireline intensity), where weather is a dictionary of the
+    sampled values, ignition the (row, column) ignited (None if nothing
+    could burn) and the rest are rasters.
+    """
+    generator = self.generator(index)
+    weather = dict([(name, float(values[0])) for (name, values) in
+                    self.weather.sample(generator, 1).items()])
+
+    if self._landscape is None :
+      self._landscape = SpreadLandscape(self.fuelModels, self.slope, 0., 0.,
+                                        0., 0., 0., 0., self.aspect,
+                                        self.scheme)
+    landscape = self._landscape
+    for name in WEATHER_NAMES :
+      setattr(landscape, name, weather[name])
+    outputs = landscape.run(dtype=np.float64)
+    intensity = firelineIntensity(outputs['headRos'],
+                                  outputs['heatPerUnitArea'])
+    flame = flameLength(intensity)
+
+    weights = (outputs['headRos'] > 0.).ravel().astype(float)
+    if self.ignitionWeights is not None :
+      weights = weights * np.ravel(self.ignitionWeights)
+    if weights.sum() <= 0. :
+      return weather, None, np.zeros(landscape.shape, dtype=bool), flame, \
+             intensity
+    cell = generator.choice(weights.size, p=weights / weights.sum())
+    ignition = divmod(int(cell), landscape.shape[1])
+
+    solver = ArrivalTimeSolver.fromSpreadLandscape(outputs, self.cellSize,
+                                                   self.neighbors)
+    burned = np.isfinite(solver.solve([ignition], self.duration))
+    return weather, ignition, burned, flame, intensity
+
+  def runReplicates(self, indices) :
+    """
+    Runs the given replicates in this process.  Returns a new accumulator.
+    """
+    accumulator = self.newAccumulator()
+    for index in indices :
+      (weather, ignition, burned, flame, intensity) = self.replicate(index)
+      accumulator.add(index, burned, flame, intensity)
+    return accumulator
+
+  def run(self, replicates, workers=1, chunkSize=16, accumulator=None,
+          checkpoint=None) :
+    """
+    Runs replicates 0 to replicates-1 over workers processes, chunkSize
+    replicates per unit of work, and returns the accumulator.  Replicates
+    already in accumulator are skipped.  If checkpoint names a file, the
+    accumulator is loaded from it (if it exists and no accumulator is
+    given) and saved to it after every chunk, so an interrupted run may be
+    resumed by running it again.
+    """
+    if accumulator is None :
+      if checkpoint is not None and os.path.exists(checkpoint) :
+        accumulator = BurnAccumulator.load(checkpoint)
+      else :
+        accumulator = self.newAccumulator()
+    pending = np.setdiff1d(np.arange(replicates), accumulator.replicates)
+    chunks = [pending[i:i + chunkSize]
+              for i in range(0, len(pending), chunkSize)]
+
+    if workers == 1 :
+      for chunk in chunks :
+        accumulator.merge(self.runReplicates(chunk))
+        if checkpoint is not None :
+          accumulator.save(checkpoint)
+      return accumulator
+
+    owned = []
+    try :
+      rasters = dict([(name, describeRaster(getattr(self, name), owned))
+                      for name in ('fuelModels', 'slope', 'aspect',
+                                   'ignitionWeights')])
+      with ProcessPoolExecutor(max_workers=workers, initializer=_initWorker,
+                               initargs=(self, rasters)) as pool :
+        for partial in pool.map(_runChunk, chunks) :
+          accumulator.merge(partial)
+          if checkpoint is not None :
+            accumulator.save(checkpoint)
+    finally :
+      for block in owned :
+        block.close()
+        block.unlink()
+    return accumulator
+
+  def __getstate__(self) :
+    # rasters are passed to worker processes through shared memory, and
+    # each process evaluates its own landscape
+    state = dict(self.__dict__)
+    for name in ('fuelModels', 'slope', 'aspect', 'ignitionWeights',
+                 '_landscape') :
+      state[name] = None
+    return state
+
+
+# the ensemble of a worker process, and the shared memory it is attached to
+_ensemble = None
+_blocks = []
+
+def _initWorker(ensemble, rasters) :
+  """
+  Worker process initializer:  attaches the ensemble to the shared
+  rasters.
+  """
+  global _ensemble
+  for (name, description) in rasters.items() :
+    if description == ('value', None) :
+      continue
+    (raster, block) = attachRaster(description)
+    setattr(ensemble, name, raster)
+    _blocks.append(block)
+  _ensemble = ensemble
+
+def _runChunk(indices) :
+  """
+  Worker process entry point.  Runs the given replicates.
+  """
+  return _ensemble.runReplicates(indices)
@@ -4,13 +4,101 @@ prediction model coded in this package.
 """
 
 import math
+import threading
+from collections import OrderedDict
 import nffl
 from model import RothermelFuel
 from rothweights import WeightedRothermelModel, RothermelFuelComplex, \
                         LIVE, DEAD
 from albini import WeightedAlbiniModel, AlbiniFuelComplex, AlbiniFuel
+from incremental import IncrementalEvaluator
 from common.fbp import FireBehaviorPrediction
 
+class ScenarioCache : 
+  """
+  A bounded, least-recently-used cache of fire behavior results keyed on 
+  the fuel model and the quantized scenario inputs.  Inputs which fall 
+  within the same quantization step share one cached result (that of the 
+  first scenario evaluated), so the steps bound the error introduced by 
+  the cache.  One instance may be shared by many RothermelFBP and AlbiniFBP
+  objects; see RothermelFBP.enableScenarioCache.
+
+  Attributes:
+  maxSize                         maximum number of cached scenarios
+  moistureStep (fraction)         quantization step of fuel moistures
+  windStep     mi/h               quantization step of midflame wind speed
+  slopeStep    degrees            quantization step of slope
+  hits                            number of lookups answered by the cache
+  misses                          number of lookups not in the cache
+  evictions                       number of results discarded to make room
+  """
+  def __init__(self, maxSize=4096, moistureStep=0.0001, windStep=0.01, 
+               slopeStep=0.01) : 
+    self.maxSize = maxSize
+    self.moistureStep = moistureStep
+    self.windStep = windStep
+    self.slopeStep = slopeStep
+    self._results = OrderedDict()
+    self._lock = threading.Lock()
+    self.hits = 0
+    self.misses = 0
+    self.evictions = 0
+
+  def _quantize(self, value, step) : 
+    return int(round(value / step))
+
+  def key(self, fuelModel, deadMoistures, liveMoistures, wind, slope) : 
+    """
+    Produces the cache key of a scenario.  fuelModel is any hashable value
+    identifying the fuel model and weighting scheme; the moistures are 
+    dictionaries of size class to moisture.
+    """
+    dead = tuple(sorted([(c, self._quantize(m, self.moistureStep)) 
+                         for (c, m) in deadMoistures.items()]))
+    live = tuple(sorted([(c, self._quantize(m, self.moistureStep)) 
+                         for (c, m) in liveMoistures.items()]))
+    return (fuelModel, dead, live, self._quantize(wind, self.windStep), 
+            self._quantize(slope, self.slopeStep))
+
+  def get(self, key) : 
+    """
+    Returns the cached result for key, or None if there is none.
+    """
+    with self._lock : 
+      result = self._results.get(key)
+      if result is None : 
+        self.misses += 1
+      else : 
+        self.hits += 1
+        self._results.move_to_end(key)
+      return result
+
+  def put(self, key, result) : 
+    """
+    Stores the result for key, discarding the least recently used results
+    if the cache is full.
+    """
+    with self._lock : 
+      self._results[key] = result
+      self._results.move_to_end(key)
+      while len(self._results) > self.maxSize : 
+        self._results.popitem(last=False)
+        self.evictions += 1
+
+  def clear(self) : 
+    """
+    Discards all cached results and resets the counters.
+    """
+    with self._lock : 
+      self._results.clear()
+      self.hits = 0
+      self.misses = 0
+      self.evictions = 0
+
+  def __len__(self) : 
+    return len(self._results)
+
+
 class RothermelFBP(FireBehaviorPrediction) :
   """
   Configures a "fire behavior prediction" element using the 
@@ -35,22 +123,65 @@ class RothermelFBP(FireBehaviorPrediction) :
   fuelComplex    = None
   fireModel      = None
 
+  # moisture, wind and slope independent values of a named fuel model
+  staticFuel     = None
+
+  # reruns only the stages of the calculation whose inputs have changed
+  evaluator      = None
+
+  # the name of the named fuel model, and the moistures set on it
+  fuelModelName  = None
+  _deadMoistures = None
+  _liveMoistures = None
+
+  # opt-in result cache shared by all instances (see enableScenarioCache)
+  scenarioCache  = None
+
+  @staticmethod
+  def enableScenarioCache(maxSize=4096, moistureStep=0.0001, windStep=0.01,
+                          slopeStep=0.01) : 
+    """
+    Creates a ScenarioCache shared by all RothermelFBP and AlbiniFBP 
+    instances, replacing any existing cache.  Only named fuel models are 
+    cached.  Returns the new cache so its counters may be inspected.
+    """
+    RothermelFBP.scenarioCache = ScenarioCache(maxSize, moistureStep, 
+                                               windStep, slopeStep)
+    return RothermelFBP.scenarioCache
+
+  @staticmethod
+  def disableScenarioCache() : 
+    """
+    Discards the shared scenario cache.
+    """
+    RothermelFBP.scenarioCache = None
+
   def _setFuelModel(self) : 
     if self.fireModel == None : 
       self.fireModel = self._fbpFireModelClass(self.fuelComplex)
     else : 
       self.fireModel.fuel = self.fuelComplex
+    self.evaluator = None
 
   def setNamedFuelModel(self, modelName) : 
     # let the parent do it's thing
     FireBehaviorPrediction.setNamedFuelModel(self, modelName)
 
     # create a named NFFL fuel model
-    nffl.FuelComponent = self._fbpFuelComponentClass
-    nffl.FuelComplex   = self._fbpFuelModelClass
-    self.fuelComplex = (self.fuelModelMethods[modelName])()
+    self.fuelComplex = (self.fuelModelMethods[modelName])(
+                         self._fbpFuelComponentClass, self._fbpFuelModelClass)
     self._setFuelModel()
 
+    # named models never change, so their static values are computed
+    # once per process and shared.
+    self.staticFuel = nffl.staticFuel(modelName, self.fuelComplex, 
+                                      self._fbpFireModelClass)
+    self.staticFuel.apply(self.fuelComplex, self.fireModel)
+
+    self.fuelModelName = modelName
+    self._deadMoistures = {}
+    self._liveMoistures = {}
+
 
   def setCustomFuelModel(self, model) : 
     # let the parent do it's thing
@@ -58,6 +189,8 @@ class RothermelFBP(FireBehaviorPrediction) :
 
     # retain the reference
     self.fuelComplex = model
+    self.staticFuel = None
+    self.fuelModelName = None
     self._setFuelModel()
 
 
@@ -76,6 +209,8 @@ class RothermelFBP(FireBehaviorPrediction) :
         raise ValueError("Size class: " + sizeClass + " not in fuel model.")
 
       self.fuelComplex.setFuelMoisture(DEAD, sizeClass, moisture)
+      if self._deadMoistures != None : 
+        self._deadMoistures[sizeClass] = moisture
 
 
   def setLiveFuelMoistures(self, moistures) : 
@@ -97,6 +232,8 @@ class RothermelFBP(FireBehaviorPrediction) :
         raise ValueError("Size class: " + sizeClass + " not in fuel model.")
 
       self.fuelComplex.setFuelMoisture(LIVE, sizeClass, moisture)
+      if self._liveMoistures != None : 
+        self._liveMoistures[sizeClass] = moisture
 
   def getRateOfSpread(self) : 
     # check to see if the value is cached.
@@ -118,28 +255,51 @@ class RothermelFBP(FireBehaviorPrediction) :
       self.heatPerArea = 0.
     return self.heatPerArea
     
+  def _scenarioKey(self) : 
+    """
+    Returns the scenario cache key of the current inputs, or None if the 
+    result should not be cached.
+    """
+    if (self.scenarioCache == None) or (self.fuelModelName == None) : 
+      return None
+    fuelModel = (self._fbpFuelModelClass, self._fbpFireModelClass, 
+                 self.fuelModelName)
+    return self.scenarioCache.key(fuelModel, self._deadMoistures, 
+                                  self._liveMoistures, 
+                                  self.midflameWindSpeed, self.slope)
+
   def evaluate(self) : 
     # only recompute if BOTH rateOfSpread and heatPerArea are null
     if (self.rateOfSpread == None) and (self.heatPerArea == None) :
-      # aggregate the components into category and complex values
-      self.fuelComplex.compute()
-
-      # if there are live fuels, compute the live fuel moisture of 
-      # extinction
-      if LIVE in self.fuelComplex.fuelParameters : 
-        self.fuelComplex.calcLivingExtMoisture()
+      # the key is built from the current inputs, so a cached result can
+      # never be stale.  Note that the fire model's intermediate values are
+      # not updated by a cache hit.
+      key = self._scenarioKey()
+      if key != None : 
+        cached = self.scenarioCache.get(key)
+        if cached != None : 
+          (self.rateOfSpread, self.heatPerArea) = cached
+          return
 
-      # set the slope and the wind now
-      self.fireModel.setSlope(math.radians(self.slope))
-      self.fireModel.setWind(self.midflameWindSpeed * (5280. / 60.))
-
-      # compute the fire behavior
-      self.fireModel.evaluate()
+      # only the stages whose inputs have changed since the last 
+      # evaluation are rerun.  The evaluator compares the fuel inputs with
+      # those it last saw, so changes the caller makes to a custom fuel 
+      # model are picked up.
+      if self.evaluator == None : 
+        self.evaluator = IncrementalEvaluator(self.fuelComplex, 
+                                              self.fireModel, 
+                                              self.staticFuel != None)
+      self.evaluator.setSlope(math.radians(self.slope))
+      self.evaluator.setWind(self.midflameWindSpeed * (5280. / 60.))
+      self.evaluator.evaluate()
 
       # store the results
       self.heatPerArea = self.fireModel.reactionIntensity
       self.rateOfSpread = self.fireModel.ros
 
+      if key != None : 
+        self.scenarioCache.put(key, (self.rateOfSpread, self.heatPerArea))
+
 class AlbiniFBP(RothermelFBP) : 
   """
   Configures a fire behavior prediction element utilizing the Albini
@@ -0,0 +1,252 @@
+"""
+Two dimensional fire growth by Huygens' principle.  The fire front is a
+closed polygon whose vertices each act as the ignition point of an
+elliptical wavelet (see the "spread" module).  Every vertex is advanced by
+the differential form of the wavelet envelope given by Richards (1990),
+using the spread ellipse of the cell it is in, so that heterogeneous
+fuels, wind and slope shape the perimeter.  All the vertices of a fire are
+advanced together with array operations, so the cost of a time step
+depends on the length of the perimeter, not the size of the landscape.
+
+Coordinates are in feet, with x increasing to the east and y to the north.
+Row 0 of the rasters is the northern edge and column 0 the western edge;
+the south-west corner of the landscape is at (0, 0).  Times are in
+minutes.
+
+Crossovers of the perimeter with itself (where fronts merge around
+obstacles) are not clipped; the burned area is found by the even-odd rule,
+so a loop which crosses over itself leaves its twisted part unburned.
+
+References:
+Richards, G. D. An elliptical growth model of forest fire fronts and its
+  numerical solution.  International Journal for Numerical Methods in
+  Engineering 30:1163-1179. 1990.
+Finney, M. A. FARSITE: Fire Area Simulator -- model development and
+  evaluation.  Research Paper RMRS-RP-4, USDA Forest Service. 1998. 47 p.
+"""
+
+import numpy as np
+from spread import SpreadEllipse
+
+class FireGrowth :
+  """
+  Grows fire perimeters over a raster of spread ellipses.
+
+  Attributes:
+  headRos          ft/min         raster of head fire rate of spread
+  direction        degrees        raster of the azimuth of maximum spread
+  lengthToBreadth                 raster of ellipse length to breadth ratios
+  cellSize         ft             width of a (square) cell
+  shape                           (rows, columns) of the rasters
+  resolution       ft             largest distance between perimeter vertices
+  perimeters                      list of (x, y) vertex arrays, one per fire,
+                                  counterclockwise
+  time             min            time since ignition
+  arrivalTime      min            raster of the time at which each cell was
+                                  first found burned; NaN if unburned
+  """
+
+  def __init__(self, headRos, direction, lengthToBreadth, cellSize,
+               resolution=None) :
+    self.headRos = headRos
+    self.direction = direction
+    self.lengthToBreadth = lengthToBreadth
+    self.cellSize = float(cellSize)
+    self.shape = np.shape(headRos)
+    self.resolution = resolution or self.cellSize / 2.
+    self.perimeters = []
+    self.time = 0.
+    self.arrivalTime = np.full(self.shape, np.nan, dtype=np.float32)
+
+  @classmethod
+  def fromSpreadLandscape(cls, outputs, cellSize, resolution=None) :
+    """
+    Makes a FireGrowth from the outputs of SpreadLandscape.run.
+    """
+    return cls(outputs['headRos'], outputs['spreadDirection'],
+               outputs['lengthToBreadth'], cellSize, resolution)
+
+  def ignite(self, x, y, radius=None, vertices=16) :
+    """
+    Starts a new fire as a small circle centered at (x, y).
+    """
+    radius = radius or self.resolution / 2.
+    angle = np.linspace(0., 2. * np.pi, vertices, endpoint=False)
+    self.perimeters.append((x + radius * np.cos(angle),
+                            y + radius * np.sin(angle)))
+
+  def cellOf(self, x, y) :
+    """
+    Returns the (row, column) arrays of the cells containing the points,
+    and a boolean array which is False for points outside the landscape.
+    """
+    col = np.floor(x / self.cellSize).astype(np.intp)
+    row = self.shape[0] - 1 - np.floor(y / self.cellSize).astype(np.intp)
+    inside = (row >= 0) & (row < self.shape[0]) & \
+             (col >= 0) & (col < self.shape[1])
+    return np.where(inside, row, 0), np.where(inside, col, 0), inside
+
+  def velocity(self, x, y) :
+    """
+    Returns the (dx/dt, dy/dt) of every vertex of a counterclockwise
+    perimeter, by Richards' (1990) equations.  Vertices outside the
+    landscape do not move.
+    """
+    (row, col, inside) = self.cellOf(x, y)
+    headRos = np.where(inside, np.asarray(self.headRos[row, col],
+                                          dtype=float), 0.)
+    ellipse = SpreadEllipse(headRos,
+                            np.asarray(self.direction[row, col], dtype=float),
+                            np.asarray(self.lengthToBreadth[row, col],
+                                       dtype=float))
+    (a, b, c) = ellipse.axes()
+    theta = np.radians(ellipse.direction)
+    sin = np.sin(theta)
+    cos = np.cos(theta)
+
+    # the perimeter's tangent at each vertex (central differences)
+    xs = np.roll(x, -1) - np.roll(x, 1)
+    ys = np.roll(y, -1) - np.roll(y, 1)
+
+    along = xs * sin + ys * cos
+    across = xs * cos - ys * sin
+    norm = np.sqrt(b * b * across * across + a * a * along * along)
+    norm = np.where(norm > 0., norm, 1.)
+    dx = (a * a * cos * along - b * b * sin * across) / norm + c * sin
+    dy = (-a * a * sin * along - b * b * cos * across) / norm + c * cos
+    return dx, dy
+
+  def _redistribute(self, x, y) :
+    """
+    Inserts vertices into segments longer than the resolution and removes
+    vertices closer than a quarter of it to their predecessor.
+    """
+    dx = np.roll(x, -1) - x
+    dy = np.roll(y, -1) - y
+    length = np.hypot(dx, dy)
+
+    keep = np.roll(length, 1) >= self.resolution / 4.
+    if keep.sum() >= 3 and not keep.all() :
+      (x, y) = (x[keep], y[keep])
+      dx = np.roll(x, -1) - x
+      dy = np.roll(y, -1) - y
+      length = np.hypot(dx, dy)
+
+    pieces = np.maximum(np.ceil(length / self.resolution), 1).astype(np.intp)
+    if (pieces == 1).all() :
+      return x, y
+    start = np.repeat(np.arange(len(x)), pieces)
+    offsets = np.arange(pieces.sum()) - np.repeat(np.cumsum(pieces) - pieces,
+                                                  pieces)
+    frac = offsets / np.repeat(pieces, pieces)
+    return x[start] + frac * dx[start], y[start] + frac * dy[start]
+
+  def maxVelocity(self) :
+    """
+    Returns the largest vertex speed of all the perimeters (ft/min).
+    """
+    speed = 0.
+    for (x, y) in self.perimeters :
+      (dx, dy) = self.velocity(x, y)
+      speed = max(speed, float(np.max(np.hypot(dx, dy))))
+    return speed
+
+  def step(self, dt) :
+    """
+    Advances every perimeter by dt minutes (second order Runge-Kutta).
+    """
+    advanced = []
+    for (x, y) in self.perimeters :
+      (dx, dy) = self.velocity(x, y)
+      (mx, my) = (x + 0.5 * dt * dx, y + 0.5 * dt * dy)
+      (dx, dy) = self.velocity(mx, my)
+      advanced.append(self._redistribute(x + dt * dx, y + dt * dy))
+    self.perimeters = advanced
+    self.time += dt
+
+  def advance(self, duration, maxTimeStep=10., courant=0.5) :
+    """
+    Advances the fires by duration minutes, in time steps small enough
+    that no vertex moves more than courant times the resolution.
+    """
+    end = self.time + duration
+    while self.time < end - 1e-9 :
+      speed = self.maxVelocity()
+      dt = end - self.time
+      dt = min(dt, maxTimeStep)
+      if speed > 0. :
+        dt = min(dt, courant * self.resolution / speed)
+      self.step(dt)
+
+  def burned(self) :
+    """
+    Returns a boolean raster of the cells whose centers are inside any of
+    the perimeters (even-odd rule).  Only the bounding box of each
+    perimeter is scanned.
+    """
+    mask = np.zeros(self.shape, dtype=bool)
+    size = self.cellSize
+    for (x, y) in self.perimeters :
+      (x0, y0) = (x, y)
+      (x1, y1) = (np.roll(x, -1), np.roll(y, -1))
+
+      # the rows whose centers each edge crosses:  center y is
+      # (rows - row - 0.5) * size
+      lo = np.minimum(y0, y1)
+      hi = np.maximum(y0, y1)
+      first = np.ceil(lo / size - 0.5).astype(np.intp)
+      last = np.ceil(hi / size - 0.5).astype(np.intp) - 1
+      count = np.maximum(last - first + 1, 0)
+      if count.sum() == 0 :
+        continue
+      edge = np.repeat(np.arange(len(x)), count)
+      level = np.repeat(first, count) + np.arange(count.sum()) - \
+              np.repeat(np.cumsum(count) - count, count)
+      yc = (level + 0.5) * size
+      t = (yc - y0[edge]) / (y1[edge] - y0[edge])
+      xc = x0[edge] + t * (x1[edge] - x0[edge])
+
+      # pair up the crossings of each row, left to right
+      order = np.lexsort((xc, level))
+      (level, xc) = (level[order], xc[order])
+      (level, start, stop) = (level[0::2], xc[0::2], xc[1::2])
+      row = self.shape[0] - 1 - level
+      colStart = np.clip(np.ceil(start / size - 0.5), 0, self.shape[1])
+      colStop = np.clip(np.ceil(stop / size - 0.5), 0, self.shape[1])
+      valid = (row >= 0) & (row < self.shape[0]) & (colStop > colStart)
+      if not valid.any() :
+        continue
+      (row, colStart, colStop) = (row[valid], colStart[valid].astype(np.intp),
+                                  colStop[valid].astype(np.intp))
+
+      # fill the spans within the bounding box with a difference array
+      (top, bottom) = (row.min(), row.max() + 1)
+      (left, right) = (colStart.min(), colStop.max())
+      diff = np.zeros((bottom - top, right - left + 1), dtype=np.int32)
+      np.add.at(diff, (row - top, colStart - left), 1)
+      np.add.at(diff, (row - top, colStop - left), -1)
+      mask[top:bottom, left:right] |= \
+        (np.cumsum(diff, axis=1)[:, :-1] > 0)
+    return mask
+
+  def record(self) :
+    """
+    Records the current time as the arrival time of every cell which has
+    burned since the last record.
+    """
+    newly = self.burned() & np.isnan(self.arrivalTime)
+    self.arrivalTime[newly] = self.time
+
+  def run(self, duration, outputInterval=60., maxTimeStep=10.,
+          courant=0.5) :
+    """
+    Grows the fires for duration minutes, recording arrival times every
+    outputInterval minutes.  Returns the arrivalTime raster.
+    """
+    end = self.time + duration
+    self.record()
+    while self.time < end - 1e-9 :
+      self.advance(min(outputInterval, end - self.time), maxTimeStep,
+                   courant)
+      self.record()
+    return self.arrivalTime
@@ -0,0 +1,175 @@
+"""
+Incremental evaluation of a weighted fuel complex and its fire model.  The
+calculation is divided into stages, each of which depends on some inputs
+and on the stages before it:
+
+  static      fuel loadings, sigmas, mineral and heat contents, particle
+              densities, depth and dead moisture of extinction
+              (computeStatic and evaluateStatic)
+  moisture    size class moistures:  category moistures, live moisture of
+              extinction and moisture damping
+  intensity   reaction intensity and no-wind rate of spread
+  wind        midflame wind speed:  wind multiplier
+  slope       slope:  slope multiplier
+  ros         rate of spread
+
+Changing an input marks its stage, and every stage depending on it,
+dirty;  evaluate() then runs only the dirty stages.  Changing only the
+wind runs only the wind multiplier and the rate of spread;  changing a
+moisture runs the moisture, intensity and ros stages.
+
+The fuel and moisture inputs are also checked against a snapshot taken at
+the last evaluation, so changes made directly to the fuel complex or its
+components (rather than through this class) are never missed.
+"""
+
+from rothweights import LIVE
+
+# the stages, in the order in which they are run, and those they depend on
+STAGES = ('static', 'moisture', 'intensity', 'wind', 'slope', 'ros')
+DEPENDENCIES = { 'static'    : (),
+                 'moisture'  : ('static',),
+                 'intensity' : ('moisture',),
+                 'wind'      : ('static',),
+                 'slope'     : ('static',),
+                 'ros'       : ('intensity', 'wind', 'slope') }
+
+# the attributes of a fuel component which the static stage depends on
+COMPONENT_INPUTS = ('ovendryLoading', 'sigma', 'totMineralContent',
+                    'effMineralContent', 'heatContent', 'particleDensity')
+
+class IncrementalEvaluator :
+  """
+  Evaluates a weighted fuel complex (e.g., RothermelFuelComplex) with its
+  fire model (e.g., WeightedRothermelModel), rerunning only the stages
+  whose inputs have changed.
+
+  Attributes:
+  fuelComplex                     the fuel complex
+  fireModel                       the fire model
+  midflameWind     ft/min         the midflame wind speed
+  slope            radians        the slope
+  dirty                           the set of stages to run
+  recomputed                      the stages run by the last evaluate
+  """
+
+  def __init__(self, fuelComplex, fireModel, staticComputed=False) :
+    """
+    If staticComputed is True, the static values of the fuel complex and
+    fire model are taken to be up to date already.
+    """
+    self.fuelComplex = fuelComplex
+    self.fireModel = fireModel
+    self.midflameWind = None
+    self.slope = None
+    self.dirty = set(STAGES)
+    self.recomputed = ()
+    self._staticInputs = None
+    self._moistureInputs = None
+    if staticComputed :
+      self.dirty.discard('static')
+      self._staticInputs = self.staticInputs()
+
+  def invalidate(self, stage) :
+    """
+    Marks stage, and every stage which depends on it, dirty.
+    """
+    self.dirty.add(stage)
+    for (other, requires) in DEPENDENCIES.items() :
+      if stage in requires and not (other in self.dirty) :
+        self.invalidate(other)
+
+  def staticInputs(self) :
+    """
+    Returns a snapshot of the inputs of the static stage.
+    """
+    fuel = self.fuelComplex
+    components = []
+    for (category, classes) in sorted(fuel.fuelParameters.items()) :
+      for (sizeClass, component) in sorted(classes.items()) :
+        components.append((category, sizeClass) +
+                          tuple([getattr(component, name)
+                                 for name in COMPONENT_INPUTS]))
+    # the live moisture of extinction is calculated, not an input
+    extinction = tuple([item for item in sorted(fuel.extMoisture.items())
+                        if item[0] != LIVE])
+    return (tuple(components), extinction, fuel.depth)
+
+  def moistureInputs(self) :
+    """
+    Returns a snapshot of the inputs of the moisture stage.
+    """
+    return tuple([(category, sizeClass, component.fuelMoisture)
+                  for (category, classes)
+                  in sorted(self.fuelComplex.fuelParameters.items())
+                  for (sizeClass, component) in sorted(classes.items())])
+
+  def setWind(self, midflameWind) :
+    """
+    Sets the midflame wind speed (ft/min).
+    """
+    if midflameWind != self.midflameWind :
+      self.midflameWind = midflameWind
+      self.invalidate('wind')
+
+  def setSlope(self, slope) :
+    """
+    Sets the slope (radians).
+    """
+    if slope != self.slope :
+      self.slope = slope
+      self.invalidate('slope')
+
+  def setFuelMoisture(self, category, sizeClass, moisture) :
+    """
+    Sets the moisture of a size class of the fuel complex.
+    """
+    self.fuelComplex.setFuelMoisture(category, sizeClass, moisture)
+    self.invalidate('moisture')
+
+  def _checkInputs(self) :
+    """
+    Invalidates the static and moisture stages if their inputs differ from
+    those of the last evaluation.
+    """
+    staticInputs = self.staticInputs()
+    if staticInputs != self._staticInputs :
+      self.invalidate('static')
+    moistureInputs = self.moistureInputs()
+    if moistureInputs != self._moistureInputs :
+      self.invalidate('moisture')
+    self._staticInputs = staticInputs
+    self._moistureInputs = moistureInputs
+
+  def evaluate(self) :
+    """
+    Runs the dirty stages and returns the rate of spread.
+    """
+    self._checkInputs()
+    fuel = self.fuelComplex
+    fire = self.fireModel
+    recomputed = []
+    for stage in STAGES :
+      if not (stage in self.dirty) :
+        continue
+      if stage == 'static' :
+        fuel.computeStatic()
+        fire.evaluateStatic()
+      elif stage == 'moisture' :
+        fuel.aggregateMoisture()
+        if LIVE in fuel.fuelParameters :
+          fuel.calcLivingExtMoisture()
+        fire.calcMoistureDamping()
+      elif stage == 'intensity' :
+        fire.calcReactionIntensity()
+        fire.calcNoWindRos()
+      elif stage == 'wind' :
+        fire.calcWindMultiplier(self.midflameWind)
+      elif stage == 'slope' :
+        fire.calcSlopeMultiplier(self.slope)
+      else :
+        fire.calcRos()
+      recomputed.append(stage)
+    self.dirty.clear()
+    self.recomputed = tuple(recomputed)
+    return fire.ros
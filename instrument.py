@@ -0,0 +1,224 @@
+"""
+Opt-in instrumentation of the stages of the model.  A Profiler records
+the number of calls and the cumulative time spent in each stage method
+(e.g., WeightedRothermelModel.calcMoistureDamping) of the scalar and
+array classes, and optionally every call as a Chrome trace event.
+
+Methods are wrapped only while a profiler is enabled, by replacing them
+on the classes which define them, and the originals are put back when it
+is disabled.  There is therefore no overhead at all while no profiler is
+enabled.  Only one profiler may be enabled at a time.
+
+  profiler = Profiler(trace=True)
+  with profiler :
+    landscape.run()
+  print(profiler.report())
+  profiler.saveChromeTrace('landscape.json')   # chrome://tracing, Perfetto
+
+Times are wall clock seconds.  "total" includes the time spent in the
+other instrumented stages a stage calls, and "self" excludes it.  Calls
+are tracked per thread.
+"""
+
+import json
+import time
+import threading
+import importlib
+
+# the stage methods instrumented by default
+STAGES = ('calcWeightingParameters', 'aggregateIntoCategories',
+          'aggregateIntoComplex', 'aggregateMoisture',
+          'calcLivingExtMoisture', 'computeStatic', 'compute',
+          'calcPropFluxRatio', 'calcMineralDamping', 'calcMoistureDamping',
+          'calcPotReactionVelocity', 'calcReactionIntensity',
+          'calcNoWindRos', 'calcRos', 'setWind', 'setSlope',
+          'calcWindMultiplier', 'calcSlopeMultiplier', 'evaluateStatic',
+          'evaluateScenario', 'evaluate')
+
+# the modules whose classes are searched for the stage methods
+MODULES = ('model', 'rothweights', 'albini', 'arraymodel', 'arrayweights',
+           'compact')
+
+# the profiler currently enabled, if any
+_active = None
+_activeLock = threading.Lock()
+
+class Profiler :
+  """
+  Records call counts and times of the stage methods while enabled.
+
+  Attributes:
+  methods                         the names of the methods instrumented
+  modules                         the names of the modules searched
+  trace                           True to record Chrome trace events
+  maxEvents                       the most trace events kept
+  counts                          'Class.method' to number of calls
+  totals           s              'Class.method' to time, inclusive
+  selfTimes        s              'Class.method' to time, exclusive
+  events                          the trace events recorded
+  """
+  def __init__(self, methods=STAGES, modules=MODULES, trace=False,
+               maxEvents=1000000) :
+    self.methods = tuple(methods)
+    self.modules = tuple(modules)
+    self.trace = trace
+    self.maxEvents = maxEvents
+    self._originals = []
+    self._lock = threading.Lock()
+    self._local = threading.local()
+    self._epoch = time.perf_counter()
+    self.reset()
+
+  def reset(self) :
+    """
+    Discards everything recorded so far.
+    """
+    with self._lock :
+      self.counts = {}
+      self.totals = {}
+      self.selfTimes = {}
+      self.events = []
+
+  def _targets(self) :
+    """
+    Returns the (class, method name) of every instrumented method defined
+    by a class of the searched modules.
+    """
+    targets = []
+    for moduleName in self.modules :
+      module = importlib.import_module(moduleName)
+      for value in vars(module).values() :
+        if not isinstance(value, type) or value.__module__ != moduleName :
+          continue
+        for name in self.methods :
+          if callable(vars(value).get(name)) :
+            targets.append((value, name))
+    return targets
+
+  def _wrap(self, function, label) :
+    """
+    Returns a function recording the calls of function under label.
+    """
+    profiler = self
+    def wrapper(*args, **keywords) :
+      local = profiler._local
+      stack = getattr(local, 'stack', None)
+      if stack is None :
+        stack = local.stack = []
+      stack.append(0.)
+      began = time.perf_counter()
+      try :
+        return function(*args, **keywords)
+      finally :
+        elapsed = time.perf_counter() - began
+        children = stack.pop()
+        if stack :
+          stack[-1] += elapsed
+        profiler._record(label, began, elapsed, elapsed - children)
+    wrapper.__name__ = function.__name__
+    wrapper.__doc__ = function.__doc__
+    wrapper.__wrapped__ = function
+    return wrapper
+
+  def _record(self, label, began, elapsed, selfTime) :
+    with self._lock :
+      self.counts[label] = self.counts.get(label, 0) + 1
+      self.totals[label] = self.totals.get(label, 0.) + elapsed
+      self.selfTimes[label] = self.selfTimes.get(label, 0.) + selfTime
+      if self.trace and len(self.events) < self.maxEvents :
+        self.events.append((label, began, elapsed,
+                            threading.get_ident()))
+
+  def enable(self) :
+    """
+    Instruments the methods.  Raises RuntimeError if another profiler is
+    enabled.
+    """
+    global _active
+    with _activeLock :
+      if _active is self :
+        return
+      if _active is not None :
+        raise RuntimeError("Another profiler is enabled.")
+      for (cls, name) in self._targets() :
+        function = vars(cls)[name]
+        self._originals.append((cls, name, function))
+        setattr(cls, name,
+                self._wrap(function, cls.__name__ + '.' + name))
+      _active = self
+
+  def disable(self) :
+    """
+    Restores the original methods.
+    """
+    global _active
+    with _activeLock :
+      if _active is not self :
+        return
+      for (cls, name, function) in reversed(self._originals) :
+        setattr(cls, name, function)
+      self._originals = []
+      _active = None
+
+  def __enter__(self) :
+    self.enable()
+    return self
+
+  def __exit__(self, *exception) :
+    self.disable()
+    return False
+
+  def stats(self, byMethod=False) :
+    """
+    Returns a list of (name, calls, total, self) sorted by decreasing self
+    time.  If byMethod is True, the classes defining a method are combined
+    under the method name.
+    """
+    with self._lock :
+      combined = {}
+      for (label, count) in self.counts.items() :
+        name = label.split('.')[-1] if byMethod else label
+        (calls, total, selfTime) = combined.get(name, (0, 0., 0.))
+        combined[name] = (calls + count, total + self.totals[label],
+                          selfTime + self.selfTimes[label])
+    rows = [(name,) + values for (name, values) in combined.items()]
+    rows.sort(key=lambda row : -row[3])
+    return rows
+
+  def report(self, byMethod=False) :
+    """
+    Returns a flat text report of the stats.
+    """
+    rows = self.stats(byMethod)
+    selfSum = sum([row[3] for row in rows]) or 1.
+    lines = ['%-48s %10s %12s %12s %6s' %
+             ('stage', 'calls', 'total (s)', 'self (s)', 'self%')]
+    for (name, calls, total, selfTime) in rows :
+      lines.append('%-48s %10d %12.6f %12.6f %6.1f' %
+                   (name, calls, total, selfTime, 100. * selfTime / selfSum))
+    return '\n'.join(lines)
+
+  def chromeTrace(self) :
+    """
+    Returns the trace events in the Chrome trace event format (complete
+    events, times in microseconds).
+    """
+    with self._lock :
+      events = list(self.events)
+    traceEvents = []
+    for (label, began, elapsed, thread) in events :
+      traceEvents.append({ 'name' : label.split('.')[-1],
+                           'cat' : label.split('.')[0],
+                           'ph' : 'X',
+                           'ts' : (began - self._epoch) * 1e6,
+                           'dur' : elapsed * 1e6,
+                           'pid' : 1,
+                           'tid' : thread })
+    return { 'traceEvents' : traceEvents, 'displayTimeUnit' : 'ms' }
+
+  def saveChromeTrace(self, path) :
+    """
+    Writes the trace events to a Chrome trace JSON file.
+    """
+    with open(path, 'w') as stream :
+      json.dump(self.chromeTrace(), stream)
@@ -0,0 +1,140 @@
+"""
+Inversion of the fire spread model:  finds the value of one input (a fuel
+moisture, the midflame wind speed or the slope) which gives a target rate
+of spread, all the other inputs being held fixed.  Thousands of
+inversions are solved together over arrays with the batched FBP classes
+(see the "batchfbp" module).
+
+The rate of spread need not be monotone in the input (e.g., the live
+moisture of extinction depends on the dead fine fuel moisture), and it is
+flat at zero beyond the moisture of extinction.  Each inversion is
+therefore first bracketed on a grid spanning the input's bounds:  every
+interval of the grid over which the rate of spread crosses the target
+brackets a root, and the number of such intervals is reported.  The root
+in the chosen bracket is then refined by the Illinois variant of regula
+falsi, falling back on bisection wherever the secant step is undefined.
+The moisture damping of the model is not clamped, so past the moisture of
+extinction a live fuel moisture of extinction near zero can produce
+spurious rates of spread;  these show up as extra brackets, and the
+default root='lowest' picks the physical one when solving for a dead
+moisture.
+
+Inputs and units are those of Landscape:  oneHour, tenHour, hundredHour
+and live moisture (fractions), wind (mi/h) and slope (degrees).
+"""
+
+import numpy as np
+
+# the inputs which may be solved for, and their default bounds
+VARIABLES = ('oneHour', 'tenHour', 'hundredHour', 'live', 'wind', 'slope')
+BOUNDS = { 'oneHour'     : (0.01, 0.40),
+           'tenHour'     : (0.01, 0.40),
+           'hundredHour' : (0.01, 0.40),
+           'live'        : (0.30, 3.00),
+           'wind'        : (0., 40.),
+           'slope'       : (0., 60.) }
+
+def _take(value, index) :
+  """
+  Returns the elements index of value, or value itself if it is uniform.
+  """
+  if np.ndim(value) == 0 :
+    return value
+  return value[index]
+
+def rateOfSpread(fbp, inputs) :
+  """
+  Evaluates a batch FBP for a dictionary of inputs (arrays or uniform
+  values).  Moistures of size classes absent from the fuel model are
+  ignored.  Returns the rate of spread (ft/min).
+  """
+  (dead, live) = fbp.moistureInputs(inputs)
+  return fbp.evaluate(dead, live, inputs['wind'], inputs['slope'])[0]
+
+def invert(fbp, variable, targetRos, inputs, bounds=None, gridPoints=33,
+           root='lowest', tolerance=1e-6, maxIterations=60) :
+  """
+  Solves for the value of variable (one of VARIABLES) at which the batch
+  FBP gives the rate of spread targetRos (ft/min, an array or a value).
+  inputs is a dictionary of all the other VARIABLES to arrays (or uniform
+  values) broadcasting against targetRos.  bounds is the (low, high)
+  range searched, by default that in BOUNDS.  Where several brackets are
+  found, root selects the 'lowest' or 'highest' one.  The solution is
+  refined until the bracket is narrower than tolerance times the width of
+  the bounds.
+
+  Returns the tuple (value, roots):  value is the array of solutions (NaN
+  where the target is not reached within the bounds), and roots the
+  number of brackets found for each.
+  """
+  if not (variable in VARIABLES) :
+    raise ValueError("Unknown variable: " + str(variable))
+  if not (root in ('lowest', 'highest')) :
+    raise ValueError("Unknown root: " + str(root))
+  (low, high) = bounds or BOUNDS[variable]
+
+  shape = np.broadcast_shapes(np.shape(targetRos),
+                              *[np.shape(inputs[name]) for name in VARIABLES
+                                if name != variable])
+  target = np.broadcast_to(np.asarray(targetRos, dtype=float), shape).ravel()
+  others = dict([(name, np.broadcast_to(inputs[name], shape).ravel())
+                 for name in VARIABLES if name != variable])
+
+  # bracket every inversion on the grid, all in one evaluation
+  grid = np.linspace(low, high, gridPoints)
+  trial = dict(others)
+  trial[variable] = grid[:, np.newaxis]
+  residual = rateOfSpread(fbp, trial) - target
+  # a root on an interior grid point is counted once, in the interval
+  # which it begins
+  ends = residual[1:] != 0.
+  ends[-1] = True
+  crossing = (residual[:-1] * residual[1:] <= 0.) & ends & \
+             ((residual[:-1] != 0.) | (residual[1:] != 0.))
+  roots = crossing.sum(axis=0)
+  if root == 'lowest' :
+    interval = np.argmax(crossing, axis=0)
+  else :
+    interval = gridPoints - 2 - np.argmax(crossing[::-1], axis=0)
+  columns = np.arange(target.size)
+  a = grid[interval]
+  b = grid[interval + 1]
+  fa = residual[interval, columns]
+  fb = residual[interval + 1, columns]
+
+  value = np.full(target.size, np.nan)
+  active = np.nonzero(roots > 0)[0]
+  (a, b, fa, fb) = (a[active], b[active], fa[active], fb[active])
+
+  # make b the end nearer the root
+  swap = np.abs(fa) < np.abs(fb)
+  (a, b, fa, fb) = (np.where(swap, b, a), np.where(swap, a, b),
+                    np.where(swap, fb, fa), np.where(swap, fa, fb))
+  width = tolerance * (high - low)
+  for iteration in range(maxIterations) :
+    unsettled = (fb != 0.) & (np.abs(b - a) > width)
+    if not unsettled.any() :
+      break
+
+    # regula falsi, or bisection where the secant fails
+    with np.errstate(divide='ignore', invalid='ignore') :
+      x = b - fb * (b - a) / (fb - fa)
+    x = np.where(np.isfinite(x), x, 0.5 * (a + b))
+
+    cells = active[unsettled]
+    trial = dict([(name, _take(values, cells))
+                  for (name, values) in others.items()])
+    trial[variable] = x[unsettled]
+    fx = fb.copy()
+    fx[unsettled] = rateOfSpread(fbp, trial) - target[cells]
+
+    # the root is between x and b if their residuals differ in sign;
+    # otherwise it is between a and x, and a's residual is halved (the
+    # Illinois modification) so that a does not stay put for ever
+    opposite = unsettled & (fx * fb < 0.)
+    (a, fa) = (np.where(opposite, b, a),
+               np.where(opposite, fb, np.where(unsettled, 0.5 * fa, fa)))
+    (b, fb) = (np.where(unsettled, x, b), fx)
+
+  value[active] = b
+  return value.reshape(shape), roots.reshape(shape)
@@ -0,0 +1,337 @@
+"""
+Fire behavior over raster landscapes.  The inputs are a raster of NFFL
+fuel model codes (1-13), a slope raster and moisture and wind rasters,
+given as NumPy arrays, memory-mapped arrays, or the names of .npy or raw
+binary files.  The rasters are streamed in tiles of whole rows; within a
+tile the cells are grouped by fuel model code, so that each named model is
+evaluated once per tile over all its cells, using static fuel values
+computed once per process.  Rate of spread, reaction intensity and heat per
+unit area are written to (possibly memory-mapped) output rasters.
+
+The grouping is held by a FuelModelIndex:  the cells are sorted by code
+once, and each group is then a contiguous run of the sorted order.  A
+Landscape keeps the indices of the tiles it used most recently, up to
+indexBudget bytes (about 4 bytes per cell), so running a landscape which
+fits again (e.g., for another weather scenario) does not sort again, while
+streaming a larger one does not keep every index in memory.  A kept index
+is checked against the tile's codes before it is used again, which reads
+the codes but does not sort them, so the fuel model raster may be edited
+in place (e.g., for a fuel treatment) between runs;  invalidate() releases
+the indices kept.
+
+Units are those of RothermelFBP:  moistures are fractions, midflame wind
+speed is mi/h and slope is degrees.  Rate of spread is ft/min, reaction
+intensity BTU/ft^2/min and heat per unit area BTU/ft^2.  Cells whose code
+is not a named fuel model (e.g., 0 or 99 for non-burnable) get zero in
+every output.
+
+The fire behavior is computed in double precision unless computeDtype is
+np.float32, which halves the memory of a tile's working arrays but is only
+about 1.2 times faster;  see the "precision" module for the accuracy of
+single precision.
+"""
+
+from collections import OrderedDict
+import numpy as np
+from batchfbp import BatchRothermelFBP, BatchAlbiniFBP
+
+# the batch FBP class used for each weighting scheme
+SCHEMES = { 'rothermel' : BatchRothermelFBP,
+            'albini'    : BatchAlbiniFBP }
+
+# names of the input and output rasters
+INPUT_NAMES = ('fuelModels', 'slope', 'oneHour', 'tenHour', 'hundredHour',
+               'live', 'wind')
+OUTPUT_NAMES = ('rateOfSpread', 'reactionIntensity', 'heatPerUnitArea')
+
+# the default memory (bytes) a Landscape may use for its tile indices
+INDEX_BUDGET = 256 * 2**20
+
+def openRaster(source, shape=None, dtype=np.float32) :
+  """
+  Returns a raster for reading.  source may be an array (returned as is),
+  a number (a raster of uniform value), the name of a .npy file (memory
+  mapped read-only), or the name of a raw binary file, which requires
+  shape and dtype.
+  """
+  if not isinstance(source, str) :
+    return source
+  if source.endswith('.npy') :
+    return np.load(source, mmap_mode='r')
+  if shape is None :
+    raise ValueError("The shape of raw raster " + source + " is required.")
+  return np.memmap(source, dtype=dtype, mode='r', shape=tuple(shape))
+
+def createRaster(target, shape, dtype=np.float32) :
+  """
+  Returns a raster for writing.  target may be an array (returned as is),
+  None (a new in-memory array), the name of a .npy file or the name of a
+  raw binary file; files are created and memory mapped.
+  """
+  if target is None :
+    return np.zeros(shape, dtype=dtype)
+  if not isinstance(target, str) :
+    return target
+  if target.endswith('.npy') :
+    return np.lib.format.open_memmap(target, mode='w+', dtype=dtype,
+                                     shape=tuple(shape))
+  return np.memmap(target, dtype=dtype, mode='w+', shape=tuple(shape))
+
+def _window(raster, rows) :
+  """
+  Returns the given rows of raster as an in-memory array, or raster
+  itself if it is a uniform value.
+  """
+  if np.ndim(raster) == 0 :
+    return raster
+  return np.asarray(raster[rows])
+
+def _select(value, cells) :
+  """
+  Returns the selected cells of value, or value itself if it is uniform.
+  """
+  if np.ndim(value) == 0 :
+    return value
+  return value[cells]
+
+def _flat(value) :
+  """
+  Returns value as a flat array, or value itself if it is uniform.
+  """
+  if np.ndim(value) == 0 :
+    return value
+  return np.ravel(value)
+
+
+class FuelModelIndex :
+  """
+  The cells of a raster of fuel model codes, grouped by code.  Building
+  the index sorts the cells once;  it may then be used for any number of
+  evaluations of the same codes.
+
+  Attributes:
+  shape                           the shape of the raster of codes
+  order                           the flat cell indices, sorted by code
+                                  (int32 unless there are 2**31 cells)
+  codes                           the distinct codes, in increasing order
+  starts                          where each code's cells start in order
+  counts                          the number of cells of each code
+  nbytes                          the memory held by the index (bytes)
+  """
+  def __init__(self, codes) :
+    codes = np.asarray(codes)
+    self.shape = codes.shape
+    flat = codes.ravel()
+    self.order = np.argsort(flat, kind='stable')
+    if flat.size < 2**31 :
+      self.order = self.order.astype(np.int32)
+    (self.codes, self.starts, self.counts) = np.unique(flat[self.order],
+                                                       return_index=True,
+                                                       return_counts=True)
+    self.nbytes = self.order.nbytes + self.codes.nbytes + \
+                  self.starts.nbytes + self.counts.nbytes
+
+  def cells(self, position) :
+    """
+    Returns the flat indices of the cells of the code at the given
+    position of codes.
+    """
+    start = self.starts[position]
+    return self.order[start:start + self.counts[position]]
+
+  def matches(self, codes) :
+    """
+    Returns True if this is the index of codes, which is checked without
+    sorting them again.
+    """
+    codes = np.asarray(codes)
+    if codes.shape != self.shape :
+      return False
+    return np.array_equal(codes.ravel()[self.order],
+                          np.repeat(self.codes, self.counts))
+
+  def groups(self) :
+    """
+    Generates (code, flat cell indices) for each distinct code.
+    """
+    for (position, code) in enumerate(self.codes) :
+      yield code, self.cells(position)
+
+
+class Landscape :
+  """
+  A raster landscape whose fire behavior may be evaluated tile by tile.
+
+  Attributes:
+  fuelModels                      raster of NFFL fuel model codes
+  slope        degrees            raster of slope
+  oneHour, tenHour, hundredHour   rasters of dead fuel moisture (fractions)
+  live                            raster of live fuel moisture (fraction)
+  wind         mi/h               raster of midflame wind speed
+  shape                           (rows, columns) of the landscape
+  scheme                          'rothermel' or 'albini'
+  computeDtype                    the floating point type of the evaluation
+  indexBudget      bytes          the most memory kept for tile indices
+  """
+  # rasters read by evaluateTile and produced by evaluateCells
+  inputNames = INPUT_NAMES
+  outputNames = OUTPUT_NAMES
+
+  def __init__(self, fuelModels, slope, oneHour, tenHour, hundredHour, live,
+               wind, scheme='rothermel', shape=None, dtype=np.float32,
+               fuelModelDtype=np.int16, computeDtype=np.float64,
+               indexBudget=INDEX_BUDGET) :
+    """
+    Each raster may be anything accepted by openRaster.  shape, dtype and
+    fuelModelDtype describe any raw binary files.  computeDtype is the
+    precision in which the fire behavior is computed, and indexBudget the
+    memory kept for tile indices (0 to keep none).
+    """
+    self.fuelModels = openRaster(fuelModels, shape, fuelModelDtype)
+    self.shape = self.fuelModels.shape
+    self.slope = openRaster(slope, self.shape, dtype)
+    self.oneHour = openRaster(oneHour, self.shape, dtype)
+    self.tenHour = openRaster(tenHour, self.shape, dtype)
+    self.hundredHour = openRaster(hundredHour, self.shape, dtype)
+    self.live = openRaster(live, self.shape, dtype)
+    self.wind = openRaster(wind, self.shape, dtype)
+    self.scheme = scheme
+    self.computeDtype = np.dtype(computeDtype)
+    self.indexBudget = indexBudget
+    self._fbps = {}
+    self._indices = OrderedDict()
+    self._indexBytes = 0
+
+  def _fbp(self, code) :
+    """
+    Returns the batch FBP of the given fuel model code, or None if the code
+    is not a named fuel model.
+    """
+    if not (code in self._fbps) :
+      fbpClass = SCHEMES[self.scheme]
+      name = str(code)
+      if name in fbpClass.fuelModelNames :
+        self._fbps[code] = fbpClass(name, self.computeDtype)
+      else :
+        self._fbps[code] = None
+    return self._fbps[code]
+
+  def evaluateCells(self, codes, inputs, index=None) :
+    """
+    Evaluates arbitrary cells.  codes is an array of fuel model codes and
+    inputs a dictionary of the remaining INPUT_NAMES to arrays (or uniform
+    values) of the same shape.  index is the FuelModelIndex of codes, if
+    one has been built already.  Returns a dictionary of OUTPUT_NAMES to
+    arrays of the same shape as codes.
+    """
+    codes = np.asarray(codes)
+    if index is None :
+      index = FuelModelIndex(codes)
+    flatInputs = dict([(name, _flat(value))
+                       for (name, value) in inputs.items()])
+    outputs = dict([(name, np.zeros(codes.size, self.computeDtype))
+                    for name in self.outputNames])
+    for (code, cells) in index.groups() :
+      fbp = self._fbp(int(code))
+      if fbp is None :
+        continue
+      select = lambda name : _select(flatInputs[name], cells)
+
+      (dead, live) = fbp.moistureInputs(select)
+      fbp.evaluate(dead, live, select('wind'), select('slope'))
+      self.collect(fbp, select, outputs, cells)
+    for name in self.outputNames :
+      outputs[name] = outputs[name].reshape(codes.shape)
+    return outputs
+
+  def collect(self, fbp, select, outputs, cells) :
+    """
+    Stores the results of a batch FBP which has just evaluated the given
+    cells into outputs.  select(name) returns the selected cells of the
+    named input, and cells are flat indices into the outputs.  Subclasses
+    producing more outputs extend this method.
+    """
+    outputs['rateOfSpread'][cells] = fbp.rateOfSpread
+    outputs['reactionIntensity'][cells] = fbp.reactionIntensity
+    outputs['heatPerUnitArea'][cells] = fbp.heatPerUnitArea
+
+  def evaluateTile(self, rows) :
+    """
+    Evaluates the cells in the given slice of rows.  Returns a dictionary
+    of output names to in-memory arrays.
+    """
+    codes = _window(self.fuelModels, rows)
+    inputs = dict([(name, _window(getattr(self, name), rows))
+                   for name in self.inputNames[1:]])
+    return self.evaluateCells(codes, inputs, self.index(rows, codes))
+
+  def index(self, rows, codes=None) :
+    """
+    Returns the FuelModelIndex of the given slice of rows, building it
+    unless one matching the rows' codes is among those kept.  The indices
+    used most recently are kept, up to indexBudget bytes.  codes are the
+    fuel model codes of those rows, if they have been read already.
+    """
+    key = (rows.start, rows.stop)
+    if codes is None :
+      codes = _window(self.fuelModels, rows)
+    index = self._indices.pop(key, None)
+    if index is not None :
+      self._indexBytes -= index.nbytes
+      if not index.matches(codes) :
+        index = None
+    if index is None :
+      index = FuelModelIndex(codes)
+    if index.nbytes <= self.indexBudget :
+      self._indices[key] = index
+      self._indexBytes += index.nbytes
+      while self._indexBytes > self.indexBudget :
+        (oldKey, old) = self._indices.popitem(last=False)
+        self._indexBytes -= old.nbytes
+    return index
+
+  def invalidate(self) :
+    """
+    Discards the tile indices kept, releasing their memory.  They need not
+    be discarded when the fuel models change, as each is checked against
+    the codes before it is used, but stale indices are rebuilt only when
+    their tile is evaluated again.
+    """
+    self._indices.clear()
+    self._indexBytes = 0
+
+  def tiles(self, tileRows=256) :
+    """
+    Returns the list of row slices into which the landscape is divided.
+    """
+    return [slice(start, min(start + tileRows, self.shape[0]))
+            for start in range(0, self.shape[0], tileRows)]
+
+  def run(self, rateOfSpread=None, reactionIntensity=None,
+          heatPerUnitArea=None, tileRows=256, dtype=np.float32) :
+    """
+    Evaluates the whole landscape, one tile of tileRows rows at a time, and
+    writes the results.  Each output may be anything accepted by
+    createRaster.  Returns the dictionary of OUTPUT_NAMES to output
+    rasters.
+    """
+    targets = { 'rateOfSpread' : rateOfSpread,
+                'reactionIntensity' : reactionIntensity,
+                'heatPerUnitArea' : heatPerUnitArea }
+    outputs = dict([(name, createRaster(targets.get(name), self.shape, dtype))
+                    for name in self.outputNames])
+    for rows in self.tiles(tileRows) :
+      self.writeTile(outputs, rows, self.evaluateTile(rows))
+
+    for raster in outputs.values() :
+      if isinstance(raster, np.memmap) :
+        raster.flush()
+    return outputs
+
+  def writeTile(self, outputs, rows, results) :
+    """
+    Writes the results of evaluateTile for rows into the output rasters,
+    converting them to the rasters' precision.
+    """
+    for name in self.outputNames :
+      outputs[name][rows] = results[name]
@@ -291,6 +291,42 @@ class RothermelModel :
       (self.fuel.bulkDensity * self.fuel.heatingEfficiency * \
        self.fuel.heatOfIgnition )
 
+  def calcWindCoefficients(self) :
+    """
+    Calculates the fuel dependent coefficients of the wind multiplier via
+    Rothermel's eqns (48-50).  These do not depend on the wind speed.
+    Requires:
+      self.fuel.sigma
+      self.fuel.packingRatio
+      self.fuel.optimalPacking
+    Produces:
+      self.windC
+      self.windB
+      self.windE
+    """
+    self.windC = 7.47 * math.exp(-0.133 * math.pow(self.fuel.sigma, 0.55))
+    self.windB = 0.02526 * math.pow(self.fuel.sigma, 0.54)
+    self.windE = 0.715 * math.exp(-3.59e-4 * self.fuel.sigma)
+
+  def calcWindMultiplier(self, midflameWind) : 
+    """
+    Sets the "midflameWind" attribute of this model in ft/min and 
+    calculates the windMultiplier via Rothermel's eqn 47, using the 
+    coefficients from calcWindCoefficients.
+    Requires: 
+      self.windC
+      self.windB
+      self.windE
+      self.fuel.packingRatio
+      self.fuel.optimalPacking
+    Produces:
+      self.midflameWind
+      self.windMultiplier
+    """
+    self.midflameWind = midflameWind
+    self.windMultiplier = self.windC * math.pow(midflameWind,self.windB) *\
+      math.pow((self.fuel.packingRatio / self.fuel.optimalPacking),-self.windE)
+
   def setWind(self, midflameWind) : 
     """
     Sets the "midflameWind" attribute of this model in ft/min.  Also calculates
@@ -303,13 +339,35 @@ class RothermelModel :
       self.midflameWind
       self.windMultiplier
     """
-    
-    self.midflameWind = midflameWind
-    C = 7.47 * math.exp(-0.133 * math.pow(self.fuel.sigma, 0.55))
-    B = 0.02526 * math.pow(self.fuel.sigma, 0.54)
-    E = 0.715 * math.exp(-3.59e-4 * self.fuel.sigma)
-    self.windMultiplier = C * math.pow(midflameWind,B) *\
-      math.pow((self.fuel.packingRatio / self.fuel.optimalPacking),-E)
+    self.calcWindCoefficients()
+    self.calcWindMultiplier(midflameWind)
+
+  def calcSlopeFactor(self) :
+    """
+    Calculates the fuel dependent part of Rothermel's eqn 51, which does 
+    not depend on the slope.
+    Requires:
+      self.fuel.packingRatio
+    Produces:
+      self.slopeFactor
+    """
+    self.slopeFactor = 5.275 * math.pow(self.fuel.packingRatio, -0.3)
+
+  def calcSlopeMultiplier(self, slope) :
+    """
+    Records the slope (in radians) in the "slopeRad" attribute and 
+    calculates the "slopeMultiplier" attribute via Rothermel's eqn 51, 
+    using the factor from calcSlopeFactor.
+    Requires:
+      self.slopeFactor
+    Produces:
+      self.slopeRad
+      self.slopeMultiplier
+    """
+    self.slopeRad = slope
+    tanSlope2 = math.tan(slope)
+    tanSlope2 = tanSlope2*tanSlope2
+    self.slopeMultiplier = self.slopeFactor * tanSlope2
 
   def setSlope(self, slope) :
     """
@@ -322,11 +380,8 @@ class RothermelModel :
       self.slopeRad
       self.slopeMultiplier
     """
-    self.slopeRad = slope
-    tanSlope2 = math.tan(slope)
-    tanSlope2 = tanSlope2*tanSlope2
-    self.slopeMultiplier = 5.275 * math.pow(self.fuel.packingRatio, -0.3) *\
-      tanSlope2
+    self.calcSlopeFactor()
+    self.calcSlopeMultiplier(slope)
 
   def calcRos(self) : 
     """
@@ -343,21 +398,37 @@ class RothermelModel :
         (1. + self.windMultiplier + self.slopeMultiplier)
     return self.ros
 
-  def evaluate(self) : 
+  def evaluateStatic(self) :
     """
-    Assuming that everything has been "set", this method runs through the
-    entire rate of spread calculation, calling the component methods
-    in the correct order.  It then returns the rate of spread.
+    Runs through those parts of the calculation which depend only on the
+    fuel bed, and not on fuel moisture, wind or slope.  The results remain
+    valid until the fuel itself is changed.
     """
     self.fuel.calcNetFuelLoading()
     self.calcPropFluxRatio()
     self.calcMineralDamping()
-    self.calcMoistureDamping()
     self.calcPotReactionVelocity()
+    self.calcWindCoefficients()
+    self.calcSlopeFactor()
+
+  def evaluateScenario(self) :
+    """
+    Assuming that evaluateStatic has been run for the current fuel and 
+    that the wind and slope multipliers are up to date, runs through the 
+    moisture dependent remainder of the calculation.  It then returns the 
+    rate of spread.
+    """
+    self.calcMoistureDamping()
     self.calcReactionIntensity()
     self.calcNoWindRos()
     self.calcRos()
     return self.ros
 
-
-
+  def evaluate(self) : 
+    """
+    Assuming that everything has been "set", this method runs through the
+    entire rate of spread calculation, calling the component methods
+    in the correct order.  It then returns the rate of spread.
+    """
+    self.evaluateStatic()
+    return self.evaluateScenario()
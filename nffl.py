@@ -1,195 +1,214 @@
 """
-Contains factories which produce FuelComplex objects which represent the 
-NFFL fuel models.
+The NFFL fuel models, held as one immutable table, and factories which
+produce fuel complexes representing them.
+
+The table is built once, at import, as read-only arrays indexed by model
+(in the order of MODEL_NAMES), category and size class (in the order of
+arrayweights.CATEGORIES and SIZE_CLASSES):
+  SIGMA          1/ft      surface area to volume ratio (1 where absent)
+  LOADING        lb/ft^2   ovendry loading (0 where absent)
+  PRESENT                  True where the size class is in the model
+  EXT_MOISTURE   fraction  moisture of extinction, per category (the live
+                           value is calculated, and 0 here)
+  DEPTH          ft        fuel bed depth, per model
+
+fuelComplex() builds a dictionary based complex of any component and
+complex classes from the table, and arrayFuelComplex() an array complex of
+one model or of an array of models.  Neither reads nor writes any module
+state, so both may be called from several threads at once.
+
+The nfflN() factories are kept for compatibility.  Called with no
+arguments they produce the classes named by the module variables
+FuelComponent and FuelComplex;  callers choosing their own classes should
+pass them instead of changing those variables.
 """
 
-from rothweights import RothermelFuelComplex, \
+import threading
+import numpy as np
+from rothweights import RothermelFuelComplex, StaticFuel, \
                         DEAD, LIVE, ONEHR, TENHR, HUNDREDHR
 from model import RothermelFuel
+from arrayweights import ArrayFuelComplex, CATEGORIES, SIZE_CLASSES
 
 #
-# To change which types of objects this factory produces, change the 
-# values of FuelComponent and FuelComplex below.  (For instance, if you wanted
-# Albini fuels instead of Rothermel fuels....
+# The classes produced by the nfflN() factories when called without
+# arguments.
 #
 FuelComponent = RothermelFuel
 FuelComplex   = RothermelFuelComplex
 
-def nffl1() : 
-  """
-  Produces and returns a FuelComplex object representative of NFFL model 1
-  """
-  fuel = FuelComplex()
-  fuel.setFuelParams(DEAD, ONEHR, FuelComponent(3500., 0.034))
-  fuel.setExtMoisture(DEAD, 0.12)
-  fuel.setDepth(1.)
-  return fuel
-  
-def nffl2() : 
-  """
-  Produces and returns a FuelComplex object representative of NFFL model 2
-  """
-  fuel = FuelComplex()
-  fuel.setFuelParams(DEAD, ONEHR,     FuelComponent(3000., 0.092))
-  fuel.setFuelParams(DEAD, TENHR,     FuelComponent(109.,  0.046))
-  fuel.setFuelParams(DEAD, HUNDREDHR, FuelComponent(30.,   0.023))
-  fuel.setFuelParams(LIVE, ONEHR,     FuelComponent(1500., 0.023))
-
-  fuel.setExtMoisture(DEAD, 0.15)
-  fuel.setDepth(1.)
-  return fuel
-  
-  
-def nffl3() : 
-  """
-  Produces and returns a FuelComplex object representative of NFFL model 3
-  """
-  fuel = FuelComplex()
-  fuel.setFuelParams(DEAD, ONEHR,     FuelComponent(1500., 0.138))
-
-  fuel.setExtMoisture(DEAD, 0.25)
-  fuel.setDepth(2.5)
-  return fuel
-
-def nffl4() : 
-  """
-  Produces and returns a FuelComplex object representative of NFFL model 4
-  """
-  fuel = FuelComplex()
-  fuel.setFuelParams(DEAD, ONEHR,     FuelComponent(2000., 0.230))
-  fuel.setFuelParams(DEAD, TENHR,     FuelComponent(109.,  0.184))
-  fuel.setFuelParams(DEAD, HUNDREDHR, FuelComponent(30.,   0.092))
-  fuel.setFuelParams(LIVE, ONEHR,     FuelComponent(1500., 0.230))
-
-  fuel.setExtMoisture(DEAD, 0.20)
-  fuel.setDepth(6.)
-  return fuel
-  
-
-def nffl5() : 
-  """
-  Produces and returns a FuelComplex object representative of NFFL model 5
-  """
-  fuel = FuelComplex()
-  fuel.setFuelParams(DEAD, ONEHR,     FuelComponent(2000., 0.046))
-  fuel.setFuelParams(DEAD, TENHR,     FuelComponent(109.,  0.023))
-  fuel.setFuelParams(LIVE, ONEHR,     FuelComponent(1500., 0.092))
-
-  fuel.setExtMoisture(DEAD, 0.20)
-  fuel.setDepth(2.)
-  return fuel
-  
-
-def nffl6() : 
-  """
-  Produces and returns a FuelComplex object representative of NFFL model 6
-  """
-  fuel = FuelComplex()
-  fuel.setFuelParams(DEAD, ONEHR,     FuelComponent(1750., 0.069))
-  fuel.setFuelParams(DEAD, TENHR,     FuelComponent(109.,  0.115))
-  fuel.setFuelParams(DEAD, HUNDREDHR, FuelComponent(30.,   0.092))
-
-  fuel.setExtMoisture(DEAD, 0.25)
-  fuel.setDepth(2.5)
-  return fuel
-  
-
-def nffl7() : 
-  """
-  Produces and returns a FuelComplex object representative of NFFL model 7
-  """
-  fuel = FuelComplex()
-  fuel.setFuelParams(DEAD, ONEHR,     FuelComponent(1750., 0.052))
-  fuel.setFuelParams(DEAD, TENHR,     FuelComponent(109.,  0.086))
-  fuel.setFuelParams(DEAD, HUNDREDHR, FuelComponent(30.,   0.069))
-  fuel.setFuelParams(LIVE, ONEHR,     FuelComponent(1550., 0.017))
-
-  fuel.setExtMoisture(DEAD, 0.40)
-  fuel.setDepth(2.5)
-  return fuel
-  
-
-def nffl8() : 
-  """
-  Produces and returns a FuelComplex object representative of NFFL model 8
-  """
-  fuel = FuelComplex()
-  fuel.setFuelParams(DEAD, ONEHR,     FuelComponent(2000., 0.069))
-  fuel.setFuelParams(DEAD, TENHR,     FuelComponent(109.,  0.046))
-  fuel.setFuelParams(DEAD, HUNDREDHR, FuelComponent(30.,   0.115))
-
-  fuel.setExtMoisture(DEAD, 0.30)
-  fuel.setDepth(0.2)
-  return fuel
-  
-
-def nffl9() : 
-  """
-  Produces and returns a FuelComplex object representative of NFFL model 9
-  """
-  fuel = FuelComplex()
-  fuel.setFuelParams(DEAD, ONEHR,     FuelComponent(2500., 0.134))
-  fuel.setFuelParams(DEAD, TENHR,     FuelComponent(109.,  0.019))
-  fuel.setFuelParams(DEAD, HUNDREDHR, FuelComponent(30.,   0.007))
-
-  fuel.setExtMoisture(DEAD, 0.25)
-  fuel.setDepth(0.2)
-  return fuel
-  
-
-def nffl10() : 
-  """
-  Produces and returns a FuelComplex object representative of NFFL model 10
-  """
-  fuel = FuelComplex()
-  fuel.setFuelParams(DEAD, ONEHR,     FuelComponent(2000., 0.138))
-  fuel.setFuelParams(DEAD, TENHR,     FuelComponent(109.,  0.092))
-  fuel.setFuelParams(DEAD, HUNDREDHR, FuelComponent(30.,   0.230))
-  fuel.setFuelParams(LIVE, ONEHR,     FuelComponent(1500., 0.092))
-
-  fuel.setExtMoisture(DEAD, 0.25)
-  fuel.setDepth(1.)
-  return fuel
-  
-
-def nffl11() : 
-  """
-  Produces and returns a FuelComplex object representative of NFFL model 11
-  """
-  fuel = FuelComplex()
-  fuel.setFuelParams(DEAD, ONEHR,     FuelComponent(1500., 0.069))
-  fuel.setFuelParams(DEAD, TENHR,     FuelComponent(109.,  0.207))
-  fuel.setFuelParams(DEAD, HUNDREDHR, FuelComponent(30.,   0.253))
-
-  fuel.setExtMoisture(DEAD, 0.15)
-  fuel.setDepth(1.)
-  return fuel
-  
-
-def nffl12() : 
-  """
-  Produces and returns a FuelComplex object representative of NFFL model 12
-  """
-  fuel = FuelComplex()
-  fuel.setFuelParams(DEAD, ONEHR,     FuelComponent(1500., 0.184))
-  fuel.setFuelParams(DEAD, TENHR,     FuelComponent(109.,  0.644))
-  fuel.setFuelParams(DEAD, HUNDREDHR, FuelComponent(30.,   0.759))
-
-  fuel.setExtMoisture(DEAD, 0.20)
-  fuel.setDepth(2.3)
+#
+# The catalog:  depth (ft), dead moisture of extinction, and the
+# (category, size class, sigma, loading) of each size class present.
+#
+_CATALOG = (
+  ('1',  1.0, 0.12, ((DEAD, ONEHR,     3500., 0.034),)),
+  ('2',  1.0, 0.15, ((DEAD, ONEHR,     3000., 0.092),
+                     (DEAD, TENHR,     109.,  0.046),
+                     (DEAD, HUNDREDHR, 30.,   0.023),
+                     (LIVE, ONEHR,     1500., 0.023))),
+  ('3',  2.5, 0.25, ((DEAD, ONEHR,     1500., 0.138),)),
+  ('4',  6.0, 0.20, ((DEAD, ONEHR,     2000., 0.230),
+                     (DEAD, TENHR,     109.,  0.184),
+                     (DEAD, HUNDREDHR, 30.,   0.092),
+                     (LIVE, ONEHR,     1500., 0.230))),
+  ('5',  2.0, 0.20, ((DEAD, ONEHR,     2000., 0.046),
+                     (DEAD, TENHR,     109.,  0.023),
+                     (LIVE, ONEHR,     1500., 0.092))),
+  ('6',  2.5, 0.25, ((DEAD, ONEHR,     1750., 0.069),
+                     (DEAD, TENHR,     109.,  0.115),
+                     (DEAD, HUNDREDHR, 30.,   0.092))),
+  ('7',  2.5, 0.40, ((DEAD, ONEHR,     1750., 0.052),
+                     (DEAD, TENHR,     109.,  0.086),
+                     (DEAD, HUNDREDHR, 30.,   0.069),
+                     (LIVE, ONEHR,     1550., 0.017))),
+  ('8',  0.2, 0.30, ((DEAD, ONEHR,     2000., 0.069),
+                     (DEAD, TENHR,     109.,  0.046),
+                     (DEAD, HUNDREDHR, 30.,   0.115))),
+  ('9',  0.2, 0.25, ((DEAD, ONEHR,     2500., 0.134),
+                     (DEAD, TENHR,     109.,  0.019),
+                     (DEAD, HUNDREDHR, 30.,   0.007))),
+  ('10', 1.0, 0.25, ((DEAD, ONEHR,     2000., 0.138),
+                     (DEAD, TENHR,     109.,  0.092),
+                     (DEAD, HUNDREDHR, 30.,   0.230),
+                     (LIVE, ONEHR,     1500., 0.092))),
+  ('11', 1.0, 0.15, ((DEAD, ONEHR,     1500., 0.069),
+                     (DEAD, TENHR,     109.,  0.207),
+                     (DEAD, HUNDREDHR, 30.,   0.253))),
+  ('12', 2.3, 0.20, ((DEAD, ONEHR,     1500., 0.184),
+                     (DEAD, TENHR,     109.,  0.644),
+                     (DEAD, HUNDREDHR, 30.,   0.759))),
+  ('13', 3.0, 0.25, ((DEAD, ONEHR,     1500., 0.322),
+                     (DEAD, TENHR,     109.,  1.058),
+                     (DEAD, HUNDREDHR, 30.,   1.288))),
+  )
+
+def _buildTable() :
+  """
+  Returns the catalog as the tuple (names, sigma, loading, present,
+  extMoisture, depth) of read-only arrays.
+  """
+  names = tuple([entry[0] for entry in _CATALOG])
+  layout = (len(names), len(CATEGORIES), len(SIZE_CLASSES))
+  sigma = np.ones(layout)
+  loading = np.zeros(layout)
+  present = np.zeros(layout, dtype=bool)
+  extMoisture = np.zeros(layout[:2])
+  depth = np.zeros(layout[:1])
+  for (i, (name, modelDepth, deadExtinction, classes)) in enumerate(_CATALOG) :
+    for (category, sizeClass, classSigma, classLoading) in classes :
+      index = (i, CATEGORIES.index(category), SIZE_CLASSES.index(sizeClass))
+      sigma[index] = classSigma
+      loading[index] = classLoading
+      present[index] = True
+    extMoisture[i, CATEGORIES.index(DEAD)] = deadExtinction
+    depth[i] = modelDepth
+  for array in (sigma, loading, present, extMoisture, depth) :
+    array.setflags(write=False)
+  return (names, sigma, loading, present, extMoisture, depth)
+
+(MODEL_NAMES, SIGMA, LOADING, PRESENT, EXT_MOISTURE, DEPTH) = _buildTable()
+
+def modelIndex(modelName) :
+  """
+  Returns the row of the named model in the catalog arrays.
+  """
+  try :
+    return MODEL_NAMES.index(str(modelName))
+  except ValueError :
+    raise ValueError("Unknown fuel model: " + str(modelName))
+
+def fuelComplex(modelName, componentClass=RothermelFuel,
+                complexClass=RothermelFuelComplex) :
+  """
+  Produces and returns a new fuel complex of complexClass, made of fuels of
+  componentClass, representing the named NFFL model.
+  """
+  i = modelIndex(modelName)
+  fuel = complexClass()
+  for (c, category) in enumerate(CATEGORIES) :
+    for (s, sizeClass) in enumerate(SIZE_CLASSES) :
+      if PRESENT[i, c, s] :
+        fuel.setFuelParams(category, sizeClass,
+                           componentClass(float(SIGMA[i, c, s]),
+                                          float(LOADING[i, c, s])))
+  fuel.setExtMoisture(DEAD, float(EXT_MOISTURE[i, CATEGORIES.index(DEAD)]))
+  fuel.setDepth(float(DEPTH[i]))
   return fuel
-  
 
-def nffl13() : 
+def arrayFuelComplex(modelNames, complexClass=ArrayFuelComplex) :
   """
-  Produces and returns a FuelComplex object representative of NFFL model 13
+  Produces and returns a new array complex of complexClass (e.g.,
+  ArrayFuelComplex or ArrayAlbiniFuelComplex) representing one named NFFL
+  model (with no leading axes) or an array of them (with the array's
+  shape as leading axes).  The complex has not been computed.
   """
-  fuel = FuelComplex()
-  fuel.setFuelParams(DEAD, ONEHR,     FuelComponent(1500., 0.322))
-  fuel.setFuelParams(DEAD, TENHR,     FuelComponent(109.,  1.058))
-  fuel.setFuelParams(DEAD, HUNDREDHR, FuelComponent(30.,   1.288))
+  names = np.asarray(modelNames)
+  index = np.vectorize(modelIndex, otypes=[int])(names) if names.ndim \
+          else modelIndex(names.item())
+  result = complexClass(np.shape(index))
+  result.present = PRESENT[index].copy()
+  result.classLoading = LOADING[index].copy()
+  result.classSigma = SIGMA[index].copy()
+  result.extMoisture = EXT_MOISTURE[index].copy()
+  result.depth = DEPTH[index].copy()
+  return result
 
-  fuel.setExtMoisture(DEAD, 0.25)
-  fuel.setDepth(3.0)
-  return fuel
-  
+#
+# Static fuel records, computed at most once per process for each
+# combination of model name, component class, complex class and
+# fire model class.
+#
+_staticFuels = {}
+_staticFuelsLock = threading.Lock()
+
+def staticFuel(modelName, fuelComplex, fireModelClass) :
+  """
+  Returns the StaticFuel record of the named NFFL model.  fuelComplex must
+  be a freshly produced instance of that model; the record is captured
+  from it the first time a given combination of classes is requested, and
+  the cached record is returned thereafter.
+  """
+  componentClass = fuelComplex.fuelParameters[DEAD][ONEHR].__class__
+  key = (modelName, componentClass, fuelComplex.__class__, fireModelClass)
+  record = _staticFuels.get(key)
+  if record is None :
+    record = StaticFuel(fuelComplex, fireModelClass(fuelComplex))
+    with _staticFuelsLock :
+      record = _staticFuels.setdefault(key, record)
+  return record
+
+def clearStaticFuels() :
+  """
+  Discards the cached StaticFuel records, so that they are captured anew.
+  """
+  with _staticFuelsLock :
+    _staticFuels.clear()
+
+def _factory(modelName) :
+  """
+  Returns the nfflN() factory of the named model.
+  """
+  def factory(componentClass=None, complexClass=None) :
+    return fuelComplex(modelName, componentClass or FuelComponent,
+                       complexClass or FuelComplex)
+  factory.__name__ = 'nffl' + modelName
+  factory.__doc__ = """
+  Produces and returns a FuelComplex object representative of NFFL model %s.
+  componentClass and complexClass default to FuelComponent and FuelComplex.
+  """ % modelName
+  return factory
+
+nffl1  = _factory('1')
+nffl2  = _factory('2')
+nffl3  = _factory('3')
+nffl4  = _factory('4')
+nffl5  = _factory('5')
+nffl6  = _factory('6')
+nffl7  = _factory('7')
+nffl8  = _factory('8')
+nffl9  = _factory('9')
+nffl10 = _factory('10')
+nffl11 = _factory('11')
+nffl12 = _factory('12')
+nffl13 = _factory('13')
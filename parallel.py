@@ -0,0 +1,188 @@
+"""
+Parallel evaluation of raster landscapes (see the "landscape" module) over
+a pool of worker processes.  The landscape is sharded into chunks of whole
+rows.  In-memory input rasters are copied once into shared memory, and
+memory-mapped rasters are reopened by each worker from their files, so no
+per-cell objects are ever pickled.  Each worker writes its rows directly
+into shared (or memory-mapped) outputs, so the results are reassembled in
+order without passing through the parent process.  Outputs written to
+files need no further copying;  in-memory outputs are copied once out of
+shared memory when the run is done, since the shared blocks do not
+outlive it.
+
+A list of scenarios is just a one dimensional landscape;  see
+evaluateScenarios.
+"""
+
+import os
+import time
+import numpy as np
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor
+from landscape import Landscape, INPUT_NAMES, OUTPUT_NAMES, createRaster
+
+def describeRaster(raster, owned) :
+  """
+  Returns a picklable description of raster by which a worker can attach
+  to it.  Uniform values are described by themselves, memory-mapped files
+  by their file name and in-memory arrays are copied into a new block of
+  shared memory, which is appended to owned.
+  """
+  if np.ndim(raster) == 0 :
+    return ('value', raster)
+  if isinstance(raster, np.memmap) and raster.filename is not None :
+    return ('file', raster.filename, raster.offset, raster.shape,
+            raster.dtype.str)
+  raster = np.asarray(raster)
+  block = shared_memory.SharedMemory(create=True, size=max(raster.nbytes, 1))
+  owned.append(block)
+  np.ndarray(raster.shape, raster.dtype, buffer=block.buf)[...] = raster
+  return ('shared', block.name, raster.shape, raster.dtype.str)
+
+def attachRaster(description, mode='r') :
+  """
+  Attaches to a raster described by describeRaster.  Returns (raster,
+  block), where block is the shared memory to be closed afterward, if any.
+  """
+  kind = description[0]
+  if kind == 'value' :
+    return description[1], None
+  if kind == 'file' :
+    (filename, offset, shape, dtype) = description[1:]
+    return np.memmap(filename, dtype=dtype, mode=mode, offset=offset,
+                     shape=shape), None
+  (name, shape, dtype) = description[1:]
+  block = shared_memory.SharedMemory(name=name)
+  return np.ndarray(shape, dtype, buffer=block.buf), block
+
+def _evaluateChunk(inputs, outputs, scheme, computeDtype, start, stop) :
+  """
+  Worker process entry point.  Evaluates rows start:stop of the landscape
+  described by inputs, in the precision computeDtype, and writes them
+  into the outputs.  Returns (process id, number of cells, seconds).
+  """
+  began = time.time()
+  blocks = []
+  rasters = {}
+  for name in INPUT_NAMES :
+    (rasters[name], block) = attachRaster(inputs[name])
+    blocks.append(block)
+  targets = {}
+  for name in OUTPUT_NAMES :
+    (targets[name], block) = attachRaster(outputs[name], 'r+')
+    blocks.append(block)
+
+  landscape = Landscape(scheme=scheme, computeDtype=computeDtype, **rasters)
+  rows = slice(start, stop)
+  results = landscape.evaluateTile(rows)
+  for name in OUTPUT_NAMES :
+    targets[name][rows] = results[name]
+    if isinstance(targets[name], np.memmap) :
+      targets[name].flush()
+
+  cells = results[OUTPUT_NAMES[0]].size
+  del rasters, targets, landscape
+  for block in blocks :
+    if block is not None :
+      block.close()
+  return os.getpid(), cells, time.time() - began
+
+
+class ParallelLandscape :
+  """
+  Evaluates a Landscape over a pool of worker processes, with its scheme
+  and computeDtype.
+
+  Attributes:
+  landscape                       the Landscape to evaluate
+  workers                         number of worker processes
+  chunkRows                       number of rows in each unit of work
+  workerStats                     after run, a dictionary of worker process
+                                  id to a dictionary of 'chunks', 'cells',
+                                  'seconds' and 'cellsPerSecond'
+  elapsed       s                 after run, the wall clock time taken
+  """
+
+  def __init__(self, landscape, workers=None, chunkRows=256) :
+    self.landscape = landscape
+    self.workers = workers or os.cpu_count() or 1
+    self.chunkRows = chunkRows
+    self.workerStats = {}
+    self.elapsed = None
+
+  def run(self, rateOfSpread=None, reactionIntensity=None,
+          heatPerUnitArea=None, dtype=np.float32) :
+    """
+    Evaluates the whole landscape.  Each output may be anything accepted
+    by landscape.createRaster.  Returns the dictionary of OUTPUT_NAMES to
+    output rasters; outputs which were not given are returned as new
+    in-memory arrays.
+    """
+    began = time.time()
+    shape = self.landscape.shape
+    targets = { 'rateOfSpread' : rateOfSpread,
+                'reactionIntensity' : reactionIntensity,
+                'heatPerUnitArea' : heatPerUnitArea }
+    owned = []
+    try :
+      inputs = dict([(name, describeRaster(getattr(self.landscape, name),
+                                           owned))
+                     for name in INPUT_NAMES])
+      results = {}
+      outputs = {}
+      for name in OUTPUT_NAMES :
+        if isinstance(targets[name], str) :
+          results[name] = createRaster(targets[name], shape, dtype)
+          outputs[name] = describeRaster(results[name], owned)
+        else :
+          outputs[name] = describeRaster(np.zeros(shape, dtype=dtype), owned)
+
+      self.workerStats = {}
+      with ProcessPoolExecutor(max_workers=self.workers) as pool :
+        futures = [pool.submit(_evaluateChunk, inputs, outputs,
+                               self.landscape.scheme,
+                               self.landscape.computeDtype, rows.start,
+                               rows.stop)
+                   for rows in self.landscape.tiles(self.chunkRows)]
+        for future in futures :
+          (pid, cells, seconds) = future.result()
+          stats = self.workerStats.setdefault(pid,
+                    { 'chunks' : 0, 'cells' : 0, 'seconds' : 0. })
+          stats['chunks'] += 1
+          stats['cells'] += cells
+          stats['seconds'] += seconds
+
+      for stats in self.workerStats.values() :
+        stats['cellsPerSecond'] = stats['cells'] / max(stats['seconds'],
+                                                       1e-9)
+
+      # copy shared outputs into the caller's rasters
+      for name in OUTPUT_NAMES :
+        if name in results :
+          continue
+        (shared, block) = attachRaster(outputs[name])
+        results[name] = createRaster(targets[name], shape, dtype)
+        results[name][...] = shared
+        del shared
+        block.close()
+    finally :
+      for block in owned :
+        block.close()
+        block.unlink()
+
+    self.elapsed = time.time() - began
+    return results
+
+
+def evaluateScenarios(fuelModels, slope, oneHour, tenHour, hundredHour,
+                      live, wind, scheme='rothermel', workers=None,
+                      chunkSize=65536, computeDtype=np.float64) :
+  """
+  Evaluates a flat list of scenarios (one dimensional arrays, or uniform
+  values) over a pool of worker processes.  Returns the dictionary of
+  OUTPUT_NAMES to arrays, in the order of the scenarios.
+  """
+  landscape = Landscape(np.asarray(fuelModels), slope, oneHour, tenHour,
+                        hundredHour, live, wind, scheme,
+                        computeDtype=computeDtype)
+  return ParallelLandscape(landscape, workers, chunkSize).run()
@@ -0,0 +1,165 @@
+"""
+The accuracy of single precision (float32) evaluation.  The batch FBP
+classes, and everything built on them, may evaluate in single precision
+(dtype=np.float32).  This halves the size of their arrays, but the gain in
+speed is modest (about 1.2 times over a million cells).  This module
+measures what is lost:  it evaluates random scenarios spanning
+the operational range of the inputs with every named NFFL fuel model and
+weighting scheme, in both single and double precision, and reports the
+differences.
+
+  rows = accuracyReport()
+  print(formatReport(rows))
+
+or, from the command line, "python precision.py [count] [seed]".
+
+The inputs are rounded to single precision before both evaluations, so
+the differences are those of the arithmetic alone.  Relative errors are
+taken against the larger of the double precision value and the output's
+ABSOLUTE_FLOOR, so that values vanishing near the moisture of extinction
+do not dominate.  Outputs clamped to zero in one precision but not in the
+other are counted separately, as zeroMismatches.
+
+Some inputs give results which are not physical in either precision:  the
+calculated live moisture of extinction may be zero or negative (with
+Albini's method for NFFL models 2, 4 and 5, for example), which gives
+live moisture damping beyond one and rates of spread beyond 1e15 ft/min.
+These scenarios are counted as nonPhysical and excluded from the
+statistics, so that they neither hide nor inflate the errors of the
+others.
+"""
+
+import sys
+import numpy as np
+import nffl
+from rothweights import LIVE
+from landscape import SCHEMES
+
+# the operational range of the inputs:  moistures are fractions, wind is
+# mi/h and slope is degrees
+RANGES = { 'oneHour'     : (0.02, 0.20),
+           'tenHour'     : (0.02, 0.20),
+           'hundredHour' : (0.02, 0.20),
+           'live'        : (0.30, 3.00),
+           'wind'        : (0., 20.),
+           'slope'       : (0., 45.) }
+
+# the outputs compared
+OUTPUT_NAMES = ('rateOfSpread', 'reactionIntensity', 'heatPerUnitArea')
+
+# the values below which errors are relative to these values instead:
+# ft/min, BTU/ft^2/min and BTU/ft^2
+ABSOLUTE_FLOOR = { 'rateOfSpread'      : 1e-3,
+                   'reactionIntensity' : 1e-1,
+                   'heatPerUnitArea'   : 1e-2 }
+
+def sampleInputs(count, seed=0) :
+  """
+  Returns a dictionary of the RANGES names to count uniformly distributed
+  random values, rounded to single precision but held in double precision.
+  """
+  generator = np.random.default_rng(seed)
+  inputs = {}
+  for name in sorted(RANGES) :
+    (low, high) = RANGES[name]
+    values = generator.uniform(low, high, count).astype(np.float32)
+    inputs[name] = values.astype(np.float64)
+  return inputs
+
+def _evaluate(modelName, scheme, inputs, dtype) :
+  """
+  Evaluates the named model over inputs in the given precision.  Returns
+  the dictionary of OUTPUT_NAMES to double precision arrays, and an array
+  which is True where the results are physical:  finite, with a positive
+  live moisture of extinction if the model has live fuel.
+  """
+  fbp = SCHEMES[scheme](modelName, dtype)
+  (dead, live) = fbp.moistureInputs(inputs)
+  fbp.evaluate(dead, live, inputs['wind'], inputs['slope'])
+  outputs = dict([(name, np.asarray(getattr(fbp, name), dtype=np.float64))
+                  for name in OUTPUT_NAMES])
+
+  physical = np.ones(np.shape(inputs['oneHour']), dtype=bool)
+  for name in OUTPUT_NAMES :
+    physical &= np.isfinite(outputs[name])
+  if fbp.hasLiveFuel() :
+    fuel = fbp.fuelComplex
+    extinction = fuel.extMoisture[..., fuel.categoryIndex(LIVE)]
+    physical &= extinction > 0.
+  return outputs, physical
+
+def compareModel(modelName, scheme, inputs) :
+  """
+  Evaluates the named model over inputs (see sampleInputs) in single and
+  double precision.  Returns a dictionary of OUTPUT_NAMES to dictionaries
+  of statistics over the physical scenarios:  maxAbsolute (the output's
+  units), maxRelative, meanRelative, zeroMismatches and largest (the
+  largest double precision value), and nonPhysical, the number of
+  scenarios excluded.  The statistics are NaN if none is physical.
+  """
+  (single, singlePhysical) = _evaluate(modelName, scheme, inputs,
+                                       np.float32)
+  (double, doublePhysical) = _evaluate(modelName, scheme, inputs,
+                                       np.float64)
+  physical = singlePhysical & doublePhysical
+  nonPhysical = int(np.count_nonzero(~physical))
+  result = {}
+  for name in OUTPUT_NAMES :
+    reference = double[name][physical]
+    value = single[name][physical]
+    if not reference.size :
+      result[name] = { 'maxAbsolute' : np.nan, 'maxRelative' : np.nan,
+                       'meanRelative' : np.nan, 'zeroMismatches' : 0,
+                       'largest' : np.nan, 'nonPhysical' : nonPhysical }
+      continue
+    difference = np.abs(value - reference)
+    relative = difference / np.maximum(np.abs(reference),
+                                       ABSOLUTE_FLOOR[name])
+    result[name] = { 'maxAbsolute' : float(np.max(difference)),
+                     'maxRelative' : float(np.max(relative)),
+                     'meanRelative' : float(np.mean(relative)),
+                     'zeroMismatches' : int(np.count_nonzero(
+                       (value == 0.) != (reference == 0.))),
+                     'largest' : float(np.max(np.abs(reference))),
+                     'nonPhysical' : nonPhysical }
+  return result
+
+def accuracyReport(count=100000, seed=0, schemes=('rothermel', 'albini'),
+                   modelNames=nffl.MODEL_NAMES) :
+  """
+  Compares single with double precision for every named model and scheme
+  over count random scenarios.  Returns a list of (scheme, model name,
+  output name, statistics) rows;  see compareModel.
+  """
+  inputs = sampleInputs(count, seed)
+  rows = []
+  for scheme in schemes :
+    for modelName in modelNames :
+      statistics = compareModel(modelName, scheme, inputs)
+      for name in OUTPUT_NAMES :
+        rows.append((scheme, modelName, name, statistics[name]))
+  return rows
+
+def formatReport(rows) :
+  """
+  Returns the rows of accuracyReport as a text table.
+  """
+  lines = ['%-10s %5s %-18s %12s %12s %12s %8s %10s' %
+           ('scheme', 'model', 'output', 'max abs', 'max rel', 'mean rel',
+            'zeros', 'non-phys')]
+  for (scheme, modelName, name, statistics) in rows :
+    lines.append('%-10s %5s %-18s %12.3e %12.3e %12.3e %8d %10d' %
+                 (scheme, modelName, name, statistics['maxAbsolute'],
+                  statistics['maxRelative'], statistics['meanRelative'],
+                  statistics['zeroMismatches'], statistics['nonPhysical']))
+  worst = np.nanmax([statistics['maxRelative']
+                     for (a, b, c, statistics) in rows])
+  excluded = sum([statistics['nonPhysical']
+                  for (a, b, c, statistics) in rows[::len(OUTPUT_NAMES)]])
+  lines.append('largest relative error: %.3e' % worst)
+  lines.append('non-physical scenarios excluded: %d' % excluded)
+  return '\n'.join(lines)
+
+if __name__ == '__main__' :
+  arguments = [int(argument) for argument in sys.argv[1:3]]
+  print(formatReport(accuracyReport(*arguments)))
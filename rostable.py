@@ -0,0 +1,224 @@
+"""
+Precomputed rate of spread and reaction intensity tables for the named
+NFFL fuel models.  A table samples the batched fire behavior evaluation
+over a regular grid of 1-hr, 10-hr and 100-hr dead fuel moisture, live fuel
+moisture, midflame wind speed and slope, and answers queries by multilinear
+interpolation.  Tables are built once (offline), saved to disk and loaded
+without running the fire spread equations at all:
+
+  table = RosTable.build('4')
+  table.save('nffl4.npz')
+  ...
+  table = RosTable.load('nffl4.npz')
+  (ros, intensity) = table.lookup(0.06, 0.07, 0.08, 1.2, 5., 20.)
+
+Size classes which the fuel model does not have are collapsed to a
+single grid point, so they cost nothing.  Queries outside the grid are
+clamped to its edges.
+"""
+
+import os
+import numpy as np
+from rothweights import DEAD, LIVE, ONEHR, TENHR, HUNDREDHR
+from landscape import SCHEMES
+
+# the order of the table axes, and the fuel each moisture axis describes
+AXIS_NAMES = ('oneHour', 'tenHour', 'hundredHour', 'live', 'wind', 'slope')
+MOISTURE_AXES = ((DEAD, ONEHR), (DEAD, TENHR), (DEAD, HUNDREDHR),
+                 (LIVE, ONEHR))
+
+# default grids:  moistures are fractions, wind is mi/h, slope is degrees
+DEFAULT_AXES = { 'oneHour'     : np.linspace(0.02, 0.20, 16),
+                 'tenHour'     : np.linspace(0.02, 0.20, 8),
+                 'hundredHour' : np.linspace(0.02, 0.20, 6),
+                 'live'        : np.linspace(0.30, 3.00, 8),
+                 'wind'        : np.linspace(0., 20., 16),
+                 'slope'       : np.linspace(0., 45., 10) }
+
+
+class RosTable :
+  """
+  A dense table of rate of spread (ft/min) and reaction intensity
+  (BTU/ft^2/min) for one named fuel model and weighting scheme.
+
+  Attributes:
+  modelName                       the NFFL model name ('1' - '13')
+  scheme                          'rothermel' or 'albini'
+  axes                            tuple of grid coordinates, see AXIS_NAMES
+  rateOfSpread                    table of rate of spread
+  reactionIntensity               table of reaction intensity
+  rosError      ft/min            largest interpolation error in rate of
+                                  spread found by estimateError
+  intensityError BTU/ft^2/min     largest interpolation error in reaction
+                                  intensity found by estimateError
+  """
+
+  def __init__(self, modelName, scheme, axes, rateOfSpread,
+               reactionIntensity, rosError=None, intensityError=None) :
+    self.modelName = modelName
+    self.scheme = scheme
+    self.axes = tuple([np.asarray(a) for a in axes])
+    self.rateOfSpread = rateOfSpread
+    self.reactionIntensity = reactionIntensity
+    self.rosError = rosError
+    self.intensityError = intensityError
+
+  @classmethod
+  def exactEvaluator(cls, modelName, scheme) :
+    """
+    Returns a function of (oneHour, tenHour, hundredHour, live, wind,
+    slope) which evaluates the named model exactly, ignoring moistures of
+    size classes the model does not have.
+    """
+    fbp = SCHEMES[scheme](modelName)
+
+    def evaluate(*values) :
+      (dead, live) = fbp.moistureInputs(dict(zip(AXIS_NAMES, values)))
+      return fbp.evaluate(dead, live, values[4], values[5])
+    return evaluate
+
+  @classmethod
+  def build(cls, modelName, scheme='rothermel', axes=None, dtype=np.float32,
+            errorSamples=10000) :
+    """
+    Builds the table of the named model.  axes is a dictionary which may
+    override any of DEFAULT_AXES.  The tables are stored with the given
+    dtype.  If errorSamples is nonzero, estimateError is run with that
+    many samples.
+    """
+    grid = dict(DEFAULT_AXES)
+    if axes :
+      grid.update(axes)
+    evaluate = cls.exactEvaluator(modelName, scheme)
+    fbp = SCHEMES[scheme](modelName)
+
+    # collapse the moisture axes of absent size classes
+    coords = []
+    for name in AXIS_NAMES :
+      values = np.asarray(grid[name], dtype=float)
+      index = AXIS_NAMES.index(name)
+      if index < len(MOISTURE_AXES) :
+        (category, sizeClass) = MOISTURE_AXES[index]
+        if not (sizeClass in fbp.sizeClasses(category)) :
+          values = values[:1]
+      coords.append(values)
+
+    # evaluate one 1-hr moisture at a time to bound memory use
+    shape = tuple([len(c) for c in coords])
+    ros = np.empty(shape, dtype=dtype)
+    intensity = np.empty(shape, dtype=dtype)
+    rest = np.meshgrid(*coords[1:], indexing='ij')
+    for i in range(shape[0]) :
+      (r, ri) = evaluate(coords[0][i], *rest)
+      ros[i] = r
+      intensity[i] = ri
+
+    table = cls(modelName, scheme, coords, ros, intensity)
+    if errorSamples :
+      table.estimateError(errorSamples)
+    return table
+
+  def _interpolate(self, table, values) :
+    """
+    Multilinear interpolation of table at the given coordinates.
+    """
+    values = np.broadcast_arrays(*[np.asarray(v, dtype=float)
+                                   for v in values])
+    lower = []
+    frac = []
+    for (axis, v) in zip(self.axes, values) :
+      if len(axis) == 1 :
+        lower.append(np.zeros(v.shape, dtype=np.intp))
+        frac.append(None)
+        continue
+      v = np.clip(v, axis[0], axis[-1])
+      i = np.clip(np.searchsorted(axis, v, side='right') - 1,
+                  0, len(axis) - 2)
+      lower.append(i)
+      frac.append((v - axis[i]) / (axis[i+1] - axis[i]))
+
+    # sum over the corners of the enclosing grid cell
+    active = [d for d in range(len(self.axes)) if frac[d] is not None]
+    result = np.zeros(values[0].shape)
+    for corner in range(1 << len(active)) :
+      weight = np.ones(values[0].shape)
+      index = list(lower)
+      for (bit, d) in enumerate(active) :
+        if corner & (1 << bit) :
+          index[d] = lower[d] + 1
+          weight = weight * frac[d]
+        else :
+          weight = weight * (1. - frac[d])
+      result += weight * table[tuple(index)]
+    return result
+
+  def lookup(self, oneHour, tenHour, hundredHour, live, wind, slope) :
+    """
+    Returns the interpolated (rateOfSpread, reactionIntensity) at the
+    given moistures (fractions), midflame wind speed (mi/h) and slope
+    (degrees).  Arguments broadcast against one another; moistures of size
+    classes which the model does not have are ignored.
+    """
+    values = (oneHour, tenHour, hundredHour, live, wind, slope)
+    return (self._interpolate(self.rateOfSpread, values),
+            self._interpolate(self.reactionIntensity, values))
+
+  def estimateError(self, samples=10000, seed=0) :
+    """
+    Compares interpolated and exact results at random points within the
+    grid, recording the largest absolute differences in the rosError and
+    intensityError attributes.  These are empirical bounds; the error is
+    largest near the moisture of extinction, where the exact rate of
+    spread has a kink (and, since the moisture damping is not clamped,
+    where the live moisture of extinction approaches zero).  Returns
+    (rosError, intensityError).
+    """
+    rng = np.random.default_rng(seed)
+    values = [rng.uniform(axis[0], axis[-1], samples) for axis in self.axes]
+    (ros, intensity) = self.lookup(*values)
+    (exactRos, exactIntensity) = \
+      self.exactEvaluator(self.modelName, self.scheme)(*values)
+    self.rosError = float(np.max(np.abs(ros - exactRos)))
+    self.intensityError = float(np.max(np.abs(intensity - exactIntensity)))
+    return self.rosError, self.intensityError
+
+  def save(self, path) :
+    """
+    Saves the table, uncompressed so that it loads quickly, to path.
+    """
+    arrays = dict([(name, axis) for (name, axis) in zip(AXIS_NAMES,
+                                                        self.axes)])
+    np.savez(path, rateOfSpread=self.rateOfSpread,
+             reactionIntensity=self.reactionIntensity,
+             modelName=np.array(self.modelName),
+             scheme=np.array(self.scheme),
+             errors=np.array([np.nan if e is None else e
+                              for e in (self.rosError,
+                                        self.intensityError)]),
+             **arrays)
+
+  @classmethod
+  def load(cls, path) :
+    """
+    Loads a table previously written by save.
+    """
+    with np.load(path) as data :
+      errors = [None if np.isnan(e) else float(e) for e in data['errors']]
+      return cls(str(data['modelName']), str(data['scheme']),
+                 [data[name] for name in AXIS_NAMES],
+                 data['rateOfSpread'], data['reactionIntensity'],
+                 errors[0], errors[1])
+
+
+def buildAll(directory, scheme='rothermel', **kwargs) :
+  """
+  Builds and saves the tables of all 13 NFFL models to directory, as
+  files named nffl<N>-<scheme>.npz.  Returns the list of tables.
+  """
+  tables = []
+  for modelName in sorted(SCHEMES[scheme].fuelModelNames, key=int) :
+    table = RosTable.build(modelName, scheme, **kwargs)
+    table.save(os.path.join(directory,
+                            'nffl%s-%s.npz' % (modelName, scheme)))
+    tables.append(table)
+  return tables
@@ -21,6 +21,7 @@ Rothermel, R. C. A mathematical model for predicting fire spread in
 
 import model
 import math
+import types
 
 # Fuel categories
 DEAD = 'dead'
@@ -217,14 +218,12 @@ class RothermelFuelComplex (model.RothermelFuel) :
     self.heatContent = {}
     self.netFuelLoading  = {}
     self.effMineralContent = {} 
-    self.fuelMoisture = {}
     for cat in self.categoryWeighting.keys() : 
       
       # initialize to 0
       self.heatContent[cat] = 0.
       self.netFuelLoading[cat]  = 0.
       self.effMineralContent[cat] = 0.
-      self.fuelMoisture[cat]      = 0.
 
       classWgts = self.classWeighting[cat]
       for j in classWgts.items() :
@@ -242,8 +241,22 @@ class RothermelFuelComplex (model.RothermelFuel) :
         #eqn 63
         self.effMineralContent[cat] += curWgt * curFuel.effMineralContent
 
+  def aggregateMoisture(self) : 
+    """
+    Aggregates the fuel moistures by category (eqn 66).  This is the only
+    aggregate which depends on the fuel moistures, so it is the only one 
+    which must be recomputed when they change.
+    """
+    self.fuelMoisture = {}
+    for cat in self.categoryWeighting.keys() : 
+      self.fuelMoisture[cat] = 0.
+
+      classWgts = self.classWeighting[cat]
+      for j in classWgts.items() :
+        curFuel = self.fuelParameters[cat][j[0]]
+
         #eqn 66
-        self.fuelMoisture[cat] += curWgt * curFuel.fuelMoisture
+        self.fuelMoisture[cat] += j[1] * curFuel.fuelMoisture
 
   def aggregateIntoComplex(self) : 
     """
@@ -288,6 +301,17 @@ class RothermelFuelComplex (model.RothermelFuel) :
 
     self.setSigma(sigma)
 
+  def computeStatic(self) : 
+    """
+    Calculates all the per-category and per-complex values which do not
+    depend on the fuel moistures.  If you later change anything other 
+    than the component fuel moistures or the category moistures of 
+    extinction, you must call this method again.
+    """
+    self.calcWeightingParameters()
+    self.aggregateIntoCategories()
+    self.aggregateIntoComplex()
+
   def compute(self) : 
     """
     Call this method once all the fuel components have been set.  This 
@@ -295,13 +319,75 @@ class RothermelFuelComplex (model.RothermelFuel) :
     the components.  If you later change anything, you must call this 
     method again.  You may change component fuel moistures and 
     category moistures of extinction without invalidating these 
-    computations.
+    computations, provided aggregateMoisture is called afterward.
     """
-    self.calcWeightingParameters()
-    self.aggregateIntoCategories()
-    self.aggregateIntoComplex()
+    self.computeStatic()
+    self.aggregateMoisture()
         
 
+def freeze(value) : 
+  """
+  Returns a read-only view of value if it is a (possibly nested) 
+  dictionary; otherwise returns value unchanged.
+  """
+  if isinstance(value, dict) : 
+    return types.MappingProxyType(
+      dict([(k, freeze(v)) for (k, v) in value.items()]))
+  return value
+
+
+class StaticFuel : 
+  """
+  A frozen record of everything about a fuel complex and its fire model
+  which depends only on the fuel bed (loadings, sigmas, densities and 
+  depth), and not on the fuel moistures, wind or slope.  A record is 
+  captured once from a fully described fuel complex and may then be 
+  applied to any number of identical complexes, after which only the
+  moisture, wind and slope dependent calculations need be run:
+
+    record.apply(fuelComplex, fireModel)
+    fuelComplex.aggregateMoisture()
+    fireModel.calcWindMultiplier(wind)
+    fireModel.calcSlopeMultiplier(slope)
+    fireModel.evaluateScenario()
+
+  Dictionary valued attributes are stored as read-only views, so one 
+  record may safely be shared.
+  """
+  fuelAttributes = ('classAreas', 'categoryAreas', 'totalArea', 
+                    'classWeighting', 'categoryWeighting', 
+                    'netFuelLoading', 'heatContent', 'effMineralContent',
+                    'sigma', 'packingRatio', 'bulkDensity', 
+                    'optimalPacking', 'maxPotentialVelocity', 'exponentA',
+                    'heatingEfficiency')
+  modelAttributes = ('propFluxRatio', 'dampMineral', 'potReactionVelocity',
+                     'windC', 'windB', 'windE', 'slopeFactor')
+
+  def __init__(self, fuelComplex, fireModel) : 
+    """
+    Computes the static parts of the given fuel complex and fire model 
+    and records them.  fireModel.fuel must be fuelComplex.
+    """
+    fuelComplex.computeStatic()
+    fireModel.evaluateStatic()
+
+    self.fuelValues = freeze(dict([(name, getattr(fuelComplex, name)) 
+                                   for name in self.fuelAttributes]))
+    self.modelValues = freeze(dict([(name, getattr(fireModel, name)) 
+                                    for name in self.modelAttributes]))
+
+  def apply(self, fuelComplex, fireModel) : 
+    """
+    Copies the recorded values onto a fuel complex and its fire model.
+    The complex must be described by the same fuel components as the one
+    from which this record was captured.
+    """
+    for name, value in self.fuelValues.items() : 
+      setattr(fuelComplex, name, value)
+    for name, value in self.modelValues.items() : 
+      setattr(fireModel, name, value)
+
+
 class WeightedRothermelModel (model.RothermelModel) : 
   """
   Computes those components of the Rothermel model which are affected by the
@@ -0,0 +1,238 @@
+"""
+Streaming evaluation of bulk fire behavior queries.  Scenarios are read
+from CSV or JSON lines (one JSON object per line) as a generator, evaluated
+in batches through the batched RothermelFBP/AlbiniFBP path, and written
+out row by row, so that memory use does not depend on the number of rows.
+
+Each scenario has the fields:
+  fuelModel                       NFFL fuel model name ('1' - '13')
+  oneHour, tenHour, hundredHour   dead fuel moistures (fractions)
+  live                            live fuel moisture (fraction)
+  wind                            midflame wind speed (mi/h)
+  slope                           slope (degrees)
+Moistures of size classes which the fuel model does not have may be
+omitted.  Every other field is passed through unchanged.  Each result is
+the scenario with rateOfSpread (ft/min), reactionIntensity (BTU/ft^2/min),
+heatPerUnitArea (BTU/ft^2) and error added.  Integer codes which are not
+NFFL models (e.g., 0 or 99 for non-burnable) give zeros.  A scenario
+whose fuelModel is missing or not an integer, which is missing an input
+its fuel model needs, or which has a field that is not a number, does
+not stop the others:  its outputs are null (empty in CSV) and error says
+what is wrong;  otherwise error is null.
+
+From the command line (use '-' for stdin/stdout):
+  python scenarios.py [--scheme albini] input.csv output.jsonl
+"""
+
+import sys
+import csv
+import json
+import argparse
+import numpy as np
+import nffl
+from rothweights import DEAD, LIVE
+from arrayweights import CATEGORIES
+from landscape import Landscape, INPUT_NAMES, OUTPUT_NAMES
+
+# the inputs of the dead size classes, in arrayweights.SIZE_CLASSES order
+_DEAD_INPUTS = ('oneHour', 'tenHour', 'hundredHour')
+
+FORMATS = ('csv', 'jsonl')
+
+def readScenarios(stream, format='csv') :
+  """
+  Generates the scenarios in stream, one dictionary per row.
+  """
+  if format == 'csv' :
+    for row in csv.DictReader(stream) :
+      yield row
+  elif format == 'jsonl' :
+    for line in stream :
+      if line.strip() :
+        yield json.loads(line)
+  else :
+    raise ValueError("Unknown format: " + str(format))
+
+def batches(iterable, size) :
+  """
+  Generates lists of up to size consecutive items of iterable.
+  """
+  batch = []
+  for item in iterable :
+    batch.append(item)
+    if len(batch) == size :
+      yield batch
+      batch = []
+  if batch :
+    yield batch
+
+def _number(name, value) :
+  """
+  Converts a field to a float; missing or empty fields become NaN.  Raises
+  ValueError if the field is not a number.
+  """
+  if value is None or value == '' :
+    return np.nan
+  try :
+    return float(value)
+  except (TypeError, ValueError) :
+    raise ValueError("Invalid " + name + ": " + repr(value))
+
+def _code(value) :
+  """
+  Converts a fuel model name to an integer code.  Raises ValueError if it
+  is missing or not an integer.
+  """
+  try :
+    code = int(value)
+    if isinstance(value, float) and code != value :
+      raise ValueError(value)
+    return code
+  except (TypeError, ValueError) :
+    raise ValueError("Unknown fuel model: " + repr(value))
+
+def requiredInputs(code) :
+  """
+  Returns the INPUT_NAMES (other than fuelModels) which the fuel model
+  code needs:  the moistures of its size classes, wind and slope.
+  Unknown codes need none.
+  """
+  name = str(code)
+  if not (name in nffl.MODEL_NAMES) :
+    return ()
+  present = nffl.PRESENT[nffl.modelIndex(name)]
+  names = [_DEAD_INPUTS[i] for i in range(len(_DEAD_INPUTS))
+           if present[CATEGORIES.index(DEAD), i]]
+  if present[CATEGORIES.index(LIVE)].any() :
+    names.append('live')
+  return tuple(names) + ('wind', 'slope')
+
+def checkScenario(row) :
+  """
+  Returns the fuel model code of a scenario and a dictionary of the
+  INPUT_NAMES other than fuelModels to floats (NaN where missing).  Raises
+  ValueError if fuelModel is missing or not an integer, a field is not a
+  number or an input the fuel model needs is missing.
+  """
+  code = _code(row.get('fuelModel'))
+  values = dict([(name, _number(name, row.get(name)))
+                 for name in INPUT_NAMES[1:]])
+  for name in requiredInputs(code) :
+    if np.isnan(values[name]) :
+      raise ValueError("Missing " + name + " for fuel model " + str(code))
+  return code, values
+
+def runScenarios(scenarios, scheme='rothermel', batchSize=4096) :
+  """
+  Evaluates an iterable of scenario dictionaries, batchSize at a time, and
+  generates the results in the same order.
+  """
+  evaluator = None
+  for batch in batches(scenarios, batchSize) :
+    codes = np.zeros(len(batch), dtype=int)
+    inputs = dict([(name, np.zeros(len(batch))) for name in INPUT_NAMES[1:]])
+    errors = [None] * len(batch)
+    for (i, row) in enumerate(batch) :
+      try :
+        (codes[i], values) = checkScenario(row)
+      except ValueError as error :
+        # evaluated as a non-burnable cell, and reported as an error
+        (codes[i], errors[i]) = (-1, str(error))
+        continue
+      for name in INPUT_NAMES[1:] :
+        inputs[name][i] = values[name]
+    if evaluator is None :
+      evaluator = Landscape(codes, 0., 0., 0., 0., 0., 0., scheme)
+    outputs = evaluator.evaluateCells(codes, inputs)
+    for (i, row) in enumerate(batch) :
+      result = dict(row)
+      for name in OUTPUT_NAMES :
+        if errors[i] is None :
+          result[name] = float(outputs[name][i])
+        else :
+          result[name] = None
+      result['error'] = errors[i]
+      yield result
+
+def _finite(result) :
+  """
+  Returns result with the floats which are not finite replaced by None.
+  """
+  return dict([(name, None if isinstance(value, float) and
+                          not np.isfinite(value) else value)
+               for (name, value) in result.items()])
+
+def writeResults(results, stream, format='csv') :
+  """
+  Writes results to stream, one row at a time.  For CSV the columns are
+  those of the first result.  JSON lines are strict JSON:  values which
+  are not finite numbers are written as null.  Returns the number of rows
+  written.
+  """
+  count = 0
+  writer = None
+  for result in results :
+    if format == 'csv' :
+      if writer is None :
+        writer = csv.DictWriter(stream, fieldnames=list(result.keys()),
+                                extrasaction='ignore')
+        writer.writeheader()
+      writer.writerow(result)
+    elif format == 'jsonl' :
+      stream.write(json.dumps(_finite(result), allow_nan=False) + '\n')
+    else :
+      raise ValueError("Unknown format: " + str(format))
+    count += 1
+  return count
+
+def _format(path, format) :
+  """
+  Returns format if given, otherwise guesses it from the file name.
+  """
+  if format :
+    return format
+  if path.endswith('.jsonl') or path.endswith('.json') :
+    return 'jsonl'
+  return 'csv'
+
+def main(argv=None) :
+  parser = argparse.ArgumentParser(
+    description='Evaluate fire behavior scenarios from CSV or JSON lines.')
+  parser.add_argument('input', nargs='?', default='-',
+                      help="scenario file, or '-' for stdin")
+  parser.add_argument('output', nargs='?', default='-',
+                      help="result file, or '-' for stdout")
+  parser.add_argument('--input-format', choices=FORMATS)
+  parser.add_argument('--output-format', choices=FORMATS)
+  parser.add_argument('--scheme', choices=('rothermel', 'albini'),
+                      default='rothermel')
+  parser.add_argument('--batch-size', type=int, default=4096)
+  args = parser.parse_args(argv)
+
+  inFormat = _format(args.input, args.input_format)
+  if args.output == '-' :
+    outFormat = args.output_format or inFormat
+  else :
+    outFormat = _format(args.output, args.output_format)
+  inStream = sys.stdin
+  outStream = sys.stdout
+  try :
+    if args.input != '-' :
+      inStream = open(args.input, newline='')
+    if args.output != '-' :
+      outStream = open(args.output, 'w', newline='')
+    results = runScenarios(readScenarios(inStream, inFormat), args.scheme,
+                           args.batch_size)
+    writeResults(results, outStream, outFormat)
+  except BrokenPipeError :
+    # the reader went away (e.g., piped into "head"); not an error
+    sys.stdout = None
+  finally :
+    if inStream is not sys.stdin :
+      inStream.close()
+    if outStream is not sys.stdout :
+      outStream.close()
+  return 0
+
+if __name__ == '__main__' :
+  sys.exit(main())
@@ -0,0 +1,119 @@
+"""
+Exact partial derivatives of the rate of spread and reaction intensity,
+computed in the same pass as the values by forward-mode differentiation
+(see the "dual" module) over the unmodified array equations.  This
+replaces finite differencing, which needs 2N+1 evaluations for N inputs.
+
+The derivatives are returned as a dictionary of output name
+('reactionIntensity' or 'ros') to a dictionary of input name to array.
+Derivatives with respect to per-class inputs have (category, size class)
+as their last two axes, like the inputs themselves.  Units are those of
+the inputs:  e.g., d ros / d midflameWind is (ft/min) / (ft/min).  The
+wind multiplier is not differentiable at zero wind, where the derivative
+with respect to wind is infinite.
+"""
+
+import copy
+import numpy as np
+from dual import Dual
+from arraymodel import ArrayRothermelFuel, ArrayRothermelModel
+from arrayweights import ArrayWeightedRothermelModel
+
+# inputs of the homogeneous model, and those of the weighted models
+HOMOGENEOUS_INPUTS = ('fuelMoisture', 'midflameWind', 'slope', 'loading',
+                      'sigma')
+COMPLEX_INPUTS = ('classMoisture', 'midflameWind', 'slope', 'classLoading',
+                  'classSigma')
+
+# the outputs which are differentiated
+OUTPUTS = ('reactionIntensity', 'ros')
+
+def _split(output, layout) :
+  """
+  Splits the tangent of a Dual output into a dictionary of input name to
+  derivative.  layout is a sequence of (name, offset, shape of the input's
+  layout axes).
+  """
+  result = {}
+  for (name, offset, shape) in layout :
+    count = int(np.prod(shape, dtype=int))
+    tangent = np.broadcast_to(output.tangent[offset:offset + count],
+                              (count,) + output.shape)
+    tangent = tangent.reshape(tuple(shape) + output.shape)
+    axes = tuple(range(len(shape)))
+    result[name] = np.moveaxis(tangent, axes,
+                               tuple([a - len(shape) for a in axes])) \
+                   if shape else tangent
+  return result
+
+def evaluate(sigma, loading, bulkDensity, fuelMoisture, extMoisture,
+             midflameWind, slope, particleDensity=32.,
+             fuelClass=ArrayRothermelFuel, modelClass=ArrayRothermelModel) :
+  """
+  Evaluates the homogeneous-fuel model as arraymodel.evaluate does, and
+  differentiates it with respect to HOMOGENEOUS_INPUTS.  midflameWind is
+  in ft/min and slope in radians.  Returns the tuple (reactionIntensity,
+  ros, derivatives).
+  """
+  n = len(HOMOGENEOUS_INPUTS)
+  inputs = dict([(name, Dual.seed(value, HOMOGENEOUS_INPUTS.index(name), n))
+                 for (name, value) in (('fuelMoisture', fuelMoisture),
+                                       ('midflameWind', midflameWind),
+                                       ('slope', slope),
+                                       ('loading', loading),
+                                       ('sigma', sigma))])
+
+  fuel = fuelClass(inputs['sigma'], inputs['loading'])
+  fuel.setDensity(bulkDensity, particleDensity)
+  fuel.setFuelMoisture(inputs['fuelMoisture'], extMoisture)
+
+  fire = modelClass(fuel)
+  fire.setWind(inputs['midflameWind'])
+  fire.setSlope(inputs['slope'])
+  fire.evaluate()
+
+  layout = [(name, i, ()) for (i, name) in enumerate(HOMOGENEOUS_INPUTS)]
+  derivatives = dict([(name, _split(getattr(fire, name), layout))
+                      for name in OUTPUTS])
+  return fire.reactionIntensity.value, fire.ros.value, derivatives
+
+def evaluateComplex(fuelComplex, midflameWind, slope,
+                    modelClass=ArrayWeightedRothermelModel) :
+  """
+  Evaluates an array fuel complex (one whose inputs have been set, but
+  which has not been computed) with the given weighted array model, and
+  differentiates it with respect to COMPLEX_INPUTS.  midflameWind is in
+  ft/min and slope in radians.  The fuel complex is not modified.  Returns
+  the tuple (fire model, derivatives); the fire model's attributes hold
+  the values.
+  """
+  fuel = copy.copy(fuelComplex)
+  layoutShape = fuel.classMoisture.shape[-2:]
+  perClass = int(np.prod(layoutShape))
+  n = 3 * perClass + 2
+
+  layout = []
+  offset = 0
+  for name in COMPLEX_INPUTS :
+    if name.startswith('class') :
+      setattr(fuel, name, Dual.seed(getattr(fuel, name), offset, n, 2))
+      layout.append((name, offset, layoutShape))
+      offset += perClass
+    else :
+      layout.append((name, offset, ()))
+      offset += 1
+  wind = Dual.seed(midflameWind, layout[1][1], n)
+  slope = Dual.seed(slope, layout[2][1], n)
+
+  fuel.compute()
+  fuel.calcLivingExtMoisture()
+  fire = modelClass(fuel)
+  fire.setWind(wind)
+  fire.setSlope(slope)
+  fire.evaluate()
+
+  derivatives = dict([(name, _split(getattr(fire, name), layout))
+                      for name in OUTPUTS])
+  for name in OUTPUTS :
+    setattr(fire, name, getattr(fire, name).value)
+  return fire, derivatives
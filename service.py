@@ -0,0 +1,350 @@
+"""
+An asyncio fire behavior query service.  Concurrent requests arriving
+within a short window are coalesced into one batch, which is evaluated
+with the vectorized path of the "scenarios" module on a worker thread
+(off the event loop), and the results are fanned back out to the waiting
+requests.
+
+Requests and results are the scenario and result dictionaries of the
+"scenarios" module.  The service speaks a line protocol over TCP:  each
+request is one JSON object on a line, and each response is one JSON
+object on a line, in the order of the requests on that connection (which
+may be pipelined).  The request {"command": "metrics"} returns the
+service metrics instead of a result.  Each request is checked before it
+joins a batch, and an invalid one (a missing or non-integer fuelModel, a
+field which is not a number, or a missing input its fuel model needs) is
+refused on its own with {"error": ...} and counted as invalid, so that it
+cannot fail the other requests of its batch.  Integer codes which are not
+NFFL models (non-burnable) give zeros, as in the "scenarios" module.
+
+Backpressure:  at most maxPending requests may be waiting for or
+undergoing evaluation.  Requests beyond that are refused at once with the
+response {"error": "overloaded"} (Overloaded when calling evaluate
+directly), so that a burst cannot grow the queue, and the latency of the
+requests already accepted, without bound.
+
+From the command line:
+  python service.py [--host 127.0.0.1] [--port 8765] [--scheme albini]
+                    [--window 0.005] [--max-batch 4096] [--max-pending 65536]
+"""
+
+import sys
+import json
+import time
+import asyncio
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from scenarios import runScenarios, checkScenario
+
+class Overloaded (RuntimeError) :
+  """
+  Raised when a request is refused because too many are pending.
+  """
+  pass
+
+
+class Metrics :
+  """
+  Throughput and latency counters of a BatchingService.
+
+  Attributes:
+  started          s              time.perf_counter() when created
+  requests                        number of requests answered
+  rejected                        number of requests refused (overloaded)
+  invalid                         number of requests refused as invalid
+  failed                          number of requests whose evaluation
+                                  failed
+  batches                         number of batches evaluated
+  evaluationTime   s              total time spent evaluating batches
+  latencies        s              the latencies of the most recent requests
+  """
+  def __init__(self, window=10000) :
+    self.started = time.perf_counter()
+    self.requests = 0
+    self.rejected = 0
+    self.invalid = 0
+    self.failed = 0
+    self.batches = 0
+    self.evaluationTime = 0.
+    self.latencies = deque(maxlen=window)
+
+  def _percentile(self, values, fraction) :
+    if not values :
+      return None
+    return values[min(int(fraction * len(values)), len(values) - 1)]
+
+  def snapshot(self, pending=0) :
+    """
+    Returns the metrics as a dictionary:  counters, throughput
+    (requests/s since creation), mean batch size and the 50th, 95th and
+    99th percentile and maximum latencies (s) of the recent requests.
+    """
+    elapsed = time.perf_counter() - self.started
+    latencies = sorted(self.latencies)
+    return { 'requests' : self.requests,
+             'rejected' : self.rejected,
+             'invalid' : self.invalid,
+             'failed' : self.failed,
+             'pending' : pending,
+             'batches' : self.batches,
+             'meanBatchSize' : self.requests / max(self.batches, 1),
+             'throughput' : self.requests / max(elapsed, 1e-9),
+             'evaluationTime' : self.evaluationTime,
+             'latencyP50' : self._percentile(latencies, 0.50),
+             'latencyP95' : self._percentile(latencies, 0.95),
+             'latencyP99' : self._percentile(latencies, 0.99),
+             'latencyMax' : latencies[-1] if latencies else None }
+
+
+class BatchingService :
+  """
+  Coalesces concurrent evaluation requests into batches.  Call start()
+  from within the event loop before evaluating, and stop() when done.
+
+  Attributes:
+  scheme                          'rothermel' or 'albini'
+  window           s              how long a batch stays open after its
+                                  first request arrives
+  maxBatch                        the largest batch evaluated at once
+  maxPending                      the most requests waiting at once
+  maxConcurrent                   the most batches being evaluated at once
+  metrics                         the Metrics of the service
+  """
+  def __init__(self, scheme='rothermel', window=0.005, maxBatch=4096,
+               maxPending=65536, maxConcurrent=2) :
+    self.scheme = scheme
+    self.window = window
+    self.maxBatch = maxBatch
+    self.maxPending = maxPending
+    self.maxConcurrent = maxConcurrent
+    self.metrics = Metrics()
+    self.pending = 0
+    self._queue = None
+    self._collector = None
+    self._executor = None
+    self._slots = None
+    self._running = set()
+
+  async def start(self) :
+    """
+    Starts collecting batches.
+    """
+    self._queue = asyncio.Queue()
+    self._slots = asyncio.Semaphore(self.maxConcurrent)
+    self._executor = ThreadPoolExecutor(self.maxConcurrent)
+    self._collector = asyncio.ensure_future(self._collect())
+
+  async def stop(self) :
+    """
+    Stops collecting batches, once those being evaluated are done.
+    Requests which have not yet been dispatched in a batch fail with
+    RuntimeError.
+    """
+    self._collector.cancel()
+    try :
+      await self._collector
+    except asyncio.CancelledError :
+      pass
+    if self._running :
+      await asyncio.gather(*self._running)
+    self._executor.shutdown()
+
+  async def evaluate(self, scenario) :
+    """
+    Evaluates one scenario dictionary as part of a batch and returns its
+    result dictionary.  Raises ValueError if the scenario is invalid (see
+    scenarios.checkScenario), Overloaded if maxPending requests are
+    already waiting and RuntimeError if the service is not running.
+    """
+    if self._collector is None or self._collector.done() :
+      raise RuntimeError("The service is not running")
+    try :
+      checkScenario(scenario)
+    except ValueError :
+      self.metrics.invalid += 1
+      raise
+    if self.pending >= self.maxPending :
+      self.metrics.rejected += 1
+      raise Overloaded("Too many pending requests")
+    self.pending += 1
+    arrived = time.perf_counter()
+    future = asyncio.get_running_loop().create_future()
+    self._queue.put_nowait((scenario, future))
+    try :
+      return await future
+    finally :
+      self.pending -= 1
+      self.metrics.latencies.append(time.perf_counter() - arrived)
+
+  async def _collect(self) :
+    """
+    Gathers requests into batches:  a batch is closed window seconds after
+    its first request arrives, or as soon as it holds maxBatch requests.
+    Waits for a free evaluation slot before closing the next batch, so
+    requests keep accumulating while the evaluators are busy.
+    """
+    loop = asyncio.get_running_loop()
+    batch = []
+    try :
+      while True :
+        batch = [await self._queue.get()]
+        closes = loop.time() + self.window
+        while len(batch) < self.maxBatch :
+          remaining = closes - loop.time()
+          if remaining <= 0. :
+            break
+          try :
+            batch.append(await asyncio.wait_for(self._queue.get(),
+                                                remaining))
+          except asyncio.TimeoutError :
+            break
+        await self._slots.acquire()
+        while len(batch) < self.maxBatch and not self._queue.empty() :
+          batch.append(self._queue.get_nowait())
+        task = asyncio.ensure_future(self._evaluateBatch(batch))
+        self._running.add(task)
+        task.add_done_callback(self._running.discard)
+        batch = []
+    except asyncio.CancelledError :
+      # stopped:  fail the requests held or still queued, which would
+      # otherwise wait forever
+      while not self._queue.empty() :
+        batch.append(self._queue.get_nowait())
+      for (scenario, future) in batch :
+        if not future.done() :
+          self.metrics.failed += 1
+          future.set_exception(RuntimeError("The service stopped"))
+      raise
+
+  async def _evaluateBatch(self, batch) :
+    """
+    Evaluates a batch on a worker thread and resolves its futures.  If the
+    batch fails, its requests are evaluated one by one, so that only the
+    failing ones fail.
+    """
+    try :
+      scenarios = [scenario for (scenario, future) in batch]
+      loop = asyncio.get_running_loop()
+      began = time.perf_counter()
+      try :
+        results = await loop.run_in_executor(self._executor, self._run,
+                                             scenarios)
+      except Exception as error :
+        if len(batch) == 1 :
+          self.metrics.failed += 1
+          if not batch[0][1].done() :
+            batch[0][1].set_exception(error)
+          return
+        results = []
+        for scenario in scenarios :
+          try :
+            results.extend(await loop.run_in_executor(self._executor,
+                                                      self._run, [scenario]))
+          except Exception as error :
+            self.metrics.failed += 1
+            results.append(error)
+      self.metrics.evaluationTime += time.perf_counter() - began
+      self.metrics.batches += 1
+      for ((scenario, future), result) in zip(batch, results) :
+        if future.done() :
+          continue
+        if isinstance(result, Exception) :
+          future.set_exception(result)
+        else :
+          self.metrics.requests += 1
+          future.set_result(result)
+    finally :
+      self._slots.release()
+
+  def _run(self, scenarios) :
+    """
+    Evaluates a list of scenarios in one vectorized batch.
+    """
+    return list(runScenarios(scenarios, self.scheme, len(scenarios)))
+
+  async def handleConnection(self, reader, writer) :
+    """
+    Serves the line protocol on one connection.  Requests are evaluated
+    concurrently, and the responses written in the order of the requests.
+    """
+    responses = asyncio.Queue()
+
+    async def write() :
+      while True :
+        response = await responses.get()
+        if response is None :
+          break
+        writer.write((json.dumps(await response) + '\n').encode())
+        await writer.drain()
+
+    writing = asyncio.ensure_future(write())
+    try :
+      while True :
+        line = await reader.readline()
+        if not line :
+          break
+        if line.strip() :
+          responses.put_nowait(asyncio.ensure_future(self._respond(line)))
+    finally :
+      responses.put_nowait(None)
+      try :
+        await writing
+      except ConnectionError :
+        pass
+      writer.close()
+
+  async def _respond(self, line) :
+    """
+    Returns the response to one request line.
+    """
+    try :
+      request = json.loads(line)
+    except ValueError :
+      return { 'error' : 'invalid JSON' }
+    if not isinstance(request, dict) :
+      return { 'error' : 'request must be a JSON object' }
+    if request.get('command') == 'metrics' :
+      return self.metrics.snapshot(self.pending)
+    try :
+      return await self.evaluate(request)
+    except Overloaded :
+      return { 'error' : 'overloaded' }
+    except Exception as error :
+      return { 'error' : str(error) }
+
+  async def serve(self, host='127.0.0.1', port=8765) :
+    """
+    Serves the line protocol until cancelled.
+    """
+    await self.start()
+    server = await asyncio.start_server(self.handleConnection, host, port)
+    try :
+      async with server :
+        await server.serve_forever()
+    finally :
+      await self.stop()
+
+def main(argv=None) :
+  parser = argparse.ArgumentParser(
+    description='Serve fire behavior queries as JSON lines over TCP.')
+  parser.add_argument('--host', default='127.0.0.1')
+  parser.add_argument('--port', type=int, default=8765)
+  parser.add_argument('--scheme', choices=('rothermel', 'albini'),
+                      default='rothermel')
+  parser.add_argument('--window', type=float, default=0.005,
+                      help='batching window (s)')
+  parser.add_argument('--max-batch', type=int, default=4096)
+  parser.add_argument('--max-pending', type=int, default=65536)
+  args = parser.parse_args(argv)
+
+  service = BatchingService(args.scheme, args.window, args.max_batch,
+                            args.max_pending)
+  try :
+    asyncio.run(service.serve(args.host, args.port))
+  except KeyboardInterrupt :
+    pass
+  return 0
+
+if __name__ == '__main__' :
+  sys.exit(main())
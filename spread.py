@@ -0,0 +1,151 @@
+"""
+Spread in directions other than that of the head fire.  Rothermel's model
+gives the rate of spread in the direction of the wind or upslope.  Here the
+wind and slope multipliers (Rothermel eqns 47 and 51) are treated as
+vectors, as in BEHAVE: their resultant gives the direction of maximum
+spread and, through the inverse of eqn 47, an effective wind speed.  The
+effective wind speed determines the length to breadth ratio of an
+elliptical fire (Anderson 1983), from which the rate of spread in any
+direction follows.
+
+Directions are azimuths in degrees, clockwise from north.  Wind direction
+is the direction from which the wind blows and aspect the direction the
+slope faces (downslope), as is conventional.
+
+References:
+Anderson, H. E. Predicting wind-driven wild land fire size and shape.
+  Research Paper INT-305, USDA Forest Service. 1983. 26 p.
+Rothermel, R. C. A mathematical model for predicting fire spread in
+  wildland fuels.  General Technical Report INT-115, USDA Forest Service.
+  1972. 40 p.
+"""
+
+import numpy as np
+from landscape import Landscape, openRaster, INDEX_BUDGET
+
+# largest length to breadth ratio produced by lengthToBreadth
+MAX_LENGTH_TO_BREADTH = 8.
+
+def lengthToBreadth(effectiveWind) :
+  """
+  Anderson's (1983) length to breadth ratio of an elliptical fire for an
+  effective midflame wind speed in mi/h.
+  """
+  ratio = 0.936 * np.exp(0.2566 * effectiveWind) + \
+          0.461 * np.exp(-0.1548 * effectiveWind) - 0.397
+  return np.clip(ratio, 1., MAX_LENGTH_TO_BREADTH)
+
+def wrapAzimuth(direction, dtype=None) :
+  """
+  Returns azimuths (degrees), converted to dtype, in [0, 360).  Rounding
+  to a lower precision may turn an azimuth just below 360 into 360 itself,
+  which is wrapped to 0.
+  """
+  direction = np.asarray(direction, dtype=dtype) % 360.
+  return np.where(direction >= 360., direction - 360., direction)[()]
+
+
+class SpreadEllipse :
+  """
+  The elliptical spread of a fire from a point.
+
+  Attributes:
+  headRos          ft/min         rate of spread in the direction of maximum
+                                  spread
+  direction        degrees        azimuth of maximum spread
+  lengthToBreadth                 length to breadth ratio of the ellipse
+  eccentricity                    eccentricity of the ellipse
+  backRos          ft/min         rate of spread opposite the head
+  effectiveWind    mi/h           wind speed which alone would give the
+                                  combined wind and slope multiplier (only
+                                  if made by fromFireModel)
+  """
+
+  def __init__(self, headRos, direction, lengthToBreadth) :
+    self.headRos = headRos
+    self.direction = direction
+    self.lengthToBreadth = lengthToBreadth
+    self.eccentricity = np.sqrt(1. - 1. / (lengthToBreadth * lengthToBreadth))
+    self.backRos = headRos * (1. - self.eccentricity) / \
+                   (1. + self.eccentricity)
+
+  @classmethod
+  def fromFireModel(cls, fireModel, windDirection, aspect) :
+    """
+    Makes the spread ellipse of an evaluated (scalar or array) fire model,
+    whose wind multiplier applies in the direction toward which the wind
+    blows and whose slope multiplier applies upslope.
+    """
+    heading = np.radians(np.add(windDirection, 180.))
+    upslope = np.radians(np.add(aspect, 180.))
+    x = fireModel.windMultiplier * np.sin(heading) + \
+        fireModel.slopeMultiplier * np.sin(upslope)
+    y = fireModel.windMultiplier * np.cos(heading) + \
+        fireModel.slopeMultiplier * np.cos(upslope)
+    combined = np.hypot(x, y)
+    direction = wrapAzimuth(np.degrees(np.arctan2(x, y)))
+
+    # invert eqn 47 for the effective wind speed, in mi/h
+    ratio = fireModel.fuel.packingRatio / fireModel.fuel.optimalPacking
+    wind = np.power(combined * np.power(ratio, fireModel.windE) / \
+                    fireModel.windC, 1. / fireModel.windB) / (5280. / 60.)
+
+    headRos = np.maximum(fireModel.noWindRos * (1. + combined), 0.)
+    result = cls(headRos, direction, lengthToBreadth(wind))
+    result.effectiveWind = wind
+    return result
+
+  def rosInDirection(self, azimuth) :
+    """
+    Returns the rate of spread from the ignition point in the direction of
+    the given azimuth (degrees).
+    """
+    angle = np.radians(np.subtract(azimuth, self.direction))
+    return self.headRos * (1. - self.eccentricity) / \
+           (1. - self.eccentricity * np.cos(angle))
+
+  def axes(self) :
+    """
+    Returns the growth rates (a, b, c) of the ellipse, in ft/min:  a is
+    the semi-minor axis, b the semi-major axis and c the distance from
+    the ignition point to the center, as used by Richards (1990).
+    """
+    b = (self.headRos + self.backRos) / 2.
+    return b / self.lengthToBreadth, b, b - self.backRos
+
+
+class SpreadLandscape (Landscape) :
+  """
+  A Landscape which also produces, for every cell, the spread ellipse
+  given the wind direction and slope aspect rasters (degrees azimuth).
+  Its additional outputs are headRos (ft/min), spreadDirection (degrees)
+  and lengthToBreadth.
+  """
+  inputNames = Landscape.inputNames + ('windDirection', 'aspect')
+  outputNames = Landscape.outputNames + ('headRos', 'spreadDirection',
+                                         'lengthToBreadth')
+
+  def __init__(self, fuelModels, slope, oneHour, tenHour, hundredHour, live,
+               wind, windDirection, aspect, scheme='rothermel', shape=None,
+               dtype=np.float32, fuelModelDtype=np.int16,
+               computeDtype=np.float64, indexBudget=INDEX_BUDGET) :
+    Landscape.__init__(self, fuelModels, slope, oneHour, tenHour,
+                       hundredHour, live, wind, scheme, shape, dtype,
+                       fuelModelDtype, computeDtype, indexBudget)
+    self.windDirection = openRaster(windDirection, self.shape, dtype)
+    self.aspect = openRaster(aspect, self.shape, dtype)
+
+  def collect(self, fbp, select, outputs, cells) :
+    Landscape.collect(self, fbp, select, outputs, cells)
+    ellipse = SpreadEllipse.fromFireModel(fbp.fireModel,
+                                          select('windDirection'),
+                                          select('aspect'))
+    outputs['headRos'][cells] = ellipse.headRos
+    outputs['spreadDirection'][cells] = wrapAzimuth(
+      ellipse.direction, outputs['spreadDirection'].dtype)
+    outputs['lengthToBreadth'][cells] = ellipse.lengthToBreadth
+
+  def writeTile(self, outputs, rows, results) :
+    Landscape.writeTile(self, outputs, rows, results)
+    direction = outputs['spreadDirection']
+    direction[rows] = wrapAzimuth(direction[rows])
@@ -0,0 +1,156 @@
+"""
+Stateless, thread-safe evaluation of the named NFFL fuel models, for
+serving concurrent requests (e.g., from a web server's thread pool)
+without a lock around every call.
+
+evaluate() takes one scenario dictionary and returns a new result
+dictionary.  It builds a fresh fuel complex and fire model for every call
+from the immutable catalog in the "nffl" module and applies the shared,
+read-only static record of the model, so no mutable state is shared
+between calls.  The results are those of RothermelFBP and AlbiniFBP.
+evaluateMany() evaluates a sequence of scenarios over a thread pool.
+
+Scenarios have the fields of the "scenarios" module:
+  fuelModel                       NFFL fuel model name ('1' - '13')
+  oneHour, tenHour, hundredHour   dead fuel moistures (fractions)
+  live                            live fuel moisture (fraction)
+  wind                            midflame wind speed (mi/h)
+  slope                           slope (degrees)
+Moistures of size classes which the fuel model does not have may be
+omitted.  Every other field is passed through unchanged.  Each result is
+the scenario with rateOfSpread (ft/min), reactionIntensity (BTU/ft^2/min)
+and heatPerUnitArea (BTU/ft^2) added, negative values clamped to zero.
+
+stressTest() evaluates random scenarios with both schemes concurrently
+and checks the results against serial evaluation:
+  python stateless.py [scenarios] [workers]
+"""
+
+import sys
+import math
+import time
+import random
+from concurrent.futures import ThreadPoolExecutor
+import nffl
+import behavior
+from model import RothermelFuel
+from rothweights import RothermelFuelComplex, WeightedRothermelModel, \
+                        DEAD, LIVE, ONEHR, TENHR, HUNDREDHR
+from albini import AlbiniFuel, AlbiniFuelComplex, WeightedAlbiniModel
+
+# the (component, complex, fire model) classes of each weighting scheme
+SCHEMES = { 'rothermel' : (RothermelFuel, RothermelFuelComplex,
+                           WeightedRothermelModel),
+            'albini'    : (AlbiniFuel, AlbiniFuelComplex,
+                           WeightedAlbiniModel) }
+
+# the scenario field holding the moisture of each size class
+MOISTURE_FIELDS = ((DEAD, ONEHR, 'oneHour'), (DEAD, TENHR, 'tenHour'),
+                   (DEAD, HUNDREDHR, 'hundredHour'), (LIVE, ONEHR, 'live'))
+
+def evaluate(scenario, scheme='rothermel') :
+  """
+  Evaluates one scenario dictionary with the given weighting scheme
+  ('rothermel' or 'albini') and returns the result dictionary.  Raises
+  ValueError for an unknown fuel model or scheme, or if a size class of
+  the fuel model has no moisture.
+  """
+  if not (scheme in SCHEMES) :
+    raise ValueError("Unknown scheme: " + str(scheme))
+  (componentClass, complexClass, fireModelClass) = SCHEMES[scheme]
+  modelName = str(scenario['fuelModel'])
+  fuel = nffl.fuelComplex(modelName, componentClass, complexClass)
+  fire = fireModelClass(fuel)
+
+  # the static record is shared, but only ever read
+  record = nffl.staticFuel(modelName, fuel, fireModelClass)
+  record.apply(fuel, fire)
+
+  for (category, sizeClass, field) in MOISTURE_FIELDS :
+    if sizeClass in fuel.fuelParameters.get(category, {}) :
+      if scenario.get(field) is None :
+        raise ValueError("Size class: " + sizeClass + " needs a moisture.")
+      fuel.setFuelMoisture(category, sizeClass, float(scenario[field]))
+
+  fuel.aggregateMoisture()
+  if LIVE in fuel.fuelParameters :
+    fuel.calcLivingExtMoisture()
+  fire.calcWindMultiplier(float(scenario['wind']) * (5280. / 60.))
+  fire.calcSlopeMultiplier(math.radians(float(scenario['slope'])))
+  fire.evaluateScenario()
+
+  result = dict(scenario)
+  result['rateOfSpread'] = max(fire.ros, 0.)
+  result['reactionIntensity'] = max(fire.reactionIntensity, 0.)
+  result['heatPerUnitArea'] = float(behavior.heatPerUnitArea(
+    result['reactionIntensity'], fuel.sigma))
+  return result
+
+def evaluateMany(scenarios, scheme='rothermel', workers=None,
+                 executor=None) :
+  """
+  Evaluates a sequence of scenarios over a thread pool and returns the
+  list of results, in order.  An existing executor may be given (e.g., the
+  server's own pool);  otherwise a pool of workers threads is created for
+  the call.
+  """
+  if executor is not None :
+    return list(executor.map(evaluate, scenarios,
+                             [scheme] * len(scenarios)))
+  with ThreadPoolExecutor(workers) as pool :
+    return list(pool.map(evaluate, scenarios, [scheme] * len(scenarios)))
+
+def randomScenarios(count, seed=0) :
+  """
+  Returns count random scenarios spanning all the NFFL fuel models.
+  """
+  generator = random.Random(seed)
+  scenarios = []
+  for i in range(count) :
+    scenarios.append({ 'fuelModel' : nffl.MODEL_NAMES[i % len(nffl.MODEL_NAMES)],
+                       'oneHour' : generator.uniform(0.02, 0.12),
+                       'tenHour' : generator.uniform(0.03, 0.14),
+                       'hundredHour' : generator.uniform(0.04, 0.16),
+                       'live' : generator.uniform(0.6, 2.5),
+                       'wind' : generator.uniform(0., 15.),
+                       'slope' : generator.uniform(0., 40.) })
+  return scenarios
+
+def stressTest(count=2000, workers=16, seed=0) :
+  """
+  Evaluates count random scenarios serially, and then again with both
+  schemes interleaved over a pool of workers threads.  Returns a
+  dictionary with the number of evaluations, the number of results which
+  differ from the serial ones (which should be zero) and the serial and
+  concurrent times (s).
+  """
+  scenarios = randomScenarios(count, seed)
+  jobs = [(scenario, scheme) for scenario in scenarios
+          for scheme in sorted(SCHEMES)]
+
+  began = time.time()
+  serial = [evaluate(scenario, scheme) for (scenario, scheme) in jobs]
+  serialTime = time.time() - began
+
+  # nffl's static records are discarded first, so that the threads also
+  # race to create them.
+  nffl.clearStaticFuels()
+  began = time.time()
+  with ThreadPoolExecutor(workers) as pool :
+    concurrent = list(pool.map(lambda job : evaluate(*job), jobs))
+  concurrentTime = time.time() - began
+
+  mismatches = 0
+  for (expected, result) in zip(serial, concurrent) :
+    if expected != result :
+      mismatches += 1
+  return { 'evaluations' : len(jobs), 'mismatches' : mismatches,
+           'serialTime' : serialTime, 'concurrentTime' : concurrentTime }
+
+if __name__ == '__main__' :
+  count = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+  workers = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+  report = stressTest(count, workers)
+  for name in ('evaluations', 'mismatches', 'serialTime', 'concurrentTime') :
+    print(name + ': ' + str(report[name]))
+  sys.exit(report['mismatches'] != 0)
@@ -0,0 +1,156 @@
+"""
+Evaluation of a landscape over a stream of weather, e.g., the hourly grids
+of a forecast.  Between consecutive steps only the weather (moistures and
+wind) changes, and often only in some cells, so each step re-evaluates
+just the cells whose weather has moved by more than a tolerance since
+they were last evaluated.  The other cells keep their results.  Since a
+cell's inputs are compared with those of its last evaluation rather than
+with the previous step, slow drifts are not lost.
+
+  forecast = evaluateForecast(landscape, hourlyWeather)
+  for outputs in forecast :
+    ...                     # one dictionary of output grids per step
+
+The weather of a step is a dictionary of weather input names (those of
+the landscape other than STATIC_NAMES) to grids or uniform values;
+inputs missing from a step keep the landscape's own values.  Steps are
+evaluated lazily, as the consumer asks for them.  The whole landscape's
+inputs and outputs are held in memory.
+"""
+
+import numpy as np
+from landscape import FuelModelIndex
+
+# the inputs of a landscape which do not change from step to step
+STATIC_NAMES = ('fuelModels', 'slope', 'aspect')
+
+# the default tolerances:  moistures (fractions), wind (mi/h) and wind
+# direction (degrees)
+TOLERANCES = { 'oneHour'       : 0.0005,
+               'tenHour'       : 0.0005,
+               'hundredHour'   : 0.0005,
+               'live'          : 0.0005,
+               'wind'          : 0.01,
+               'windDirection' : 0.5 }
+
+def _cells(value, cells) :
+  """
+  Returns the given flat cells of value, or value itself if it is
+  uniform.
+  """
+  if np.ndim(value) == 0 :
+    return value
+  return np.ravel(np.asarray(value))[cells]
+
+
+class TemporalEvaluator :
+  """
+  Evaluates a Landscape (or SpreadLandscape) step by step, re-evaluating
+  only the cells whose weather has changed.
+
+  Attributes:
+  landscape                       the landscape evaluated
+  weatherNames                    the inputs which may change between steps
+  tolerances                      input name to the change which triggers
+                                  re-evaluation (missing names:  0)
+  outputs                         output name to the current output grid
+  recomputed                      the number of cells evaluated by the
+                                  last step
+  steps                           the number of steps evaluated
+  """
+  def __init__(self, landscape, tolerances=None) :
+    self.landscape = landscape
+    self.weatherNames = tuple([name for name in landscape.inputNames
+                               if not (name in STATIC_NAMES)])
+    self.tolerances = dict(TOLERANCES)
+    if tolerances is not None :
+      self.tolerances.update(tolerances)
+    self.outputs = None
+    self.recomputed = 0
+    self.steps = 0
+    self._reference = None
+
+  def _weather(self, weather) :
+    """
+    Returns the weather of a step as full grids of the landscape's shape.
+    """
+    shape = self.landscape.shape
+    grids = {}
+    for name in self.weatherNames :
+      value = weather.get(name)
+      if value is None :
+        value = getattr(self.landscape, name)
+      grids[name] = np.broadcast_to(np.asarray(value, dtype=float), shape)
+    return grids
+
+  def changedCells(self, grids) :
+    """
+    Returns the flat indices of the cells whose weather differs from that
+    of their last evaluation by more than the tolerances.
+    """
+    changed = np.zeros(self.landscape.shape, dtype=bool)
+    for name in self.weatherNames :
+      difference = np.abs(grids[name] - self._reference[name])
+      changed |= difference > self.tolerances.get(name, 0.)
+    return np.flatnonzero(changed)
+
+  def step(self, weather) :
+    """
+    Evaluates one step of weather and returns the dictionary of output
+    grids, which are updated in place by the following steps.
+    """
+    landscape = self.landscape
+    grids = self._weather(weather)
+
+    if self.outputs is None :
+      # every cell is evaluated, with the landscape's own grouping index
+      rows = slice(0, landscape.shape[0])
+      codes = np.asarray(landscape.fuelModels)
+      inputs = {}
+      for name in landscape.inputNames[1:] :
+        inputs[name] = grids.get(name, getattr(landscape, name))
+      results = landscape.evaluateCells(codes, inputs,
+                                        landscape.index(rows, codes))
+      self.outputs = dict([(name, np.array(results[name]))
+                           for name in landscape.outputNames])
+      self._reference = dict([(name, np.array(grids[name]))
+                              for name in self.weatherNames])
+      self.recomputed = codes.size
+    else :
+      cells = self.changedCells(grids)
+      if cells.size :
+        codes = _cells(landscape.fuelModels, cells)
+        inputs = {}
+        for name in landscape.inputNames[1:] :
+          inputs[name] = _cells(grids.get(name, getattr(landscape, name)),
+                                cells)
+        results = landscape.evaluateCells(codes, inputs,
+                                          FuelModelIndex(codes))
+        for name in landscape.outputNames :
+          self.outputs[name].reshape(-1)[cells] = results[name]
+        for name in self.weatherNames :
+          self._reference[name].reshape(-1)[cells] = \
+            grids[name].reshape(-1)[cells]
+      self.recomputed = cells.size
+    self.steps += 1
+    return self.outputs
+
+  def run(self, stream, copy=True) :
+    """
+    Generates the output grids of each step of weather in stream (any
+    iterable, which is read lazily).  If copy is False, the same grids,
+    updated in place, are yielded at every step.
+    """
+    for weather in stream :
+      outputs = self.step(weather)
+      if copy :
+        outputs = dict([(name, grid.copy())
+                        for (name, grid) in outputs.items()])
+      yield outputs
+
+def evaluateForecast(landscape, stream, tolerances=None, copy=True) :
+  """
+  Generates the output grids of landscape for each step of weather in
+  stream;  see TemporalEvaluator.
+  """
+  return TemporalEvaluator(landscape, tolerances).run(stream, copy)